@@ -30,7 +30,7 @@ echo Python detectado
 echo.
 
 REM Iniciar la aplicacion
-python app/main_simple_fixed.py
+python app/main_simple_fixed.py --rapido
 
 if errorlevel 1 (
     echo.
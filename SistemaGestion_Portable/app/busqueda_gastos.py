@@ -0,0 +1,81 @@
+"""
+Búsqueda de gastos por texto (descripción, lugar de compra y motivo)
+Con FTS5 usa el índice gastos_fts: cada palabra escrita se busca como prefijo,
+los resultados salen ordenados por relevancia (bm25) y cada uno trae un
+fragmento con las coincidencias resaltadas. Sin FTS5 recurre a LIKE y ordena
+por fecha. Los filtros por tipo y rango de fechas van en la misma consulta.
+"""
+import html
+import re
+
+from database_simple import SOPORTA_FTS5
+
+# Marcadores del fragmento; se cambian por <mark> después de escapar el texto
+_INICIO, _FIN = '\x02', '\x03'
+PALABRAS_FRAGMENTO = 12
+# Pesos de bm25 por columna: la descripción cuenta el triple que el lugar y el motivo
+RELEVANCIA = 'bm25(gastos_fts, 3.0, 1.0, 1.0)'
+
+def consulta_fts(texto):
+    """Texto del usuario -> consulta FTS5: todas las palabras, cada una como prefijo
+
+    Las palabras van entre comillas, así los operadores (AND, OR, NEAR, *, -)
+    escritos por el usuario se buscan como texto y nunca dan error de sintaxis.
+    """
+    palabras = re.findall(r'\w+', texto)
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+def resaltar(fragmento):
+    """Escapar el fragmento para HTML y marcar las coincidencias con <mark>"""
+    return html.escape(fragmento or '').replace(_INICIO, '<mark>').replace(_FIN, '</mark>')
+
+def _filtros(tipo_gasto, fecha_inicio, fecha_fin):
+    condiciones = []
+    params = []
+    if tipo_gasto:
+        condiciones.append('g.tipo_gasto = ?')
+        params.append(tipo_gasto)
+    if fecha_inicio:
+        condiciones.append('g.fecha >= ?')
+        params.append(fecha_inicio.isoformat())
+    if fecha_fin:
+        condiciones.append('g.fecha <= ?')
+        params.append(fecha_fin.isoformat())
+    return condiciones, params
+
+def buscar(conn, q='', tipo_gasto=None, fecha_inicio=None, fecha_fin=None, limite=50):
+    """Gastos que coinciden con q y los filtros, como dicts con 'fragmento' y 'relevancia'
+
+    Sin texto devuelve los gastos filtrados, los más recientes primero.
+    """
+    condiciones, params = _filtros(tipo_gasto, fecha_inicio, fecha_fin)
+    consulta = consulta_fts(q)
+    if consulta and SOPORTA_FTS5:
+        # bm25 es negativo (menor es mejor); se devuelve cambiado de signo
+        sql = f'''
+            SELECT g.*, -{RELEVANCIA} AS relevancia,
+                   snippet(gastos_fts, -1, ?, ?, '…', {PALABRAS_FRAGMENTO}) AS fragmento
+            FROM gastos_fts JOIN gastos g ON g.id = gastos_fts.rowid
+            WHERE gastos_fts MATCH ? {''.join(f' AND {c}' for c in condiciones)}
+            ORDER BY {RELEVANCIA}
+            LIMIT ?
+        '''
+        filas = conn.execute(sql, [_INICIO, _FIN, consulta] + params + [limite]).fetchall()
+    else:
+        if consulta:
+            for palabra in re.findall(r'\w+', q):
+                condiciones.append('(g.descripcion LIKE ? OR g.lugar_compra LIKE ? OR g.motivo LIKE ?)')
+                params.extend([f'%{palabra}%'] * 3)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+        filas = conn.execute(f'''
+            SELECT g.*, 0.0 AS relevancia, g.descripcion AS fragmento FROM gastos g
+            {where} ORDER BY g.fecha DESC, g.id DESC LIMIT ?
+        ''', params + [limite]).fetchall()
+
+    resultados = []
+    for fila in filas:
+        gasto = dict(fila)
+        gasto['fragmento'] = resaltar(gasto['fragmento'])
+        gasto['relevancia'] = round(gasto['relevancia'], 6)
+        resultados.append(gasto)
+    return resultados
@@ -0,0 +1,144 @@
+"""
+Caché en memoria de suscriptores para las consultas frecuentes
+Guarda registros compactos (id, contrato, cédula, email, nombre) accesibles por
+cualquiera de los cuatro identificadores, con desalojo LRU y límite de memoria.
+Solo se guardan suscriptores existentes: una búsqueda sin resultado siempre
+consulta la base de datos, así un alta en otro proceso nunca queda oculta.
+Solo sirve lecturas: las escrituras validan contra la base en su transacción,
+porque una eliminación hecha en otro proceso tarda hasta TTL en verse aquí.
+"""
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from database_simple import get_connection
+
+# Límite de memoria aproximado y vigencia de cada registro. La vigencia cubre
+# cambios hechos por otros procesos (modo multiproceso, scripts de consola);
+# los cambios de este proceso se invalidan al momento.
+MAX_BYTES = int(float(os.environ.get("SISTEMA_CACHE_SUSCRIPTORES_MB", "8")) * 1024 * 1024)
+TTL = float(os.environ.get("SISTEMA_CACHE_SUSCRIPTORES_TTL", "60"))
+
+CAMPOS = ('id', 'numero_contrato', 'cedula', 'email', 'nombre_completo')
+CLAVES = ('numero_contrato', 'cedula', 'email')
+
+# Costo fijo por registro: la tupla, la entrada del OrderedDict y las de los índices
+_COSTO_BASE = sys.getsizeof((0,) * (len(CAMPOS) + 1)) + 100 * (len(CLAVES) + 1)
+
+def _tamano(registro):
+    return _COSTO_BASE + sum(sys.getsizeof(valor) for valor in registro)
+
+class CacheSuscriptores:
+    """Caché de lectura (read-through) de registros de suscriptores"""
+
+    def __init__(self, nombre='suscriptores', max_bytes=MAX_BYTES, ttl=TTL):
+        self.nombre = nombre
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._registros = OrderedDict()   # id -> (id, contrato, cédula, email, nombre, vence)
+        self._indices = {campo: {} for campo in CLAVES}
+        self._bytes = 0
+        self._generacion = 0   # cambia con cada invalidación
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    def _quitar(self, suscriptor_id):
+        registro = self._registros.pop(suscriptor_id, None)
+        if registro is None:
+            return
+        for posicion, campo in enumerate(CAMPOS[1:4], 1):
+            if self._indices[campo].get(registro[posicion]) == suscriptor_id:
+                del self._indices[campo][registro[posicion]]
+        self._bytes -= _tamano(registro)
+
+    def _guardar(self, fila, generacion):
+        registro = tuple(fila[campo] for campo in CAMPOS) + (time.monotonic() + self.ttl,)
+        with self._lock:
+            if generacion != self._generacion:
+                # Hubo una invalidación durante la consulta: la fila puede estar vieja
+                return registro
+            self._quitar(registro[0])
+            self._registros[registro[0]] = registro
+            for posicion, campo in enumerate(CAMPOS[1:4], 1):
+                if registro[posicion] is not None:
+                    self._indices[campo][registro[posicion]] = registro[0]
+            self._bytes += _tamano(registro)
+            while self._bytes > self.max_bytes and len(self._registros) > 1:
+                self._quitar(next(iter(self._registros)))
+                self.desalojos += 1
+        return registro
+
+    def _en_cache(self, campo, valor):
+        with self._lock:
+            suscriptor_id = valor if campo == 'id' else self._indices[campo].get(valor)
+            registro = self._registros.get(suscriptor_id)
+            if registro is not None and registro[-1] < time.monotonic():
+                self._quitar(suscriptor_id)
+                registro = None
+            if registro is None:
+                self.fallos += 1
+                return None
+            self._registros.move_to_end(suscriptor_id)
+            self.aciertos += 1
+            return registro
+
+    def buscar(self, campo, valor, conn=None):
+        """Registro del suscriptor con campo = valor como dict, o None si no existe
+
+        Si se pasa una conexión, la consulta ante un fallo se hace dentro de
+        su transacción.
+        """
+        if campo != 'id' and campo not in CLAVES:
+            raise ValueError(f"Campo no indexado en la caché: {campo}")
+        if valor is None:
+            return None
+        registro = self._en_cache(campo, valor)
+        if registro is None:
+            generacion = self._generacion
+            propia = conn is None
+            conn = conn or get_connection()
+            try:
+                fila = conn.execute(f'SELECT {", ".join(CAMPOS)} FROM suscriptores '
+                                    f'WHERE {campo} = ? AND eliminado_en IS NULL', (valor,)).fetchone()
+            finally:
+                if propia:
+                    conn.close()
+            if fila is None:
+                return None
+            registro = self._guardar(fila, generacion)
+        return dict(zip(CAMPOS, registro))
+
+    def invalidar(self, suscriptor_id):
+        """Quitar un suscriptor (llamar después del commit que lo modifica o elimina)"""
+        with self._lock:
+            self._generacion += 1
+            self._quitar(suscriptor_id)
+
+    def limpiar(self):
+        with self._lock:
+            self._generacion += 1
+            self._registros.clear()
+            for indice in self._indices.values():
+                indice.clear()
+            self._bytes = 0
+
+    def estado(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._registros),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_s': self.ttl,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'desalojos': self.desalojos,
+                'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else 0.0,
+            }
+
+# Instancia única usada por la aplicación
+cache_suscriptores = CacheSuscriptores()
@@ -4,25 +4,90 @@ Base de datos SQLite simplificada - Sin SQLAlchemy
 import sqlite3
 import os
 import hashlib
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime, date
 
+from metricas import metricas
+
 # Obtener el directorio donde se ejecuta la aplicación
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "sistema_suscriptores.db")
+DB_PATH = os.environ.get("SISTEMA_DB_PATH", os.path.join(BASE_DIR, "sistema_suscriptores.db"))
+
+# Segundos que una escritura espera el bloqueo antes de fallar; varios
+# procesos (modo --workers) comparten el mismo archivo
+BUSY_TIMEOUT = float(os.environ.get("SISTEMA_BUSY_TIMEOUT", "15"))
 
 def get_connection():
     """Obtener conexión a la base de datos"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
     conn.row_factory = sqlite3.Row
+    # Seguro con WAL: solo una caída del sistema operativo puede perder la última transacción
+    conn.execute('PRAGMA synchronous = NORMAL')
+    # SQLite no aplica las claves foráneas (ni ON DELETE CASCADE) salvo que se pida en cada conexión
+    conn.execute('PRAGMA foreign_keys = ON')
     return conn
 
-def init_database():
-    """Inicializar la base de datos"""
+def get_read_connection(timeout=10.0):
+    """Conexión de solo lectura (mode=ro y query_only) que se puede usar desde otros hilos"""
+    conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True, timeout=timeout, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA query_only = 1')
+    return conn
+
+# INSERT/UPDATE ... RETURNING existe desde SQLite 3.35; el Python de algunos
+# equipos Windows trae una versión anterior
+SOPORTA_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+def _soporta_fts5():
+    conn = sqlite3.connect(':memory:')
+    try:
+        conn.execute('CREATE VIRTUAL TABLE prueba USING fts5(texto)')
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+# Búsqueda de texto completo en gastos; sin FTS5 (compilaciones mínimas de
+# SQLite) la búsqueda usa LIKE
+SOPORTA_FTS5 = _soporta_fts5()
+
+def insertar_y_leer(cursor, tabla, sql, params):
+    """Ejecutar un INSERT y devolver la fila insertada completa
+
+    Con RETURNING * es una sola sentencia; en SQLite antiguo se relee por lastrowid.
+    """
+    if SOPORTA_RETURNING:
+        # fetchall agota la sentencia para que el commit posterior no la encuentre abierta
+        return cursor.execute(f'{sql} RETURNING *', params).fetchall()[0]
+    cursor.execute(sql, params)
+    return cursor.execute(f'SELECT * FROM {tabla} WHERE id = ?', (cursor.lastrowid,)).fetchone()
+
+def actualizar_y_leer(cursor, tabla, sql, params, fila_id):
+    """Ejecutar un UPDATE de una fila y devolverla actualizada (None si no cambió ninguna)"""
+    if SOPORTA_RETURNING:
+        filas = cursor.execute(f'{sql} RETURNING *', params).fetchall()
+        return filas[0] if filas else None
+    cursor.execute(sql, params)
+    if not cursor.rowcount:
+        return None
+    return cursor.execute(f'SELECT * FROM {tabla} WHERE id = ?', (fila_id,)).fetchone()
+
+def checkpoint_wal(modo='PASSIVE'):
+    """Copiar el WAL a la base de datos; devuelve (ocupado, paginas_log, paginas_copiadas)"""
     conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Crear tabla de usuarios
-    cursor.execute('''
+    try:
+        return tuple(conn.execute(f'PRAGMA wal_checkpoint({modo})').fetchone())
+    finally:
+        conn.close()
+
+# Sentencias del esquema. Cualquier cambio aquí cambia la huella del esquema
+# y obliga a recrearlo en el siguiente arranque rápido.
+TABLAS_SQL = [
+    '''
         CREATE TABLE IF NOT EXISTS usuarios (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             email TEXT UNIQUE NOT NULL,
@@ -32,10 +97,8 @@ def init_database():
             fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-    ''')
-    
-    # Crear tablas principales
-    cursor.execute('''
+    ''',
+    '''
         CREATE TABLE IF NOT EXISTS suscriptores (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             numero_contrato TEXT UNIQUE NOT NULL,
@@ -43,11 +106,15 @@ def init_database():
             nombre_completo TEXT NOT NULL,
             fecha_suscripcion DATE NOT NULL,
             fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            email TEXT,
+            telefono TEXT,
+            direccion TEXT,
+            eliminado_en TIMESTAMP,
+            version INTEGER NOT NULL DEFAULT 1
         )
-    ''')
-    
-    cursor.execute('''
+    ''',
+    '''
         CREATE TABLE IF NOT EXISTS pagos (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             suscriptor_id INTEGER NOT NULL,
@@ -63,9 +130,8 @@ def init_database():
             FOREIGN KEY (suscriptor_id) REFERENCES suscriptores(id) ON DELETE CASCADE,
             UNIQUE(suscriptor_id, mes, anio)
         )
-    ''')
-    
-    cursor.execute('''
+    ''',
+    '''
         CREATE TABLE IF NOT EXISTS recibos (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             pago_id INTEGER UNIQUE NOT NULL,
@@ -73,9 +139,8 @@ def init_database():
             fecha_emision TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (pago_id) REFERENCES pagos(id) ON DELETE CASCADE
         )
-    ''')
-    
-    cursor.execute('''
+    ''',
+    '''
         CREATE TABLE IF NOT EXISTS ingresos (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             pago_id INTEGER UNIQUE NOT NULL,
@@ -85,9 +150,8 @@ def init_database():
             fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (pago_id) REFERENCES pagos(id) ON DELETE CASCADE
         )
-    ''')
-    
-    cursor.execute('''
+    ''',
+    '''
         CREATE TABLE IF NOT EXISTS gastos (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             tipo_gasto TEXT NOT NULL,
@@ -98,87 +162,450 @@ def init_database():
             motivo TEXT,
             fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-    ''')
+    ''',
+    # Marcas de filas eliminadas para /sync/changes (ver sincronizacion.py)
+    '''
+        CREATE TABLE IF NOT EXISTS eliminaciones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tabla TEXT NOT NULL,
+            fila_id INTEGER NOT NULL,
+            fecha TIMESTAMP NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+        )
+    ''',
+    # Respuestas guardadas por clave de idempotencia (ver idempotencia.py)
+    '''
+        CREATE TABLE IF NOT EXISTS idempotencia (
+            clave TEXT PRIMARY KEY,
+            ruta TEXT NOT NULL,
+            huella TEXT NOT NULL,
+            estado INTEGER,
+            respuesta TEXT,
+            fecha_creacion REAL NOT NULL
+        )
+    ''',
+]
+
+# Índices para búsquedas
+INDICES_SQL = [
+    'CREATE INDEX IF NOT EXISTS idx_usuarios_email ON usuarios(email)',
+    'CREATE INDEX IF NOT EXISTS idx_suscriptores_numero_contrato ON suscriptores(numero_contrato)',
+    'CREATE INDEX IF NOT EXISTS idx_suscriptores_cedula ON suscriptores(cedula)',
+    'CREATE INDEX IF NOT EXISTS idx_suscriptores_email ON suscriptores(email)',
+    # Índices parciales: los suscriptores eliminados (pendientes de purga) no
+    # ocupan el índice del listado y la búsqueda, y la purga los encuentra sin recorrer la tabla
+    'CREATE INDEX IF NOT EXISTS idx_suscriptores_nombre_activos ON suscriptores(nombre_completo) WHERE eliminado_en IS NULL',
+    'CREATE INDEX IF NOT EXISTS idx_suscriptores_eliminados ON suscriptores(eliminado_en) WHERE eliminado_en IS NOT NULL',
+    # Orden por fecha de suscripción en el listado paginado
+    'CREATE INDEX IF NOT EXISTS idx_suscriptores_fecha_activos ON suscriptores(fecha_suscripcion) WHERE eliminado_en IS NULL',
+    'CREATE INDEX IF NOT EXISTS idx_pagos_suscriptor ON pagos(suscriptor_id)',
+    'CREATE INDEX IF NOT EXISTS idx_pagos_fecha ON pagos(fecha_pago)',
+    'CREATE INDEX IF NOT EXISTS idx_recibos_pago ON recibos(pago_id)',
+    'CREATE INDEX IF NOT EXISTS idx_ingresos_pago ON ingresos(pago_id)',
+    # Ingresos del mes (la suma se lee solo del índice) y los más recientes en /dashboard/resumen
+    'CREATE INDEX IF NOT EXISTS idx_ingresos_fecha ON ingresos(fecha, monto)',
+    'CREATE INDEX IF NOT EXISTS idx_gastos_fecha ON gastos(fecha)',
+    'CREATE INDEX IF NOT EXISTS idx_idempotencia_fecha ON idempotencia(fecha_creacion)',
+    # Cambios desde una fecha para /sync/changes
+    'CREATE INDEX IF NOT EXISTS idx_suscriptores_actualizacion ON suscriptores(fecha_actualizacion)',
+    'CREATE INDEX IF NOT EXISTS idx_pagos_creacion ON pagos(fecha_creacion)',
+    'CREATE INDEX IF NOT EXISTS idx_gastos_creacion ON gastos(fecha_creacion)',
+    'CREATE INDEX IF NOT EXISTS idx_eliminaciones_fecha ON eliminaciones(fecha)',
+]
+
+# Disparadores que registran las eliminaciones. Al estar en la base de datos
+# cubren todos los caminos: endpoints, lotes, cascadas y la purga.
+DISPARADORES_SQL = [
+    # La eliminación lógica de un suscriptor es la que ven los clientes
+    ('trg_suscriptores_eliminado', '''
+        AFTER UPDATE OF eliminado_en ON suscriptores
+        WHEN OLD.eliminado_en IS NULL AND NEW.eliminado_en IS NOT NULL
+        BEGIN
+            INSERT INTO eliminaciones (tabla, fila_id) VALUES ('suscriptores', OLD.id);
+        END
+    '''),
+    # La purga posterior no repite la marca
+    ('trg_suscriptores_borrado', '''
+        AFTER DELETE ON suscriptores
+        WHEN OLD.eliminado_en IS NULL
+        BEGIN
+            INSERT INTO eliminaciones (tabla, fila_id) VALUES ('suscriptores', OLD.id);
+        END
+    '''),
+    # Los pagos de un suscriptor ya eliminado se dan por eliminados con él
+    ('trg_pagos_borrado', '''
+        AFTER DELETE ON pagos
+        WHEN NOT EXISTS (SELECT 1 FROM suscriptores WHERE id = OLD.suscriptor_id AND eliminado_en IS NOT NULL)
+        BEGIN
+            INSERT INTO eliminaciones (tabla, fila_id) VALUES ('pagos', OLD.id);
+        END
+    '''),
+    ('trg_gastos_borrado', '''
+        AFTER DELETE ON gastos
+        BEGIN
+            INSERT INTO eliminaciones (tabla, fila_id) VALUES ('gastos', OLD.id);
+        END
+    '''),
+]
+
+# Índice de texto completo de gastos (ver busqueda_gastos.py). Es de contenido
+# externo: guarda solo el índice y lee el texto de la tabla gastos; los
+# disparadores lo mantienen al día con cualquier escritura.
+FTS_SQL = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS gastos_fts USING fts5(
+        descripcion, lugar_compra, motivo,
+        content='gastos', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+'''
+DISPARADORES_FTS_SQL = [
+    ('trg_gastos_fts_alta', '''
+        AFTER INSERT ON gastos
+        BEGIN
+            INSERT INTO gastos_fts (rowid, descripcion, lugar_compra, motivo)
+            VALUES (NEW.id, NEW.descripcion, NEW.lugar_compra, NEW.motivo);
+        END
+    '''),
+    ('trg_gastos_fts_baja', '''
+        AFTER DELETE ON gastos
+        BEGIN
+            INSERT INTO gastos_fts (gastos_fts, rowid, descripcion, lugar_compra, motivo)
+            VALUES ('delete', OLD.id, OLD.descripcion, OLD.lugar_compra, OLD.motivo);
+        END
+    '''),
+    ('trg_gastos_fts_cambio', '''
+        AFTER UPDATE OF descripcion, lugar_compra, motivo ON gastos
+        BEGIN
+            INSERT INTO gastos_fts (gastos_fts, rowid, descripcion, lugar_compra, motivo)
+            VALUES ('delete', OLD.id, OLD.descripcion, OLD.lugar_compra, OLD.motivo);
+            INSERT INTO gastos_fts (rowid, descripcion, lugar_compra, motivo)
+            VALUES (NEW.id, NEW.descripcion, NEW.lugar_compra, NEW.motivo);
+        END
+    '''),
+]
+
+# Columnas agregadas después de la primera versión del esquema
+COLUMNAS_AGREGADAS = [
+    ('suscriptores', 'email', 'TEXT'),
+    ('suscriptores', 'telefono', 'TEXT'),
+    ('suscriptores', 'direccion', 'TEXT'),
+    ('suscriptores', 'eliminado_en', 'TIMESTAMP'),
+    ('suscriptores', 'version', 'INTEGER NOT NULL DEFAULT 1'),
+]
+
+# Índices reemplazados en versiones posteriores del esquema
+INDICES_OBSOLETOS = [
+    'idx_suscriptores_nombre',
+]
+
+def huella_esquema():
+    """Calcular la huella del esquema (entero de 31 bits para PRAGMA user_version)"""
+    contenido = "\n".join(" ".join(sql.split()) for sql in TABLAS_SQL + INDICES_SQL)
+    contenido += "\n".join(nombre + " ".join(sql.split()) for nombre, sql in DISPARADORES_SQL)
+    contenido += repr(COLUMNAS_AGREGADAS) + repr(INDICES_OBSOLETOS)
+    # Abrir la base con un Python sin FTS5 (o al revés) vuelve a ajustar el esquema
+    if SOPORTA_FTS5:
+        contenido += " ".join(FTS_SQL.split())
+        contenido += "\n".join(nombre + " ".join(sql.split()) for nombre, sql in DISPARADORES_FTS_SQL)
+    return int(hashlib.sha256(contenido.encode()).hexdigest()[:7], 16)
+
+def esquema_vigente(conn):
+    """Indicar si la huella guardada en la base de datos coincide con el esquema actual"""
+    return conn.execute('PRAGMA user_version').fetchone()[0] == huella_esquema()
+
+class PoolAgotado(Exception):
+    """No hubo conexión disponible en el pool dentro del tiempo de espera"""
+
+class PoolLectura:
+    """Pool de conexiones de solo lectura para reportes
+
+    Las conexiones se abren con mode=ro y PRAGMA query_only, así que nunca
+    toman el bloqueo de escritura. Con la base de datos en modo WAL los
+    reportes no retrasan a crear_pago ni a ninguna otra escritura.
+    """
+
+    def __init__(self, nombre='lectura', tamano=4, timeout=10.0, limite_consulta=30.0):
+        self.nombre = nombre
+        self.tamano = tamano
+        self.timeout = timeout
+        self.limite_consulta = limite_consulta
+        self._disponibles = queue.LifoQueue()
+        self._creadas = 0
+        self._lock = threading.Lock()
+
+    def _abrir(self):
+        return get_read_connection(self.timeout)
+
+    def _tomar(self):
+        try:
+            return self._disponibles.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._creadas < self.tamano:
+                self._creadas += 1
+                try:
+                    return self._abrir()
+                except Exception:
+                    self._creadas -= 1
+                    raise
+        try:
+            return self._disponibles.get(timeout=self.timeout)
+        except queue.Empty:
+            metricas.incrementar(f'pool.{self.nombre}.agotado')
+            raise PoolAgotado(f"Pool de {self.nombre} sin conexiones disponibles")
+
+    @contextmanager
+    def conexion(self):
+        """Tomar una conexión; las consultas que superen limite_consulta se interrumpen"""
+        inicio = time.perf_counter()
+        conn = self._tomar()
+        tomada = time.perf_counter()
+        metricas.observar(f'pool.{self.nombre}.espera_ms', (tomada - inicio) * 1000)
+        limite = tomada + self.limite_consulta
+        conn.set_progress_handler(lambda: time.perf_counter() > limite, 10000)
+        try:
+            yield conn
+        finally:
+            conn.set_progress_handler(None, 0)
+            if conn.in_transaction:
+                conn.rollback()
+            metricas.observar(f'pool.{self.nombre}.uso_ms', (time.perf_counter() - tomada) * 1000)
+            self._disponibles.put(conn)
+
+    def cerrar(self):
+        """Cerrar las conexiones libres del pool"""
+        while True:
+            try:
+                conn = self._disponibles.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._creadas -= 1
+
+    def estado(self):
+        return {'tamano': self.tamano, 'abiertas': self._creadas, 'libres': self._disponibles.qsize()}
+
+# Pool exclusivo para reportes, separado de las escrituras
+pool_lectura = PoolLectura(
+    nombre='lectura',
+    tamano=int(os.environ.get('SISTEMA_POOL_LECTURA', '4')),
+    timeout=float(os.environ.get('SISTEMA_POOL_LECTURA_TIMEOUT', '10')),
+    limite_consulta=float(os.environ.get('SISTEMA_POOL_LECTURA_LIMITE', '30')),
+)
+
+def init_database(rapido=False):
+    """Inicializar la base de datos
+
+    Con rapido=True no se ejecuta ninguna sentencia del esquema si la huella
+    guardada coincide. Sin rapido las tablas, índices y disparadores se
+    vuelven a aplicar siempre (son idempotentes), así un arranque normal
+    repara un esquema dañado aunque la huella coincida. Devuelve True si el
+    esquema no estaba vigente y se actualizó.
     
-    # Crear índices para búsquedas
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_usuarios_email ON usuarios(email)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_suscriptores_numero_contrato ON suscriptores(numero_contrato)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_suscriptores_cedula ON suscriptores(cedula)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_suscriptores_email ON suscriptores(email)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_suscriptores_nombre ON suscriptores(nombre_completo)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pagos_suscriptor ON pagos(suscriptor_id)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pagos_fecha ON pagos(fecha_pago)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_recibos_pago ON recibos(pago_id)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_ingresos_pago ON ingresos(pago_id)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_gastos_fecha ON gastos(fecha)')
+    Es seguro llamarla desde varios procesos a la vez: el trabajo se hace
+    bajo BEGIN IMMEDIATE y la huella se vuelve a comprobar con el bloqueo.
+    """
+    conn = get_connection()
     
-    # Crear usuario admin por defecto si no existe
-    cursor.execute('SELECT COUNT(*) as count FROM usuarios WHERE email = ?', ('admin@gmail.com',))
-    if cursor.fetchone()['count'] == 0:
-        hashed_password = hashlib.sha256('admin123'.encode()).hexdigest()
-        cursor.execute('''
-            INSERT INTO usuarios (email, password, nombre_completo, rol)
-            VALUES (?, ?, ?, ?)
-        ''', ('admin@gmail.com', hashed_password, 'Administrador', 'admin'))
-        print("👤 Usuario admin creado: admin@gmail.com / admin123")
-    else:
-        # Verificar si la contraseña está hasheada correctamente
-        cursor.execute('SELECT password FROM usuarios WHERE email = ?', ('admin@gmail.com',))
-        current_password = cursor.fetchone()['password']
-        correct_hash = hashlib.sha256('admin123'.encode()).hexdigest()
+    try:
+        if rapido and esquema_vigente(conn):
+            return False
         
-        if current_password != correct_hash:
-            print("🔧 Corrigiendo contraseña del admin...")
-            cursor.execute('''
-                UPDATE usuarios SET password = ? WHERE email = ?
-            ''', (correct_hash, 'admin@gmail.com'))
+        cursor = conn.cursor()
+        
+        # En bases de datos nuevas, permitir PRAGMA incremental_vacuum
+        if cursor.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()[0] == 0:
+            cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        
+        # WAL permite que los lectores no bloqueen a los escritores (persistente)
+        cursor.execute('PRAGMA journal_mode = WAL')
+        
+        # Otro proceso pudo haber creado el esquema mientras esperábamos
+        cursor.execute('BEGIN IMMEDIATE')
+        vigente = esquema_vigente(conn)
+        if rapido and vigente:
             conn.commit()
-            print("✅ Contraseña del admin corregida")
+            return False
+        
+        # Crear tablas e índices
+        for sql in TABLAS_SQL:
+            cursor.execute(sql)
+        
+        # Agregar columnas faltantes en bases de datos antiguas
+        for tabla, columna, tipo in COLUMNAS_AGREGADAS:
+            columnas = [fila['name'] for fila in cursor.execute(f'PRAGMA table_info({tabla})')]
+            if columna not in columnas:
+                cursor.execute(f'ALTER TABLE {tabla} ADD COLUMN {columna} {tipo}')
+        
+        for sql in INDICES_SQL:
+            cursor.execute(sql)
+        for indice in INDICES_OBSOLETOS:
+            cursor.execute(f'DROP INDEX IF EXISTS {indice}')
+        # Se recrean para que un cambio en su definición llegue a bases existentes
+        for nombre, sql in DISPARADORES_SQL:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {nombre}')
+            cursor.execute(f'CREATE TRIGGER {nombre} {sql}')
+        for nombre, _ in DISPARADORES_FTS_SQL:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {nombre}')
+        if SOPORTA_FTS5:
+            cursor.execute(FTS_SQL)
+            for nombre, sql in DISPARADORES_FTS_SQL:
+                cursor.execute(f'CREATE TRIGGER {nombre} {sql}')
+            # Indexar los gastos existentes (o los escritos mientras los disparadores no estaban)
+            if not vigente:
+                cursor.execute("INSERT INTO gastos_fts (gastos_fts) VALUES ('rebuild')")
+        
+        # Crear usuario admin por defecto si no existe
+        cursor.execute('SELECT COUNT(*) as count FROM usuarios WHERE email = ?', ('admin@gmail.com',))
+        if cursor.fetchone()['count'] == 0:
+            hashed_password = hashlib.sha256('admin123'.encode()).hexdigest()
+            cursor.execute('''
+                INSERT INTO usuarios (email, password, nombre_completo, rol)
+                VALUES (?, ?, ?, ?)
+            ''', ('admin@gmail.com', hashed_password, 'Administrador', 'admin'))
+            print("👤 Usuario admin creado: admin@gmail.com / admin123")
+        else:
+            # Verificar si la contraseña está hasheada correctamente
+            cursor.execute('SELECT password FROM usuarios WHERE email = ?', ('admin@gmail.com',))
+            current_password = cursor.fetchone()['password']
+            correct_hash = hashlib.sha256('admin123'.encode()).hexdigest()
+            
+            if current_password != correct_hash:
+                print("🔧 Corrigiendo contraseña del admin...")
+                cursor.execute('''
+                    UPDATE usuarios SET password = ? WHERE email = ?
+                ''', (correct_hash, 'admin@gmail.com'))
+                print("✅ Contraseña del admin corregida")
+        
+        # Guardar la huella para que el próximo arranque rápido omita este trabajo
+        cursor.execute(f'PRAGMA user_version = {huella_esquema()}')
+        conn.commit()
+        return not vigente
+    finally:
+        conn.close()
+
+# Tabla huérfana -> (tabla padre, columna que la referencia)
+HUERFANOS = {
+    'pagos': ('suscriptores', 'suscriptor_id'),
+    'ingresos': ('pagos', 'pago_id'),
+    'recibos': ('pagos', 'pago_id'),
+}
+
+def limpiar_huerfanos(lote=1000):
+    """Eliminar pagos sin suscriptor e ingresos y recibos sin pago, en lotes
+
+    Con las claves foráneas activas ya no se crean huérfanos; esto limpia los
+    que quedaron en bases de datos anteriores. Cada lote se confirma por
+    separado para no retener el bloqueo de escritura. Devuelve la cantidad
+    eliminada por tabla.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    eliminados = {tabla: 0 for tabla in HUERFANOS}
     
-    conn.commit()
-    conn.close()
+    try:
+        for tabla, (padre, columna) in HUERFANOS.items():
+            while True:
+                cursor.execute(f'''
+                    DELETE FROM {tabla} WHERE id IN (
+                        SELECT id FROM {tabla}
+                        WHERE NOT EXISTS (SELECT 1 FROM {padre} WHERE {padre}.id = {tabla}.{columna})
+                        LIMIT ?
+                    )
+                ''', (lote,))
+                conn.commit()
+                eliminados[tabla] += cursor.rowcount
+                if cursor.rowcount < lote:
+                    break
+        return eliminados
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
-def generar_numero_recibo():
-    """Generar número de recibo automático"""
+def purgar_eliminados(lote=500, pausa=0.05):
+    """Eliminar de verdad los suscriptores marcados como eliminados
+
+    Los pagos se borran de a `lote` por transacción (recibos e ingresos caen
+    en cascada), con una pausa entre lotes para que los cajeros no esperen el
+    bloqueo de escritura. El suscriptor se borra cuando ya no le quedan pagos.
+    Devuelve la cantidad eliminada de suscriptores y de pagos.
+    """
     conn = get_connection()
     cursor = conn.cursor()
+    eliminados = {'suscriptores': 0, 'pagos': 0}
     
+    try:
+        cursor.execute('SELECT id FROM suscriptores WHERE eliminado_en IS NOT NULL ORDER BY eliminado_en')
+        for (suscriptor_id,) in cursor.fetchall():
+            while True:
+                cursor.execute('''
+                    DELETE FROM pagos WHERE id IN (
+                        SELECT id FROM pagos WHERE suscriptor_id = ? LIMIT ?
+                    )
+                ''', (suscriptor_id, lote))
+                conn.commit()
+                eliminados['pagos'] += cursor.rowcount
+                if cursor.rowcount < lote:
+                    break
+                time.sleep(pausa)
+            cursor.execute('DELETE FROM suscriptores WHERE id = ? AND eliminado_en IS NOT NULL', (suscriptor_id,))
+            conn.commit()
+            eliminados['suscriptores'] += cursor.rowcount
+        return eliminados
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def generar_numero_recibo(cursor=None):
+    """Generar número de recibo automático
+
+    Con cursor se calcula dentro de la transacción que va a insertar el
+    recibo, así dos escrituras simultáneas no obtienen el mismo número.
+    """
+    conn = get_connection() if cursor is None else None
+    if conn is not None:
+        cursor = conn.cursor()
+
     fecha_str = datetime.now().strftime("%Y%m%d")
-    
+
+    # El mayor contador del día y no la cantidad: tras eliminar un recibo contar repetiría un número
     cursor.execute('''
-        SELECT COUNT(*) as contador 
-        FROM recibos 
-        WHERE numero_recibo LIKE ?
-    ''', (f"REC-{fecha_str}-%",))
-    
+        SELECT COALESCE(MAX(CAST(substr(numero_recibo, 14) AS INTEGER)), 0) as contador
+        FROM recibos
+        WHERE numero_recibo >= ? AND numero_recibo < ?
+    ''', (f"REC-{fecha_str}-", f"REC-{fecha_str}."))
+
     contador = cursor.fetchone()['contador'] + 1
     numero_recibo = f"REC-{fecha_str}-{contador:05d}"
-    
-    conn.close()
+
+    if conn is not None:
+        conn.close()
     return numero_recibo
 
-def crear_recibo_y_ingreso(pago_id: int, suscriptor_nombre: str, valor: float, fecha_pago: date):
-    """Crear recibo e ingreso automáticamente"""
+def crear_recibo_y_ingreso(pago_id: int, suscriptor_nombre: str, valor: float, fecha_pago: date, conn=None):
+    """Crear recibo e ingreso automáticamente
+
+    Con conn se escriben en la transacción en curso del llamador (la que
+    insertó el pago) y el commit queda a su cargo: el pago, su recibo y su
+    ingreso se confirman juntos o no se confirma ninguno.
+    """
+    if conn is not None:
+        _insertar_recibo_e_ingreso(conn.cursor(), pago_id, suscriptor_nombre, valor, fecha_pago)
+        return
+    
     conn = get_connection()
     cursor = conn.cursor()
     
     try:
-        # Generar número de recibo
-        numero_recibo = generar_numero_recibo()
-        
-        # Crear recibo
-        cursor.execute('''
-            INSERT INTO recibos (pago_id, numero_recibo, fecha_emision)
-            VALUES (?, ?, ?)
-        ''', (pago_id, numero_recibo, datetime.utcnow()))
-        
-        # Crear ingreso
-        origen = f"Pago de suscriptor: {suscriptor_nombre}"
-        cursor.execute('''
-            INSERT INTO ingresos (pago_id, monto, fecha, origen, fecha_creacion)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (pago_id, valor, fecha_pago, origen, datetime.utcnow()))
-        
+        # Generar número de recibo con el bloqueo de escritura ya tomado
+        cursor.execute('BEGIN IMMEDIATE')
+        _insertar_recibo_e_ingreso(cursor, pago_id, suscriptor_nombre, valor, fecha_pago)
         conn.commit()
     except Exception as e:
         conn.rollback()
@@ -186,6 +613,22 @@ def crear_recibo_y_ingreso(pago_id: int, suscriptor_nombre: str, valor: float, f
     finally:
         conn.close()
 
+def _insertar_recibo_e_ingreso(cursor, pago_id, suscriptor_nombre, valor, fecha_pago):
+    numero_recibo = generar_numero_recibo(cursor)
+    
+    # Crear recibo
+    cursor.execute('''
+        INSERT INTO recibos (pago_id, numero_recibo, fecha_emision)
+        VALUES (?, ?, ?)
+    ''', (pago_id, numero_recibo, datetime.utcnow()))
+    
+    # Crear ingreso
+    origen = f"Pago de suscriptor: {suscriptor_nombre}"
+    cursor.execute('''
+        INSERT INTO ingresos (pago_id, monto, fecha, origen, fecha_creacion)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (pago_id, valor, fecha_pago, origen, datetime.utcnow()))
+
 def get_database_path():
     """Obtener ruta de la base de datos"""
     return DB_PATH
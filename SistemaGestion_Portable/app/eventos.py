@@ -0,0 +1,281 @@
+"""
+Eventos en vivo para el panel y las cajas (GET /eventos, server-sent events)
+Cada proceso vigila la base con PRAGMA data_version, que cambia con cada
+commit de cualquier conexión (de este worker, de otro o del mantenimiento).
+Cuando cambia, lee una sola vez los pagos, gastos y eliminaciones nuevos, y
+el resumen del panel, y reparte los eventos ya codificados a todos los
+clientes conectados: el costo por cambio no depende de cuántos haya.
+
+Los eventos se leen por id, así que el id de cada evento es la posición
+(último pago, último gasto, última eliminación) después de él. Un cliente
+que se reconecta con Last-Event-ID recibe lo que se perdió leyéndolo de la
+base, aunque se conecte a otro worker.
+
+Cada cliente tiene una cola de BUFFER eventos. Si no lee y la cola se llena,
+se le envía el cierre y se lo desconecta sin frenar a los demás; el
+navegador se reconecta solo y recupera lo perdido con su Last-Event-ID.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+
+from database_simple import get_read_connection, pool_lectura
+from metricas import metricas
+from resumen_panel import resumen_panel
+
+# Cada cuánto se mira data_version si ninguna escritura de este proceso avisó antes
+INTERVALO = float(os.environ.get("SISTEMA_EVENTOS_INTERVALO", "0.5"))
+# Eventos pendientes por cliente antes de desconectarlo por lento
+BUFFER = int(os.environ.get("SISTEMA_EVENTOS_BUFFER", "256"))
+MAX_CLIENTES = int(os.environ.get("SISTEMA_EVENTOS_MAX_CLIENTES", "200"))
+# Comentario periódico para que los proxies no corten la conexión inactiva
+PING = float(os.environ.get("SISTEMA_EVENTOS_PING", "15"))
+# Con más filas nuevas que esto en una tabla se pide recargar en lugar de enviarlas
+MAX_FILAS = 100
+
+CONSULTAS = (
+    ('pago', 'SELECT * FROM pagos WHERE id > ? AND id <= ? ORDER BY id LIMIT ?'),
+    ('gasto', 'SELECT * FROM gastos WHERE id > ? AND id <= ? ORDER BY id LIMIT ?'),
+    ('eliminado', 'SELECT id, tabla, fila_id FROM eliminaciones WHERE id > ? AND id <= ? ORDER BY id LIMIT ?'),
+)
+
+class DemasiadosClientes(Exception):
+    """Se alcanzó el máximo de conexiones de eventos de este proceso"""
+
+def _id(cursor):
+    return '.'.join(str(valor) for valor in cursor)
+
+def _leer_id(ultimo_id):
+    """Cursor de un Last-Event-ID, o None si no tiene el formato esperado"""
+    try:
+        cursor = tuple(int(valor) for valor in ultimo_id.split('.'))
+    except (AttributeError, ValueError):
+        return None
+    return cursor if len(cursor) == len(CONSULTAS) else None
+
+def _evento(cursor, tipo, datos):
+    return (f'id: {_id(cursor)}\nevent: {tipo}\ndata: '
+            f'{json.dumps(datos, ensure_ascii=False, separators=(",", ":"), default=str)}\n\n').encode('utf-8')
+
+def _posicion(conn):
+    return tuple(conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM {tabla}').fetchone()[0]
+                 for tabla in ('pagos', 'gastos', 'eliminaciones'))
+
+class _Cliente:
+    __slots__ = ('cola',)
+
+    def __init__(self, buffer):
+        # None en la cola significa que el cliente debe cerrarse
+        self.cola = asyncio.Queue(maxsize=buffer + 1)
+
+class Difusor:
+    """Lectura única de los cambios y reparto a colas acotadas por cliente"""
+
+    def __init__(self, nombre='eventos', pool=pool_lectura, intervalo=INTERVALO, buffer=BUFFER,
+                 max_clientes=MAX_CLIENTES):
+        self.nombre = nombre
+        self.pool = pool
+        self.intervalo = intervalo
+        self.buffer = buffer
+        self.max_clientes = max_clientes
+        self._clientes = set()
+        self._lock = threading.Lock()
+        self._conn_version = None
+        self._leyendo = None
+        self._aviso = None
+        self._loop = None
+        self._tarea = None
+        # Lo ya repartido: data_version, posición y última modificación de suscriptores
+        self._version = None
+        self._cursor = None
+        self._marca = None
+        self.conexiones = 0
+        self.expulsados = 0
+        self.rechazados = 0
+        self.eventos = 0
+        self.entregas = 0
+
+    def iniciar(self):
+        """Empezar a vigilar la base; se llama desde el ciclo de vida de la aplicación"""
+        self._loop = asyncio.get_running_loop()
+        self._leyendo = asyncio.Lock()
+        self._aviso = asyncio.Event()
+        self._tarea = self._loop.create_task(self._vigilar())
+
+    async def detener(self):
+        """Dejar de vigilar y cerrar los flujos que sigan abiertos al apagar la aplicación
+
+        uvicorn apaga la aplicación después de que terminen las respuestas en
+        curso, y las de /eventos no terminan solas: el servidor las cierra al
+        empezar su apagado (ver main), antes de esperarlas.
+        """
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+        self.cerrar_todos()
+        with self._lock:
+            if self._conn_version is not None:
+                self._conn_version.close()
+                self._conn_version = None
+
+    def avisar(self):
+        """Mirar la base ya, sin esperar al intervalo (tras una escritura); se puede llamar desde cualquier hilo"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._aviso.set)
+
+    def _version_actual(self):
+        with self._lock:
+            if self._conn_version is None:
+                self._conn_version = get_read_connection()
+            return self._conn_version.execute('PRAGMA data_version').fetchone()[0]
+
+    def _estado_actual(self):
+        version = self._version_actual()
+        with self.pool.conexion() as conn:
+            conn.execute('BEGIN')
+            try:
+                return version, _posicion(conn), conn.execute('SELECT MAX(fecha_actualizacion) FROM suscriptores').fetchone()[0]
+            finally:
+                conn.rollback()
+
+    def _cambios(self, desde, hasta=None):
+        """Eventos entre dos posiciones, leídos en una transacción; devuelve (eventos, posición, marca)
+
+        Sin hasta se lee hasta lo último confirmado y se agregan el aviso de
+        suscriptores modificados y el resumen del panel si hubo movimientos.
+        """
+        with self.pool.conexion() as conn:
+            conn.execute('BEGIN')
+            try:
+                if hasta is None:
+                    posicion, vivo = _posicion(conn), True
+                    marca = conn.execute('SELECT MAX(fecha_actualizacion) FROM suscriptores').fetchone()[0]
+                else:
+                    posicion, vivo, marca = hasta, False, None
+                cursor = list(desde)
+                eventos = []
+                for indice, (tipo, sql) in enumerate(CONSULTAS):
+                    filas = conn.execute(sql, (desde[indice], posicion[indice], MAX_FILAS + 1)).fetchall()
+                    if len(filas) > MAX_FILAS:
+                        # Una importación o una purga: el cliente recarga los listados
+                        return [_evento(posicion, 'recargar', {})], posicion, marca
+                    for fila in filas:
+                        cursor[indice] = fila['id']
+                        datos = dict(fila)
+                        if tipo == 'eliminado':
+                            datos = {'tabla': fila['tabla'], 'id': fila['fila_id']}
+                        eventos.append((tuple(cursor), tipo, datos))
+            finally:
+                conn.rollback()
+        eventos = [_evento(*evento) for evento in eventos]
+        if vivo and marca != self._marca:
+            eventos.append(_evento(posicion, 'suscriptores', {'actualizado': marca}))
+        if vivo and posicion != desde:
+            eventos.append(_evento(posicion, 'balance', resumen_panel.obtener()))
+        return eventos, posicion, marca
+
+    async def _vigilar(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._aviso.wait(), self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+            self._aviso.clear()
+            if not self._clientes:
+                # Sin clientes no se lee nada; el próximo en conectarse fija la posición
+                self._cursor = None
+                continue
+            try:
+                async with self._leyendo:
+                    version = await asyncio.to_thread(self._version_actual)
+                    if version == self._version or self._cursor is None:
+                        continue
+                    inicio = time.perf_counter()
+                    eventos, self._cursor, self._marca = await asyncio.to_thread(self._cambios, self._cursor)
+                    self._version = version
+                    metricas.observar(f'{self.nombre}.lectura_ms', (time.perf_counter() - inicio) * 1000)
+                    self._repartir(eventos)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error leyendo eventos: {e}")
+
+    def _repartir(self, eventos):
+        if not eventos:
+            return
+        self.eventos += len(eventos)
+        for cliente in list(self._clientes):
+            for evento in eventos:
+                if cliente.cola.qsize() >= self.buffer:
+                    # Cliente lento: se lo desconecta en lugar de acumular sin límite
+                    self.expulsados += 1
+                    self._cerrar(cliente)
+                    break
+                cliente.cola.put_nowait(evento)
+                self.entregas += 1
+
+    def cerrar_todos(self):
+        """Enviar el cierre a todos los clientes; se llama desde el bucle de eventos"""
+        for cliente in list(self._clientes):
+            self._cerrar(cliente)
+
+    def _cerrar(self, cliente):
+        self._clientes.discard(cliente)
+        while not cliente.cola.empty():
+            cliente.cola.get_nowait()
+        cliente.cola.put_nowait(None)
+
+    async def conectar(self, ultimo_id=None):
+        """Registrar un cliente; devuelve (cliente, eventos perdidos desde ultimo_id)"""
+        if len(self._clientes) >= self.max_clientes:
+            self.rechazados += 1
+            raise DemasiadosClientes(f"Hay {self.max_clientes} conexiones de eventos abiertas; intente más tarde")
+        async with self._leyendo:
+            if self._cursor is None:
+                self._version, self._cursor, self._marca = await asyncio.to_thread(self._estado_actual)
+            cliente = _Cliente(self.buffer)
+            self._clientes.add(cliente)
+            self.conexiones += 1
+            desde = _leer_id(ultimo_id)
+            perdidos = []
+            if desde is not None and desde != self._cursor:
+                perdidos, _, _ = await asyncio.to_thread(self._cambios, desde, self._cursor)
+        return cliente, perdidos
+
+    async def flujo(self, cliente, perdidos):
+        """Cuerpo de la respuesta text/event-stream de un cliente"""
+        try:
+            yield b'retry: 2000\n\n'
+            for evento in perdidos:
+                yield evento
+            while True:
+                try:
+                    evento = await asyncio.wait_for(cliente.cola.get(), PING)
+                except asyncio.TimeoutError:
+                    yield b': ping\n\n'
+                    continue
+                if evento is None:
+                    return
+                yield evento
+        finally:
+            self._clientes.discard(cliente)
+
+    def estado(self):
+        return {
+            'clientes': len(self._clientes),
+            'conexiones': self.conexiones,
+            'expulsados': self.expulsados,
+            'rechazados': self.rechazados,
+            'eventos': self.eventos,
+            'entregas': self.entregas,
+            'posicion': _id(self._cursor) if self._cursor else None,
+        }
+
+# Instancia única usada por la aplicación
+difusor = Difusor()
@@ -0,0 +1,95 @@
+"""
+Formato de las respuestas de listados y exportaciones: JSON o MessagePack
+Se elige con la cabecera Accept: application/msgpack (o application/x-msgpack)
+con mayor o igual preferencia que JSON pide MessagePack, que codifica mucho más
+rápido y ocupa menos. MessagePack es opcional (pip install msgpack): sin el
+paquete se responde JSON, o 406 si el cliente no acepta JSON.
+
+Las filas van como mapas campo -> valor, con los valores tal como están en la
+base de datos (fechas como texto), igual que en JSON.
+"""
+import json
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+TIPOS_MSGPACK = (MSGPACK, 'application/x-msgpack')
+TIPOS_JSON = (JSON, 'application/*', '*/*')
+
+class FormatoNoAceptable(Exception):
+    """El cliente solo acepta MessagePack y el servidor no lo tiene instalado"""
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        return None
+    return msgpack
+
+def _preferencias(accept):
+    """'application/msgpack, application/json;q=0.5' -> {'application/msgpack': 1.0, 'application/json': 0.5}"""
+    preferencias = {}
+    for parte in (accept or '').split(','):
+        tipo, *parametros = [p.strip() for p in parte.split(';')]
+        if not tipo:
+            continue
+        calidad = 1.0
+        for parametro in parametros:
+            nombre, _, valor = parametro.partition('=')
+            if nombre.strip() == 'q':
+                try:
+                    calidad = float(valor)
+                except ValueError:
+                    calidad = 0.0
+        preferencias[tipo.lower()] = calidad
+    return preferencias
+
+def elegir(accept):
+    """Formato de la respuesta (JSON o MSGPACK) según la cabecera Accept; sin Accept, JSON"""
+    preferencias = _preferencias(accept)
+    calidad_msgpack = max(preferencias.get(tipo, 0.0) for tipo in TIPOS_MSGPACK)
+    calidad_json = max(preferencias.get(tipo, 0.0) for tipo in TIPOS_JSON)
+    if calidad_msgpack <= 0 or calidad_msgpack < calidad_json:
+        return JSON
+    if _msgpack() is None:
+        if calidad_json > 0:
+            return JSON
+        raise FormatoNoAceptable("El servidor no tiene MessagePack; instálelo con pip install msgpack "
+                                 "o acepte application/json")
+    return MSGPACK
+
+def _mapas(filas, campos):
+    """Filas de sqlite3 (Row) como dicts con esos campos; los que la fila no tiene van en None"""
+    if not filas:
+        return []
+    columnas = filas[0].keys()
+    if tuple(columnas) == tuple(campos):
+        # Consulta con exactamente esos campos (la exportación): dict(zip) cuesta la mitad
+        return [dict(zip(campos, fila)) for fila in filas]
+    presentes = [(campo, campo in columnas) for campo in campos]
+    return [{campo: fila[campo] if esta else None for campo, esta in presentes} for fila in filas]
+
+def empaquetar(filas, campos):
+    """Listado completo como un arreglo MessagePack de mapas"""
+    return _msgpack().packb(_mapas(filas, campos))
+
+def codificar(bloques, campos, formato, total):
+    """Generador de bytes para respuestas en streaming
+
+    bloques entrega listas de filas (por ejemplo cursor.fetchmany); el resultado
+    es un solo arreglo JSON, o un arreglo MessagePack de `total` elementos que
+    el cliente puede leer completo (unpackb) o fila a fila (Unpacker).
+    """
+    if formato == MSGPACK:
+        packer = _msgpack().Packer()
+        yield packer.pack_array_header(total)
+        for filas in bloques:
+            yield b''.join(packer.pack(fila) for fila in _mapas(filas, campos))
+        return
+    separador = b'['
+    for filas in bloques:
+        if filas:
+            # Mismo formato que JSONResponse: UTF-8 sin escapar y sin espacios
+            texto = json.dumps(_mapas(filas, campos), ensure_ascii=False, separators=(',', ':'))
+            yield separador + texto[1:-1].encode('utf-8')
+            separador = b','
+    yield b'[]' if separador == b'[' else b']'
@@ -0,0 +1,122 @@
+"""
+Almacén de claves de idempotencia (encabezado Idempotency-Key)
+Guarda la respuesta de cada escritura para devolverla tal cual si el cliente
+reintenta, sin volver a tocar pagos, recibos ni ingresos.
+"""
+import hashlib
+import json
+import os
+import time
+
+from database_simple import get_connection
+from metricas import metricas
+
+# Tiempo de vida de una clave y cantidad máxima de claves guardadas
+TTL = int(os.environ.get("SISTEMA_IDEMPOTENCIA_TTL", str(24 * 3600)))
+MAX_CLAVES = int(os.environ.get("SISTEMA_IDEMPOTENCIA_MAX", "10000"))
+
+# Segundos tras los cuales una reserva sin respuesta se considera abandonada
+RESERVA_ABANDONADA = 60
+
+class ClaveEnProceso(Exception):
+    """Otra petición con la misma clave todavía se está procesando"""
+
+class ClaveReutilizada(Exception):
+    """La clave ya se usó con otra ruta u otro cuerpo"""
+
+def huella(datos):
+    """Huella estable del cuerpo de la petición"""
+    return hashlib.sha256(json.dumps(datos, sort_keys=True, default=str).encode()).hexdigest()
+
+def reservar(clave, ruta, huella_cuerpo):
+    """Reservar la clave o devolver la respuesta guardada
+
+    Devuelve None si la petición debe procesarse, o (estado, cuerpo) si ya
+    existe una respuesta para esta clave.
+    """
+    conn = get_connection()
+    ahora = time.time()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR IGNORE INTO idempotencia (clave, ruta, huella, fecha_creacion)
+            VALUES (?, ?, ?, ?)
+        ''', (clave, ruta, huella_cuerpo, ahora))
+        if cursor.rowcount:
+            conn.commit()
+            return None
+
+        cursor.execute('SELECT * FROM idempotencia WHERE clave = ?', (clave,))
+        registro = cursor.fetchone()
+        if registro['ruta'] != ruta or registro['huella'] != huella_cuerpo:
+            raise ClaveReutilizada("La clave de idempotencia ya se usó con otra petición")
+
+        if registro['estado'] is None:
+            # Reintentar una reserva abandonada (por ejemplo, el proceso se cerró)
+            cursor.execute('''
+                UPDATE idempotencia SET fecha_creacion = ?
+                WHERE clave = ? AND estado IS NULL AND fecha_creacion < ?
+            ''', (ahora, clave, ahora - RESERVA_ABANDONADA))
+            conn.commit()
+            if cursor.rowcount:
+                return None
+            raise ClaveEnProceso("Una petición con esta clave de idempotencia está en proceso")
+
+        if registro['fecha_creacion'] < ahora - TTL:
+            # Clave vencida aún no purgada: se procesa como nueva
+            cursor.execute('''
+                UPDATE idempotencia SET estado = NULL, respuesta = NULL, fecha_creacion = ?
+                WHERE clave = ?
+            ''', (ahora, clave))
+            conn.commit()
+            return None
+
+        metricas.incrementar('idempotencia.repeticiones')
+        return registro['estado'], json.loads(registro['respuesta'])
+    finally:
+        conn.close()
+
+def completar(clave, estado, cuerpo, conn=None):
+    """Guardar la respuesta final de una clave reservada
+
+    Con conn se guarda en la transacción en curso del llamador (la de la
+    escritura) y el commit queda a su cargo.
+    """
+    if conn is not None:
+        conn.execute('UPDATE idempotencia SET estado = ?, respuesta = ? WHERE clave = ?',
+                     (estado, json.dumps(cuerpo), clave))
+        return
+    conn = get_connection()
+    try:
+        conn.execute('UPDATE idempotencia SET estado = ?, respuesta = ? WHERE clave = ?',
+                     (estado, json.dumps(cuerpo), clave))
+        conn.commit()
+    finally:
+        conn.close()
+
+def liberar(clave):
+    """Quitar la reserva para que el cliente pueda reintentar (errores 5xx)"""
+    conn = get_connection()
+    try:
+        conn.execute('DELETE FROM idempotencia WHERE clave = ? AND estado IS NULL', (clave,))
+        conn.commit()
+    finally:
+        conn.close()
+
+def purgar():
+    """Eliminar claves vencidas y, si sobran, las más antiguas"""
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM idempotencia WHERE fecha_creacion < ?', (time.time() - TTL,))
+        vencidas = cursor.rowcount
+        cursor.execute('''
+            DELETE FROM idempotencia WHERE clave IN (
+                SELECT clave FROM idempotencia ORDER BY fecha_creacion DESC LIMIT -1 OFFSET ?
+            )
+        ''', (MAX_CLAVES,))
+        desalojadas = cursor.rowcount
+        conn.commit()
+        return {'vencidas': vencidas, 'desalojadas': desalojadas}
+    finally:
+        conn.close()
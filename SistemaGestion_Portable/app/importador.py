@@ -0,0 +1,347 @@
+"""
+Importador masivo de suscriptores, pagos y gastos desde CSV o XLSX
+Lee el archivo en streaming, valida por bloques (columna a columna y con
+una consulta de duplicados por bloque), confirma cada bloque por separado
+y escribe las filas rechazadas en un archivo CSV aparte.
+
+Uso por consola:
+    python importador.py pagos historial.csv [--tamano-lote 50000] [--rechazos rechazos.csv]
+    python importador.py suscriptores contratos.xlsx --hoja Hoja1
+"""
+import csv
+import json
+import os
+import sys
+import time
+from datetime import date, datetime
+from itertools import islice
+
+import lotes
+from database_simple import BASE_DIR, get_connection
+from metricas import metricas
+
+TAMANO_LOTE = 50000
+
+IMPORTACIONES_DIR = os.path.join(BASE_DIR, "importaciones")
+
+def a_texto(valor):
+    texto = str(valor).strip() if valor is not None else ""
+    if not texto:
+        raise ValueError("valor vacío")
+    return texto
+
+def a_texto_opcional(valor):
+    texto = str(valor).strip() if valor is not None else ""
+    return texto or None
+
+def a_entero(valor):
+    if isinstance(valor, int):
+        return valor
+    return int(float(a_texto(valor)))
+
+def a_decimal(valor):
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    texto = a_texto(valor).replace(" ", "")
+    # Formato latino: 1.234,56
+    if "," in texto:
+        texto = texto.replace(".", "").replace(",", ".")
+    return float(texto)
+
+def a_decimal_opcional(valor):
+    return a_decimal(valor) if a_texto_opcional(valor) else None
+
+def a_fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date().isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    texto = a_texto(valor)
+    for formato in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(texto[:10], formato).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"fecha no reconocida: {texto}")
+
+# Columnas por entidad: nombre -> (conversor, obligatoria)
+COLUMNAS = {
+    'suscriptores': {
+        'numero_contrato': (a_texto, True),
+        'cedula': (a_texto, True),
+        'nombre_completo': (a_texto, True),
+        'email': (a_texto, True),
+        'telefono': (a_texto_opcional, False),
+        'direccion': (a_texto_opcional, False),
+        'fecha_suscripcion': (a_fecha, True),
+    },
+    'pagos': {
+        'suscriptor_id': (a_entero, True),
+        'mes': (a_entero, True),
+        'anio': (a_entero, True),
+        'fecha_pago': (a_fecha, True),
+        'valor': (a_decimal, True),
+        'tipo_pago': (lambda v: a_texto(v).lower(), True),
+        'monto_efectivo': (a_decimal_opcional, False),
+        'entidad_bancaria': (a_texto_opcional, False),
+        'nombre_transferente': (a_texto_opcional, False),
+    },
+    'gastos': {
+        'tipo_gasto': (a_texto, True),
+        'descripcion': (a_texto, True),
+        'valor': (a_decimal, True),
+        'fecha': (a_fecha, True),
+        'lugar_compra': (a_texto_opcional, False),
+        'motivo': (a_texto_opcional, False),
+    },
+}
+
+INSERTAR = {
+    'suscriptores': lotes.insertar_suscriptores,
+    'pagos': lotes.insertar_pagos,
+    'gastos': lotes.insertar_gastos,
+}
+
+TABLAS_AFECTADAS = {
+    'suscriptores': ('suscriptores',),
+    'pagos': ('pagos', 'recibos', 'ingresos'),
+    'gastos': ('gastos',),
+}
+
+# Índices que la validación de duplicados necesita durante la carga
+INDICES_VALIDACION = {
+    'idx_suscriptores_numero_contrato',
+    'idx_suscriptores_cedula',
+    'idx_suscriptores_email',
+}
+
+# Perfil de carga masiva, solo para la conexión del importador
+PRAGMAS_CARGA = (
+    'PRAGMA synchronous = OFF',
+    'PRAGMA cache_size = -200000',
+    'PRAGMA temp_store = MEMORY',
+)
+
+class ArchivoInvalido(Exception):
+    """El archivo no tiene el formato o las columnas esperadas"""
+
+def leer_csv(ruta):
+    """Generador de (encabezados, filas) leyendo el CSV en streaming"""
+    archivo = open(ruta, newline='', encoding='utf-8-sig')
+    try:
+        muestra = archivo.read(4096)
+        archivo.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+        except csv.Error:
+            dialecto = csv.excel
+        lector = csv.reader(archivo, dialecto)
+        encabezados = next(lector, None)
+        if not encabezados:
+            raise ArchivoInvalido("El archivo está vacío")
+        yield encabezados
+        yield from lector
+    finally:
+        archivo.close()
+
+def leer_xlsx(ruta, hoja=None):
+    """Generador de (encabezados, filas) leyendo el XLSX en modo solo lectura"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ArchivoInvalido("Para importar XLSX instale openpyxl: pip install openpyxl")
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        filas = (libro[hoja] if hoja else libro.active).iter_rows(values_only=True)
+        encabezados = next(filas, None)
+        if not encabezados:
+            raise ArchivoInvalido("La hoja está vacía")
+        yield [str(e or '') for e in encabezados]
+        for fila in filas:
+            if any(celda is not None for celda in fila):
+                yield list(fila)
+    finally:
+        libro.close()
+
+def leer(ruta, formato=None, hoja=None):
+    formato = formato or os.path.splitext(ruta)[1].lstrip('.').lower()
+    if formato in ('xlsx', 'xlsm'):
+        return leer_xlsx(ruta, hoja)
+    if formato in ('csv', 'txt', ''):
+        return leer_csv(ruta)
+    raise ArchivoInvalido(f"Formato no soportado: {formato}")
+
+def convertir_bloque(entidad, encabezados, filas, inicio):
+    """Convertir un bloque columna a columna; devuelve (items, filas_items, rechazos)"""
+    columnas = COLUMNAS[entidad]
+    posiciones = {nombre.strip().lower(): i for i, nombre in enumerate(encabezados)}
+    errores = [None] * len(filas)
+
+    valores = {}
+    for nombre, (conversor, obligatoria) in columnas.items():
+        posicion = posiciones.get(nombre)
+        if posicion is None:
+            valores[nombre] = [None] * len(filas)
+            continue
+        convertidos = []
+        for n, fila in enumerate(filas):
+            celda = fila[posicion] if posicion < len(fila) else None
+            try:
+                convertidos.append(conversor(celda))
+            except (ValueError, TypeError) as e:
+                convertidos.append(None)
+                if errores[n] is None:
+                    errores[n] = f"{nombre}: {e}"
+        valores[nombre] = convertidos
+
+    items, numeros, rechazos = [], [], []
+    nombres = list(columnas)
+    for n, fila in enumerate(filas):
+        if errores[n]:
+            rechazos.append((inicio + n, fila, errores[n]))
+        else:
+            items.append({nombre: valores[nombre][n] for nombre in nombres})
+            numeros.append(inicio + n)
+    return items, numeros, rechazos
+
+def resolver_contratos(conn, encabezados, filas):
+    """Completar suscriptor_id a partir de numero_contrato cuando el archivo no trae el id"""
+    posiciones = {nombre.strip().lower(): i for i, nombre in enumerate(encabezados)}
+    posicion = posiciones['numero_contrato']
+    contratos = sorted({str(f[posicion]).strip() for f in filas if posicion < len(f) and f[posicion] is not None})
+    cursor = conn.execute('''
+        SELECT numero_contrato, id FROM suscriptores
+        WHERE numero_contrato IN (SELECT value FROM json_each(?)) AND eliminado_en IS NULL
+    ''', (json.dumps(contratos),))
+    ids = dict(cursor.fetchall())
+    return [list(f) + [ids.get(str(f[posicion]).strip()) if posicion < len(f) and f[posicion] is not None else None]
+            for f in filas]
+
+def validar_encabezados(entidad, encabezados):
+    presentes = {e.strip().lower() for e in encabezados}
+    if entidad == 'pagos' and 'suscriptor_id' not in presentes and 'numero_contrato' in presentes:
+        presentes.add('suscriptor_id')
+    faltantes = [nombre for nombre, (_, obligatoria) in COLUMNAS[entidad].items()
+                 if obligatoria and nombre not in presentes]
+    if faltantes:
+        raise ArchivoInvalido(f"Faltan columnas obligatorias: {', '.join(faltantes)}")
+
+def diferir_indices(conn, tablas):
+    """Eliminar índices secundarios de las tablas; devuelve su SQL y la huella del esquema para restaurarlos
+
+    La huella se borra en la misma transacción que los DROP INDEX: si la
+    importación se interrumpe antes de recrearlos, el siguiente init_database
+    (aunque sea rápido) ve el esquema desactualizado y los vuelve a crear.
+    """
+    huella = conn.execute('PRAGMA user_version').fetchone()[0]
+    cursor = conn.execute(f'''
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({','.join('?' * len(tablas))})
+    ''', tablas)
+    indices = [(nombre, sql) for nombre, sql in cursor.fetchall() if nombre not in INDICES_VALIDACION]
+    conn.execute('BEGIN IMMEDIATE')
+    conn.execute('PRAGMA user_version = 0')
+    for nombre, _ in indices:
+        conn.execute(f'DROP INDEX IF EXISTS "{nombre}"')
+    conn.commit()
+    return [sql for _, sql in indices], huella
+
+def importar(entidad, ruta, formato=None, hoja=None, tamano_lote=TAMANO_LOTE, archivo_rechazos=None,
+             diferir=True):
+    """Importar un archivo; devuelve el resumen de la importación"""
+    if entidad not in COLUMNAS:
+        raise ArchivoInvalido(f"Entidad desconocida: {entidad}")
+    inicio_total = time.perf_counter()
+    filas = leer(ruta, formato, hoja)
+    encabezados = next(filas)
+    validar_encabezados(entidad, encabezados)
+    por_contrato = entidad == 'pagos' and 'suscriptor_id' not in {e.strip().lower() for e in encabezados}
+    if por_contrato:
+        encabezados = list(encabezados) + ['suscriptor_id']
+
+    conn = get_connection()
+    for pragma in PRAGMAS_CARGA:
+        conn.execute(pragma)
+    indices, huella = diferir_indices(conn, TABLAS_AFECTADAS[entidad]) if diferir else ([], None)
+
+    rechazos_salida = None
+    escritor = None
+    resumen = {'entidad': entidad, 'filas': 0, 'importadas': 0, 'rechazadas': 0, 'bloques': 0}
+    try:
+        numero_fila = 2  # la fila 1 son los encabezados
+        while True:
+            bloque = list(islice(filas, tamano_lote))
+            if not bloque:
+                break
+            if por_contrato:
+                bloque = resolver_contratos(conn, encabezados[:-1], bloque)
+            items, numeros, rechazos = convertir_bloque(entidad, encabezados, bloque, numero_fila)
+
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                resultados = INSERTAR[entidad](conn, items) if items else []
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            for resultado, numero in zip(resultados, numeros):
+                if resultado['estado'] != 201:
+                    rechazos.append((numero, bloque[numero - numero_fila], resultado['detalle']))
+
+            if rechazos:
+                if escritor is None:
+                    rechazos_salida = open(archivo_rechazos or f"{ruta}.rechazos.csv", 'w', newline='', encoding='utf-8')
+                    escritor = csv.writer(rechazos_salida)
+                    escritor.writerow(['fila', 'error'] + list(encabezados))
+                for numero, fila, motivo in sorted(rechazos, key=lambda r: r[0]):
+                    escritor.writerow([numero, motivo] + list(fila))
+
+            resumen['filas'] += len(bloque)
+            resumen['importadas'] += len(items) - sum(1 for r in resultados if r['estado'] != 201)
+            resumen['rechazadas'] += len(rechazos)
+            resumen['bloques'] += 1
+            numero_fila += len(bloque)
+    finally:
+        for sql in indices:
+            conn.execute(sql)
+        if huella is not None:
+            conn.execute(f'PRAGMA user_version = {huella}')
+        conn.commit()
+        conn.close()
+        if rechazos_salida:
+            rechazos_salida.close()
+
+    resumen['archivo_rechazos'] = rechazos_salida.name if rechazos_salida else None
+    resumen['duracion_s'] = round(time.perf_counter() - inicio_total, 3)
+    metricas.incrementar(f'importacion.{entidad}.filas', resumen['filas'])
+    metricas.incrementar(f'importacion.{entidad}.rechazadas', resumen['rechazadas'])
+    metricas.observar('importacion.duracion_s', resumen['duracion_s'])
+    return resumen
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Importar suscriptores, pagos o gastos desde CSV/XLSX")
+    parser.add_argument("entidad", choices=sorted(COLUMNAS))
+    parser.add_argument("archivo")
+    parser.add_argument("--formato", choices=["csv", "xlsx"], help="Por defecto se deduce de la extensión")
+    parser.add_argument("--hoja", help="Hoja del libro XLSX (por defecto la activa)")
+    parser.add_argument("--tamano-lote", type=int, default=TAMANO_LOTE)
+    parser.add_argument("--rechazos", help="Archivo CSV para las filas rechazadas")
+    parser.add_argument("--sin-diferir-indices", action="store_true",
+                        help="Mantener los índices durante la carga")
+    args = parser.parse_args(argv)
+
+    try:
+        r = importar(args.entidad, args.archivo, args.formato, args.hoja, args.tamano_lote,
+                     args.rechazos, diferir=not args.sin_diferir_indices)
+    except (ArchivoInvalido, FileNotFoundError) as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"✅ {r['importadas']} de {r['filas']} filas importadas en {r['duracion_s']} s ({r['bloques']} bloques)")
+    if r['rechazadas']:
+        print(f"⚠️  {r['rechazadas']} filas rechazadas en {r['archivo_rechazos']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+"""
+Índice en memoria de prefijos para el autocompletado de suscriptores
+Guarda, en listas ordenadas, las palabras normalizadas de cada nombre y la
+cédula y el contrato sin signos; una búsqueda por prefijo es un bisect y un
+recorrido corto, sin tocar la base de datos.
+
+Las escrituras de este proceso actualizan el índice al momento. Los cambios
+de otros procesos (modo multiproceso, importador de consola) se leen como
+delta cada VIGENCIA segundos: suscriptores con fecha_actualizacion posterior
+a la última lectura y marcas de la tabla eliminaciones.
+
+El índice tiene un límite de memoria aproximado. Si la carga o los cambios
+lo superan, se descarta y las búsquedas pasan a una consulta por prefijo en
+SQL (más lenta, con las mismas reglas de coincidencia) hasta el próximo
+arranque.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from database_simple import get_connection
+from sincronizacion import MARGEN, formato_token
+
+VIGENCIA = float(os.environ.get("SISTEMA_TYPEAHEAD_VIGENCIA", "5"))
+MAX_BYTES = int(float(os.environ.get("SISTEMA_TYPEAHEAD_MB", "128")) * 1024 * 1024)
+# Candidatos revisados como máximo por búsqueda de varias palabras: acota la
+# latencia cuando la palabra usada para el bisect es muy común
+MAX_REVISADOS = 1000
+
+CAMPOS = ('id', 'nombre_completo', 'numero_contrato', 'cedula')
+
+def normalizar(texto):
+    """Minúsculas y sin tildes: 'José PÉREZ' -> 'jose perez'"""
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).lower()
+
+def palabras(texto):
+    return [p for p in ''.join(c if c.isalnum() else ' ' for c in normalizar(texto)).split()]
+
+def compacto(texto):
+    """Identificador sin signos ni espacios: 'C-0012 3' -> 'c00123'"""
+    return ''.join(c for c in normalizar(texto) if c.isalnum())
+
+# Costo fijo por suscriptor: la entrada del diccionario y las posiciones de las listas
+_COSTO_BASE = 100 + sys.getsizeof((0,) * 5)
+
+def _tamano(registro, claves):
+    # Las palabras del nombre están internadas y se comparten: solo cuentan sus posiciones
+    return (_COSTO_BASE + sum(sys.getsizeof(valor) for valor in registro) + 16 * len(registro[4])
+            + sum(sys.getsizeof(clave) + 16 for clave in claves))
+
+class _Lista:
+    """Claves ordenadas con el id de su suscriptor en la misma posición
+
+    Dentro de una misma clave los ids también van ordenados, así agregar y
+    quitar son un bisect aunque miles de suscriptores se llamen igual.
+    """
+
+    def __init__(self):
+        self.claves = []
+        self.ids = []
+
+    def construir(self, pares):
+        pares.sort()
+        self.claves = [clave for clave, _ in pares]
+        self.ids = [suscriptor_id for _, suscriptor_id in pares]
+
+    def _posicion(self, clave, suscriptor_id):
+        desde = bisect_left(self.claves, clave)
+        hasta = bisect_right(self.claves, clave, desde)
+        return bisect_left(self.ids, suscriptor_id, desde, hasta)
+
+    def agregar(self, clave, suscriptor_id):
+        posicion = self._posicion(clave, suscriptor_id)
+        self.claves.insert(posicion, clave)
+        self.ids.insert(posicion, suscriptor_id)
+
+    def quitar(self, clave, suscriptor_id):
+        posicion = self._posicion(clave, suscriptor_id)
+        if posicion < len(self.claves) and self.claves[posicion] == clave and self.ids[posicion] == suscriptor_id:
+            del self.claves[posicion]
+            del self.ids[posicion]
+
+    def con_prefijo(self, prefijo):
+        """Ids cuyas claves empiezan con prefijo, en orden de clave"""
+        posicion = bisect_left(self.claves, prefijo)
+        while posicion < len(self.claves) and self.claves[posicion].startswith(prefijo):
+            yield self.ids[posicion]
+            posicion += 1
+
+class IndiceSuscriptores:
+    """Autocompletado por prefijo de nombre (cualquier palabra), cédula o contrato"""
+
+    def __init__(self, nombre='typeahead', vigencia=VIGENCIA, max_bytes=MAX_BYTES):
+        self.nombre = nombre
+        self.vigencia = vigencia
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._lock_delta = threading.Lock()
+        self._registros = {}   # id -> (id, nombre, contrato, cédula, palabras del nombre)
+        self._listas = {'nombre': _Lista(), 'cedula': _Lista(), 'numero_contrato': _Lista()}
+        self._desde = None     # fecha (formato de token) desde la que se leerá el próximo delta
+        self._vence = 0.0
+        self._bytes = 0
+        self.en_memoria = True   # False: superó max_bytes y se busca en SQL
+        self.cargas = 0
+        self.deltas = 0
+        self.consultas_sql = 0
+
+    @staticmethod
+    def _registro(fila):
+        # Las palabras se internan: los nombres comunes se guardan una sola vez
+        return (fila['id'], fila['nombre_completo'], fila['numero_contrato'], fila['cedula'],
+                tuple(sys.intern(p) for p in dict.fromkeys(palabras(fila['nombre_completo']))))
+
+    @staticmethod
+    def _claves(registro):
+        # Los identificadores se comparan sin signos: 'C-001' se encuentra escribiendo 'c00'
+        for campo, clave in (('cedula', compacto(registro[3])), ('numero_contrato', compacto(registro[2]))):
+            if clave:
+                yield campo, clave
+
+    def _agregar(self, fila):
+        if not self.en_memoria:
+            return
+        self._quitar(fila['id'])
+        registro = self._registro(fila)
+        claves = list(self._claves(registro))
+        self._registros[registro[0]] = registro
+        for palabra in registro[4]:
+            self._listas['nombre'].agregar(palabra, registro[0])
+        for campo, clave in claves:
+            self._listas[campo].agregar(clave, registro[0])
+        self._bytes += _tamano(registro, [clave for _, clave in claves])
+        if self._bytes > self.max_bytes:
+            self._pasar_a_sql()
+
+    def _pasar_a_sql(self):
+        """Descartar el índice por exceder max_bytes; las búsquedas siguen en SQL"""
+        self._registros = {}
+        self._listas = {campo: _Lista() for campo in self._listas}
+        self._bytes = 0
+        self.en_memoria = False
+
+    def _quitar(self, suscriptor_id):
+        registro = self._registros.pop(suscriptor_id, None)
+        if registro is None:
+            return
+        claves = list(self._claves(registro))
+        for palabra in registro[4]:
+            self._listas['nombre'].quitar(palabra, suscriptor_id)
+        for campo, clave in claves:
+            self._listas[campo].quitar(clave, suscriptor_id)
+        self._bytes -= _tamano(registro, [clave for _, clave in claves])
+
+    def cargar(self):
+        """Construir el índice completo desde la base de datos"""
+        inicio = datetime.utcnow()
+        conn = get_connection()
+        try:
+            filas = conn.execute(f'SELECT {", ".join(CAMPOS)} FROM suscriptores WHERE eliminado_en IS NULL').fetchall()
+        finally:
+            conn.close()
+        registros = {}
+        pares = {'nombre': [], 'cedula': [], 'numero_contrato': []}
+        total = 0
+        for fila in filas:
+            registro = self._registro(fila)
+            claves = list(self._claves(registro))
+            total += _tamano(registro, [clave for _, clave in claves])
+            if total > self.max_bytes:
+                # No entra en el límite: no se sigue armando lo que se va a descartar
+                break
+            registros[registro[0]] = registro
+            pares['nombre'].extend((palabra, registro[0]) for palabra in registro[4])
+            for campo, clave in claves:
+                pares[campo].append((clave, registro[0]))
+        del filas
+        listas = {campo: _Lista() for campo in pares}
+        if total <= self.max_bytes:
+            for campo, lista in listas.items():
+                lista.construir(pares[campo])
+        with self._lock:
+            self._registros = registros
+            self._listas = listas
+            self._bytes = total
+            self.en_memoria = True
+            if total > self.max_bytes:
+                self._pasar_a_sql()
+            self._desde = formato_token(inicio - timedelta(seconds=MARGEN))
+            self._vence = time.monotonic() + self.vigencia
+            self.cargas += 1
+
+    def _aplicar_delta(self):
+        """Leer los cambios hechos desde la última lectura (también por otros procesos)"""
+        if not self._lock_delta.acquire(blocking=False):
+            return   # otro hilo ya lo está leyendo; mientras tanto se responde con lo que hay
+        try:
+            inicio = datetime.utcnow()
+            conn = get_connection()
+            try:
+                conn.execute('BEGIN')
+                cambiados = conn.execute(f'SELECT {", ".join(CAMPOS)}, eliminado_en FROM suscriptores '
+                                         'WHERE fecha_actualizacion >= ?', (self._desde,)).fetchall()
+                eliminados = conn.execute("SELECT fila_id FROM eliminaciones WHERE tabla = 'suscriptores' AND fecha >= ?",
+                                          (self._desde,)).fetchall()
+                conn.rollback()
+            finally:
+                conn.close()
+            with self._lock:
+                for fila in cambiados:
+                    if fila['eliminado_en'] is None:
+                        self._agregar(fila)
+                    else:
+                        self._quitar(fila['id'])
+                for fila in eliminados:
+                    self._quitar(fila['fila_id'])
+                self._desde = formato_token(inicio - timedelta(seconds=MARGEN))
+                self._vence = time.monotonic() + self.vigencia
+                self.deltas += 1
+        finally:
+            self._lock_delta.release()
+
+    def al_dia(self):
+        """Cargar el índice la primera vez o leer el delta si venció"""
+        if self._desde is None:
+            with self._lock_delta:
+                if self._desde is None:
+                    self.cargar()
+        elif self.en_memoria and time.monotonic() > self._vence:
+            self._aplicar_delta()
+
+    def _buscar_sql(self, clave, buscadas, limite):
+        """La misma búsqueda por prefijo con una consulta, para cuando el índice excede max_bytes"""
+        conn = get_connection()
+        try:
+            conn.create_function('compacto', 1, compacto, deterministic=True)
+            conn.create_function('palabras', 1, lambda texto: ' ' + ' '.join(palabras(texto)), deterministic=True)
+            # Por id y no por clave como en las listas: así el recorrido se detiene al llegar al límite
+            encontrados = conn.execute(f'''
+                SELECT {", ".join(CAMPOS)} FROM suscriptores
+                WHERE eliminado_en IS NULL AND (compacto(cedula) LIKE ? OR compacto(numero_contrato) LIKE ?)
+                ORDER BY id LIMIT ?
+            ''', (f"{clave}%", f"{clave}%", limite)).fetchall()
+            vistos = [fila['id'] for fila in encontrados]
+            # Cada palabra escrita debe ser el comienzo de alguna palabra del nombre
+            condiciones = ' AND '.join(['palabras(nombre_completo) LIKE ?'] * len(buscadas))
+            por_nombre = conn.execute(f'''
+                SELECT {", ".join(CAMPOS)} FROM suscriptores
+                WHERE eliminado_en IS NULL AND {condiciones}
+                  AND id NOT IN (SELECT value FROM json_each(?))
+                LIMIT ?
+            ''', [f"% {buscada}%" for buscada in buscadas] + [json.dumps(vistos), limite - len(encontrados)]).fetchall()
+        finally:
+            conn.close()
+        por_nombre.sort(key=lambda fila: tuple(dict.fromkeys(palabras(fila['nombre_completo']))))
+        self.consultas_sql += 1
+        return [dict(fila) for fila in encontrados + por_nombre]
+
+    def buscar(self, texto, limite=10):
+        """Hasta `limite` suscriptores como dicts (id, nombre, contrato, cédula)
+
+        Primero los que coinciden por cédula o contrato y luego por nombre: cada
+        palabra escrita debe ser prefijo de alguna palabra del nombre.
+        """
+        clave = compacto(texto)
+        buscadas = palabras(texto)
+        if not clave:
+            return []
+        self.al_dia()
+        if not self.en_memoria:
+            return self._buscar_sql(clave, buscadas, limite)
+        with self._lock:
+            encontrados = []
+            vistos = set()
+            for campo in ('cedula', 'numero_contrato'):
+                for suscriptor_id in self._listas[campo].con_prefijo(clave):
+                    if len(encontrados) == limite:
+                        break
+                    if suscriptor_id not in vistos:
+                        vistos.add(suscriptor_id)
+                        encontrados.append(self._registros[suscriptor_id])
+            # El bisect se hace con la palabra más larga, la más selectiva
+            posicion = max(range(len(buscadas)), key=lambda i: len(buscadas[i]))
+            guia = buscadas[posicion]
+            resto = buscadas[:posicion] + buscadas[posicion + 1:]
+            por_nombre = []
+            revisados = 0
+            for suscriptor_id in self._listas['nombre'].con_prefijo(guia):
+                if len(encontrados) + len(por_nombre) == limite or revisados == MAX_REVISADOS:
+                    break
+                revisados += 1
+                if suscriptor_id in vistos:
+                    continue
+                registro = self._registros[suscriptor_id]
+                if all(any(p.startswith(buscada) for p in registro[4]) for buscada in resto):
+                    vistos.add(suscriptor_id)
+                    por_nombre.append(registro)
+            por_nombre.sort(key=lambda registro: registro[4])
+            return [dict(zip(CAMPOS, registro)) for registro in encontrados + por_nombre]
+
+    def actualizar(self, fila):
+        """Agregar o reemplazar un suscriptor (llamar después del commit del alta o la edición)"""
+        with self._lock:
+            if self._desde is not None and self.en_memoria:
+                self._agregar(fila)
+
+    def quitar(self, suscriptor_id):
+        """Quitar un suscriptor eliminado (llamar después del commit)"""
+        with self._lock:
+            self._quitar(suscriptor_id)
+
+    def revisar_pronto(self):
+        """Leer el delta en la próxima búsqueda (tras escrituras masivas de este proceso)"""
+        self._vence = 0.0
+
+    def estado(self):
+        with self._lock:
+            return {
+                'suscriptores': len(self._registros),
+                'claves': sum(len(lista.claves) for lista in self._listas.values()),
+                'en_memoria': self.en_memoria,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'consultas_sql': self.consultas_sql,
+                'vigencia_s': self.vigencia,
+                'cargas': self.cargas,
+                'deltas': self.deltas,
+            }
+
+# Instancia única usada por la aplicación
+indice_suscriptores = IndiceSuscriptores()
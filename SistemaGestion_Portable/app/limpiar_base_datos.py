@@ -3,7 +3,7 @@ Script para limpiar datos huérfanos de la base de datos
 """
 import os
 import sqlite3
-from database_simple import get_connection
+from database_simple import get_connection, limpiar_huerfanos
 
 def limpiar_base_datos():
     """Eliminar datos huérfanos de la base de datos"""
@@ -13,20 +13,12 @@ def limpiar_base_datos():
     try:
         print("🧹 Limpiando base de datos...")
         
-        # Eliminar ingresos sin pago asociado
-        cursor.execute('''
-            DELETE FROM ingresos 
-            WHERE pago_id NOT IN (SELECT id FROM pagos)
-        ''')
-        ingresos_huerfanos = cursor.rowcount
+        # Eliminar pagos sin suscriptor e ingresos y recibos sin pago asociado
+        eliminados = limpiar_huerfanos()
+        print(f"💳 Eliminados {eliminados['pagos']} pagos huérfanos")
+        ingresos_huerfanos = eliminados['ingresos']
+        recibos_huerfanos = eliminados['recibos']
         print(f"📊 Eliminados {ingresos_huerfanos} ingresos huérfanos")
-        
-        # Eliminar recibos sin pago asociado
-        cursor.execute('''
-            DELETE FROM recibos 
-            WHERE pago_id NOT IN (SELECT id FROM pagos)
-        ''')
-        recibos_huerfanos = cursor.rowcount
         print(f"🧾 Eliminados {recibos_huerfanos} recibos huérfanos")
         
         # Verificar y mostrar estado actual
@@ -64,7 +56,7 @@ def limpiar_base_datos():
         print(f"📊 Balance: ${balance:.2f}")
         print("="*50)
         
-        if ingresos_huerfanos > 0 or recibos_huerfanos > 0:
+        if any(eliminados.values()):
             print("✅ Base de datos limpiada correctamente")
         else:
             print("✅ No se encontraron datos huérfanos")
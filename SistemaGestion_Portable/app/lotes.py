@@ -0,0 +1,211 @@
+"""
+Inserción y eliminación por lotes de suscriptores, pagos y gastos
+Valida en bloque (duplicados con una sola consulta por lote), inserta con
+executemany y devuelve un resultado por elemento. Las funciones no hacen
+commit: el llamador controla la transacción.
+"""
+import json
+from datetime import datetime
+
+# Cantidad máxima de elementos por petición de lote
+MAX_LOTE = 5000
+
+TIPOS_PAGO = ('efectivo', 'transferencia')
+
+def error(indice, estado, detalle):
+    return {'indice': indice, 'estado': estado, 'detalle': detalle}
+
+def ids_insertados(cursor, tabla, cantidad):
+    """Ids asignados por el último executemany sobre una tabla AUTOINCREMENT
+
+    Bajo el bloqueo de escritura de la transacción, SQLite asigna ids
+    consecutivos a partir de sqlite_sequence, así que bastan el último
+    valor y la cantidad insertada.
+    """
+    if not cantidad:
+        return []
+    ultimo = cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (tabla,)).fetchone()[0]
+    return list(range(ultimo - cantidad + 1, ultimo + 1))
+
+def siguiente_contador_recibo(cursor, fecha_str):
+    # Rango sobre el índice único de numero_recibo (equivale a LIKE 'REC-fecha-%').
+    # Se sigue al mayor contador del día y no a la cantidad: si se eliminó un
+    # recibo, contar repetiría un número ya emitido.
+    cursor.execute('''
+        SELECT COALESCE(MAX(CAST(substr(numero_recibo, 14) AS INTEGER)), 0) FROM recibos
+        WHERE numero_recibo >= ? AND numero_recibo < ?
+    ''', (f"REC-{fecha_str}-", f"REC-{fecha_str}."))
+    return cursor.fetchone()[0] + 1
+
+def insertar_suscriptores(conn, items):
+    """Insertar suscriptores; items son dicts con los campos de SuscriptorCreate"""
+    cursor = conn.cursor()
+    resultados = [None] * len(items)
+
+    # Duplicados contra la base de datos, una consulta por lote
+    cursor.execute('''
+        SELECT numero_contrato, cedula, email FROM suscriptores
+        WHERE numero_contrato IN (SELECT value FROM json_each(?))
+           OR cedula IN (SELECT value FROM json_each(?))
+           OR email IN (SELECT value FROM json_each(?))
+    ''', tuple(json.dumps([item[campo] for item in items]) for campo in ('numero_contrato', 'cedula', 'email')))
+    existentes = {'numero_contrato': set(), 'cedula': set(), 'email': set()}
+    for fila in cursor.fetchall():
+        for campo in existentes:
+            existentes[campo].add(fila[campo])
+
+    mensajes = {
+        'numero_contrato': "Ya existe un suscriptor con este número de contrato",
+        'cedula': "Ya existe un suscriptor con esta cédula",
+        'email': "Ya existe un suscriptor con este email",
+    }
+    ahora = datetime.utcnow()
+    validos = []
+    for indice, item in enumerate(items):
+        campo = next((c for c in mensajes if item[c] in existentes[c]), None)
+        if campo:
+            resultados[indice] = error(indice, 400, mensajes[campo])
+            continue
+        # Los siguientes elementos del lote también cuentan como existentes
+        for c in existentes:
+            existentes[c].add(item[c])
+        validos.append(indice)
+
+    cursor.executemany('''
+        INSERT INTO suscriptores (numero_contrato, cedula, nombre_completo, email, telefono, direccion,
+                                  fecha_suscripcion, fecha_creacion, fecha_actualizacion)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', ((items[i]['numero_contrato'], items[i]['cedula'], items[i]['nombre_completo'], items[i]['email'],
+           items[i].get('telefono'), items[i].get('direccion'), items[i]['fecha_suscripcion'], ahora, ahora)
+          for i in validos))
+
+    for indice, nuevo_id in zip(validos, ids_insertados(cursor, 'suscriptores', len(validos))):
+        resultados[indice] = {'indice': indice, 'estado': 201, 'id': nuevo_id}
+    return resultados
+
+def insertar_pagos(conn, items):
+    """Insertar pagos con sus recibos e ingresos; items son dicts con los campos de PagoCreate"""
+    cursor = conn.cursor()
+    resultados = [None] * len(items)
+
+    # Suscriptores del lote, una consulta
+    cursor.execute('''
+        SELECT id, nombre_completo FROM suscriptores
+        WHERE id IN (SELECT value FROM json_each(?)) AND eliminado_en IS NULL
+    ''', (json.dumps(sorted({item['suscriptor_id'] for item in items})),))
+    nombres = {fila['id']: fila['nombre_completo'] for fila in cursor.fetchall()}
+
+    # Pagos ya registrados para los mismos (suscriptor, mes, año), una consulta
+    cursor.execute('''
+        SELECT p.suscriptor_id, p.mes, p.anio
+        FROM json_each(?) j
+        JOIN pagos p ON p.suscriptor_id = json_extract(j.value, '$[0]')
+                    AND p.mes = json_extract(j.value, '$[1]')
+                    AND p.anio = json_extract(j.value, '$[2]')
+    ''', (json.dumps([[item['suscriptor_id'], item['mes'], item['anio']] for item in items]),))
+    existentes = {tuple(fila) for fila in cursor.fetchall()}
+
+    validos = []
+    for indice, item in enumerate(items):
+        clave = (item['suscriptor_id'], item['mes'], item['anio'])
+        if item['suscriptor_id'] not in nombres:
+            resultados[indice] = error(indice, 404, "Suscriptor no encontrado")
+        elif not 1 <= item['mes'] <= 12:
+            resultados[indice] = error(indice, 400, "El mes debe estar entre 1 y 12")
+        elif item['anio'] < 2000:
+            resultados[indice] = error(indice, 400, "El año debe ser 2000 o posterior")
+        elif item['valor'] <= 0:
+            resultados[indice] = error(indice, 400, "El valor debe ser mayor que cero")
+        elif item['tipo_pago'] not in TIPOS_PAGO:
+            resultados[indice] = error(indice, 400, "El tipo de pago debe ser efectivo o transferencia")
+        elif clave in existentes:
+            resultados[indice] = error(indice, 400, f"Ya existe un pago para este suscriptor en {item['mes']}/{item['anio']}")
+        else:
+            existentes.add(clave)
+            validos.append(indice)
+
+    cursor.executemany('''
+        INSERT INTO pagos (suscriptor_id, mes, anio, fecha_pago, valor, tipo_pago, entidad_bancaria, nombre_transferente, monto_efectivo)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', ((items[i]['suscriptor_id'], items[i]['mes'], items[i]['anio'], items[i]['fecha_pago'], items[i]['valor'],
+           items[i]['tipo_pago'], items[i].get('entidad_bancaria'), items[i].get('nombre_transferente'),
+           items[i].get('monto_efectivo'))
+          for i in validos))
+    pago_ids = ids_insertados(cursor, 'pagos', len(validos))
+
+    # Números de recibo asignados en bloque
+    ahora = datetime.utcnow()
+    fecha_str = datetime.now().strftime("%Y%m%d")
+    contador = siguiente_contador_recibo(cursor, fecha_str)
+    recibos = [(pago_id, f"REC-{fecha_str}-{contador + n:05d}", ahora) for n, pago_id in enumerate(pago_ids)]
+    cursor.executemany('INSERT INTO recibos (pago_id, numero_recibo, fecha_emision) VALUES (?, ?, ?)', recibos)
+    cursor.executemany('''
+        INSERT INTO ingresos (pago_id, monto, fecha, origen, fecha_creacion)
+        VALUES (?, ?, ?, ?, ?)
+    ''', ((pago_id, items[i]['valor'], items[i]['fecha_pago'],
+           f"Pago de suscriptor: {nombres[items[i]['suscriptor_id']]}", ahora)
+          for i, pago_id in zip(validos, pago_ids)))
+
+    for indice, pago_id, recibo in zip(validos, pago_ids, recibos):
+        resultados[indice] = {'indice': indice, 'estado': 201, 'id': pago_id, 'numero_recibo': recibo[1]}
+    return resultados
+
+def insertar_gastos(conn, items):
+    """Insertar gastos; items son dicts con los campos de GastoCreate"""
+    cursor = conn.cursor()
+    resultados = [None] * len(items)
+
+    validos = []
+    for indice, item in enumerate(items):
+        if item['valor'] <= 0:
+            resultados[indice] = error(indice, 400, "El valor debe ser mayor que cero")
+        else:
+            validos.append(indice)
+
+    cursor.executemany('''
+        INSERT INTO gastos (tipo_gasto, descripcion, valor, fecha, lugar_compra, motivo)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', ((items[i]['tipo_gasto'], items[i]['descripcion'], items[i]['valor'], items[i]['fecha'],
+           items[i].get('lugar_compra'), items[i].get('motivo'))
+          for i in validos))
+
+    for indice, gasto_id in zip(validos, ids_insertados(cursor, 'gastos', len(validos))):
+        resultados[indice] = {'indice': indice, 'estado': 201, 'id': gasto_id}
+    return resultados
+
+def eliminar(conn, tabla, ids):
+    """Eliminar filas por id con una sola sentencia
+
+    Las tablas dependientes se eliminan en cascada (requiere PRAGMA
+    foreign_keys, activo en get_connection). Devuelve los ids eliminados,
+    los no encontrados y el total de filas borradas incluyendo la cascada.
+    """
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT id FROM {tabla} WHERE id IN (SELECT value FROM json_each(?))', (json.dumps(ids),))
+    existentes = {fila[0] for fila in cursor.fetchall()}
+    antes = conn.total_changes
+    cursor.execute(f'DELETE FROM {tabla} WHERE id IN (SELECT value FROM json_each(?))', (json.dumps(sorted(existentes)),))
+    return {
+        'eliminados': sorted(existentes),
+        'no_encontrados': sorted(set(ids) - existentes),
+        'filas_eliminadas': conn.total_changes - antes,
+    }
+
+def marcar_eliminados(conn, ids):
+    """Eliminación lógica de suscriptores (la purga borra después su historial)"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id FROM suscriptores
+        WHERE id IN (SELECT value FROM json_each(?)) AND eliminado_en IS NULL
+    ''', (json.dumps(ids),))
+    eliminados = sorted(fila[0] for fila in cursor.fetchall())
+    cursor.execute('UPDATE suscriptores SET eliminado_en = ? WHERE id IN (SELECT value FROM json_each(?))',
+                   (datetime.utcnow(), json.dumps(eliminados)))
+    return {
+        'eliminados': eliminados,
+        'no_encontrados': sorted(set(ids) - set(eliminados)),
+    }
+
+def resumen(resultados):
+    creados = sum(1 for r in resultados if r['estado'] == 201)
+    return {'creados': creados, 'errores': len(resultados) - creados, 'resultados': resultados}
@@ -3,11 +3,12 @@ Aplicación principal FastAPI - Versión Simple sin SQLAlchemy
 Sistema de Gestión de Suscriptores y Finanzas
 """
 import os
+import sqlite3
 import sys
-import webbrowser
 import threading
 import time
-import sqlite3
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from datetime import datetime, date, timedelta
 from typing import List, Optional
 from pathlib import Path
@@ -17,15 +18,28 @@ CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, CURRENT_DIR)
 
 # Importar FastAPI
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from datetime import datetime, timedelta
-import sqlite3
+from pydantic import BaseModel, TypeAdapter, create_model
 import hashlib
-from database_simple import get_connection, init_database
+from database_simple import (get_connection, get_read_connection, init_database, limpiar_huerfanos, crear_recibo_y_ingreso,
+                             insertar_y_leer, actualizar_y_leer,
+                             get_database_path, checkpoint_wal, pool_lectura, PoolAgotado)
+from mantenimiento import planificador, tomar_liderazgo
+from metricas import metricas
+import idempotencia
+import lotes
+import formatos
+from vuelo_unico import reportes_compartidos
+from eventos import difusor, DemasiadosClientes
+from cache_suscriptores import cache_suscriptores
+from indice_suscriptores import indice_suscriptores
+from resumen_panel import resumen_panel
+# importador, multiplexor, busqueda_gastos, respaldos y sincronizacion solo los usan
+# sus propios endpoints: se importan dentro de ellos para no alargar el arranque
 
 # Modelos de datos
 class SuscriptorCreate(BaseModel):
@@ -42,12 +56,19 @@ class SuscriptorResponse(BaseModel):
     numero_contrato: str
     cedula: str
     nombre_completo: str
-    email: str
+    email: Optional[str]  # suscriptores anteriores a la columna email no lo tienen
     telefono: Optional[str]
     direccion: Optional[str]
     fecha_suscripcion: str
     fecha_creacion: str
     fecha_actualizacion: str
+    version: int
+
+class SuscriptorResumen(BaseModel):
+    id: int
+    nombre_completo: str
+    numero_contrato: str
+    cedula: str
 
 class PagoCreate(BaseModel):
     suscriptor_id: int
@@ -72,6 +93,19 @@ class PagoResponse(BaseModel):
     entidad_bancaria: Optional[str]
     nombre_transferente: Optional[str]
 
+class ReciboResponse(BaseModel):
+    id: int
+    pago_id: int
+    numero_recibo: str
+    fecha_emision: str
+    mes: int
+    anio: int
+    valor: float
+
+class Subpeticion(BaseModel):
+    url: str                  # ruta GET de esta aplicación, con su query string
+    id: Optional[str] = None  # identificador elegido por el cliente; por omisión, la posición
+
 class GastoCreate(BaseModel):
     tipo_gasto: str
     valor: float
@@ -89,7 +123,11 @@ class GastoResponse(BaseModel):
     fecha: str
     lugar_compra: Optional[str]
     motivo: Optional[str]
-    suscriptor_id: Optional[int]
+    suscriptor_id: Optional[int] = None
+
+class GastoBusqueda(GastoResponse):
+    fragmento: str      # HTML escapado, con las coincidencias entre <mark> y </mark>
+    relevancia: float   # mayor es mejor; 0 sin texto de búsqueda
 
 class UserCreate(BaseModel):
     email: str
@@ -137,11 +175,44 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verificar contraseña"""
     return hash_password(plain_password) == hashed_password
 
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    """Inicio y apagado de cada proceso servidor (uno por worker)"""
+    # main() ya inicializó el esquema; aquí solo se comprueba la huella
+    init_database(rapido=True)
+    
+    # Solo un proceso ejecuta el mantenimiento en segundo plano
+    lider = tomar_liderazgo(get_database_path() + ".mantenimiento.lock")
+    planificador.lider = lider is not None
+    if lider:
+        if os.environ.get("SISTEMA_INICIO_RAPIDO") == "1":
+            planificador.ejecutar_pronto('limpieza_huerfanos')
+        planificador.iniciar()
+    
+    # Construir el índice de autocompletado sin demorar el arranque
+    threading.Thread(target=indice_suscriptores.al_dia, name="indice-suscriptores", daemon=True).start()
+    difusor.iniciar()
+    
+    yield
+    
+    # Apagado ordenado: detener el mantenimiento y vaciar el WAL
+    if lider:
+        planificador.detener()
+        lider.close()
+    await difusor.detener()
+    resumen_panel.cerrar()
+    pool_lectura.cerrar()
+    try:
+        checkpoint_wal('TRUNCATE')
+    except Exception as e:
+        print(f"No se pudo hacer checkpoint del WAL: {e}")
+
 # Crear aplicación FastAPI
 app = FastAPI(
     title="Sistema de Gestión de Suscriptores y Finanzas",
     description="Software libre para gestión de suscriptores, pagos mensuales, ingresos y gastos",
     version="1.0.0 - Simple",
+    lifespan=ciclo_de_vida,
     license_info={
         "name": "MIT",
         "url": "https://opensource.org/licenses/MIT"
@@ -157,6 +228,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reportes sin conexión disponible en el pool de lectura
+@app.exception_handler(PoolAgotado)
+async def pool_agotado_handler(request: Request, exc: PoolAgotado):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+# Rutas cuyas escrituras generan eventos en vivo (pagos, gastos, eliminaciones, suscriptores)
+RUTAS_CON_EVENTOS = ("/suscriptores", "/pagos", "/gastos", "/importar")
+
+# Registrar actividad para que el mantenimiento solo corra en inactividad,
+# y la latencia por endpoint en /metricas
+@app.middleware("http")
+async def registrar_actividad(request: Request, call_next):
+    planificador.registrar_actividad()
+    inicio = time.perf_counter()
+    response = await call_next(request)
+    ruta = request.scope.get("route")
+    if (request.method != "GET" and response.status_code < 400 and ruta is not None
+            and ruta.path.startswith(RUTAS_CON_EVENTOS)):
+        # Una escritura confirmada: los eventos en vivo no esperan al intervalo
+        difusor.avisar()
+    if ruta is not None and not request.url.path.startswith("/ui"):
+        metricas.observar(f"http.{request.method} {ruta.path}", (time.perf_counter() - inicio) * 1000)
+    return response
+
 # Servir archivos estáticos en /ui
 static_dir = os.path.join(CURRENT_DIR, "static")
 if os.path.exists(static_dir):
@@ -275,16 +370,15 @@ async def update_user_role(user_id: int, role_data: dict, current_user: dict = D
     cursor = conn.cursor()
     
     try:
-        cursor.execute('UPDATE usuarios SET rol = ?, fecha_actualizacion = ? WHERE id = ?', 
-                   (role_data['rol'], datetime.utcnow(), user_id))
+        result = actualizar_y_leer(cursor, 'usuarios', 'UPDATE usuarios SET rol = ?, fecha_actualizacion = ? WHERE id = ?',
+                                   (role_data['rol'], datetime.utcnow(), user_id), user_id)
+        if result is None:
+            raise HTTPException(status_code=404, detail="Usuario no encontrado")
         conn.commit()
         
-        # Obtener usuario actualizado
-        cursor.execute('SELECT * FROM usuarios WHERE id = ?', (user_id,))
-        result = cursor.fetchone()
-        conn.close()
-        
         return dict(result)
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
@@ -296,32 +390,94 @@ def health_check():
     return {"status": "ok", "mensaje": "Sistema operativo"}
 
 # Endpoints de Suscriptores
+DUPLICADOS_SUSCRIPTOR = {
+    'numero_contrato': "Ya existe un suscriptor con este número de contrato",
+    'cedula': "Ya existe un suscriptor con esta cédula",
+    'email': "Ya existe un suscriptor con este email",
+}
+
+# Columnas por las que se pueden ordenar los listados paginados. Todas tienen
+# índice: cualquier página, incluso al final del listado, es un recorrido del índice
+ORDEN_SUSCRIPTORES = ('id', 'numero_contrato', 'cedula', 'nombre_completo', 'email', 'fecha_suscripcion')
+ORDEN_PAGOS = ('id', 'suscriptor_id', 'fecha_pago')
+
+def orden_sql(orden: str, direccion: str, columnas):
+    """Cláusula ORDER BY validada; el id desempata para que las páginas no se solapen"""
+    if orden not in columnas:
+        raise HTTPException(status_code=400, detail=f"No se puede ordenar por {orden}; opciones: {', '.join(columnas)}")
+    if direccion not in ('asc', 'desc'):
+        raise HTTPException(status_code=400, detail="La dirección debe ser asc o desc")
+    return f"ORDER BY {orden} {direccion}" + (f", id {direccion}" if orden != 'id' else "")
+
+# Proyección de los listados (?fields=id,nombre_completo): solo se leen esas
+# columnas, así un índice que las contenga responde sin tocar la tabla, y la
+# respuesta se valida y serializa con un modelo reducido a esos campos
+def campos_pedidos(fields: Optional[str], modelo):
+    """Columnas pedidas en fields, validadas contra el modelo (el id siempre va); None = todas"""
+    if not fields:
+        return None
+    campos = tuple(dict.fromkeys(['id'] + [c.strip() for c in fields.split(',') if c.strip()]))
+    desconocidos = [c for c in campos if c not in modelo.model_fields]
+    if desconocidos:
+        raise HTTPException(status_code=400, detail=f"Campos desconocidos: {', '.join(desconocidos)}; "
+                                                    f"opciones: {', '.join(modelo.model_fields)}")
+    return campos
+
+@lru_cache(maxsize=64)
+def adaptador_parcial(modelo, campos):
+    parcial = create_model(f"{modelo.__name__}Parcial",
+                           **{c: (modelo.model_fields[c].annotation, ...) for c in campos})
+    return TypeAdapter(List[parcial])
+
+def respuesta_parcial(filas, modelo, campos, response: Response):
+    """Respuesta JSON con solo los campos pedidos (conserva las cabeceras ya fijadas en response)"""
+    adaptador = adaptador_parcial(modelo, campos)
+    return Response(adaptador.dump_json(adaptador.validate_python([dict(fila) for fila in filas])),
+                    media_type="application/json", headers=dict(response.headers))
+
+# Formato de los listados según Accept: JSON o MessagePack (ver formatos.py)
+def formato_pedido(accept: Optional[str], response: Response):
+    """Formato negociado; 406 si el cliente solo acepta MessagePack y no está instalado"""
+    response.headers["Vary"] = "Accept"
+    try:
+        return formatos.elegir(accept)
+    except formatos.FormatoNoAceptable as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+def respuesta_msgpack(filas, modelo, campos, response: Response):
+    """Listado en MessagePack con los campos pedidos o todos los del modelo, sin pasar por pydantic"""
+    return Response(formatos.empaquetar(filas, campos or tuple(modelo.model_fields)),
+                    media_type=formatos.MSGPACK, headers=dict(response.headers))
+
 @app.post("/suscriptores/", response_model=SuscriptorResponse, status_code=status.HTTP_201_CREATED)
-def crear_suscriptor(suscriptor: SuscriptorCreate, current_user: dict = Depends(get_current_user_simple)):
+def crear_suscriptor(suscriptor: SuscriptorCreate, idempotency_key: Optional[str] = Header(None),
+                     current_user: dict = Depends(get_current_user_simple)):
     if not current_user:
         raise HTTPException(status_code=401, detail="No autenticado")
     
+    return con_idempotencia(idempotency_key, "/suscriptores/", suscriptor, SuscriptorResponse, status.HTTP_201_CREATED,
+                            lambda guardar: registrar_suscriptor(suscriptor, guardar))
+
+def registrar_suscriptor(suscriptor: SuscriptorCreate, guardar):
     conn = get_connection()
     cursor = conn.cursor()
     
     try:
-        # Verificar duplicados
-        cursor.execute('SELECT id FROM suscriptores WHERE numero_contrato = ?', (suscriptor.numero_contrato,))
-        if cursor.fetchone():
-            raise HTTPException(status_code=400, detail="Ya existe un suscriptor con este número de contrato")
-        
-        cursor.execute('SELECT id FROM suscriptores WHERE cedula = ?', (suscriptor.cedula,))
-        if cursor.fetchone():
-            raise HTTPException(status_code=400, detail="Ya existe un suscriptor con esta cédula")
-        
-        cursor.execute('SELECT id FROM suscriptores WHERE email = ?', (suscriptor.email,))
-        if cursor.fetchone():
-            raise HTTPException(status_code=400, detail="Ya existe un suscriptor con este email")
-        
-        # Insertar suscriptor
+        # Verificar duplicados con una sola consulta (la caché es solo para lecturas)
         cursor.execute('''
+            SELECT numero_contrato, cedula, email FROM suscriptores
+            WHERE numero_contrato = ? OR cedula = ? OR email = ?
+        ''', (suscriptor.numero_contrato, suscriptor.cedula, suscriptor.email))
+        existentes = cursor.fetchall()
+        duplicado = next((campo for campo in DUPLICADOS_SUSCRIPTOR
+                          if any(fila[campo] == getattr(suscriptor, campo) for fila in existentes)), None)
+        if duplicado:
+            raise HTTPException(status_code=400, detail=DUPLICADOS_SUSCRIPTOR[duplicado])
+        
+        # Insertar suscriptor y obtenerlo en la misma sentencia
+        result = insertar_y_leer(cursor, 'suscriptores', '''
             INSERT INTO suscriptores (numero_contrato, cedula, nombre_completo, email, telefono, direccion, fecha_suscripcion, fecha_creacion, fecha_actualizacion)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             suscriptor.numero_contrato,
             suscriptor.cedula,
@@ -333,38 +489,67 @@ def crear_suscriptor(suscriptor: SuscriptorCreate, current_user: dict = Depends(
             datetime.utcnow(),
             datetime.utcnow()
         ))
-        
-        suscriptor_id = cursor.lastrowid
+        guardar(conn, dict(result))
         conn.commit()
-        
-        # Obtener suscriptor creado
-        cursor.execute('SELECT * FROM suscriptores WHERE id = ?', (suscriptor_id,))
-        result = cursor.fetchone()
         conn.close()
+        indice_suscriptores.actualizar(result)
         
         return dict(result)
+    except HTTPException:
+        conn.rollback()
+        raise
+    except sqlite3.IntegrityError:
+        # Duplicado creado por otro proceso después de la verificación
+        conn.rollback()
+        raise HTTPException(status_code=400, detail="Ya existe un suscriptor con este número de contrato o cédula")
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/suscriptores/", response_model=List[SuscriptorResponse])
-def listar_suscriptores(skip: int = 0, limit: int = 100, current_user: dict = Depends(get_current_user_simple), email: str = ""):
+def listar_suscriptores(response: Response, skip: int = 0, limit: int = 100,
+                        current_user: dict = Depends(get_current_user_simple), email: str = "", q: str = "",
+                        orden: str = "nombre_completo", direccion: str = "asc", contar: bool = False,
+                        fields: Optional[str] = None, accept: Optional[str] = Header(None), desde_id: int = 0):
+    """Página de suscriptores; con contar=true el total filtrado va en la cabecera X-Total-Count
+
+    Con orden=id y desde_id = último id recibido se recorre el listado completo
+    sin que las altas o eliminaciones intermedias corran las páginas.
+    """
     if not current_user:
         raise HTTPException(status_code=401, detail="No autenticado")
     
-    conn = get_connection()
-    cursor = conn.cursor()
-    
+    condiciones = ["eliminado_en IS NULL"]
+    params = []
+    if desde_id:
+        condiciones.append("id > ?")
+        params.append(desde_id)
     # Búsqueda por email
     if email:
-        cursor.execute('SELECT * FROM suscriptores WHERE email LIKE ? ORDER BY nombre_completo LIMIT ? OFFSET ?', 
-                   (f'%{email}%', limit, skip))
-    else:
-        cursor.execute('SELECT * FROM suscriptores ORDER BY nombre_completo LIMIT ? OFFSET ?', (limit, skip))
+        condiciones.append("email LIKE ?")
+        params.append(f'%{email}%')
+    if q:
+        condiciones.append("(nombre_completo LIKE ? OR cedula LIKE ? OR email LIKE ? OR numero_contrato LIKE ?)")
+        params.extend([f'%{q}%'] * 4)
+    where = f"WHERE {' AND '.join(condiciones)}"
+    ordenar = orden_sql(orden, direccion, ORDEN_SUSCRIPTORES)
+    campos = campos_pedidos(fields, SuscriptorResponse)
+    formato = formato_pedido(accept, response)
     
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(f'SELECT {", ".join(campos) if campos else "*"} FROM suscriptores {where} {ordenar} LIMIT ? OFFSET ?',
+                   params + [limit, skip])
     results = cursor.fetchall()
+    if contar:
+        response.headers["X-Total-Count"] = str(cursor.execute(f'SELECT COUNT(*) FROM suscriptores {where}', params).fetchone()[0])
     conn.close()
     
+    if formato == formatos.MSGPACK:
+        return respuesta_msgpack(results, SuscriptorResponse, campos, response)
+    if campos:
+        return respuesta_parcial(results, SuscriptorResponse, campos, response)
     return [dict(row) for row in results]
 
 @app.get("/suscriptores/buscar", response_model=List[SuscriptorResponse])
@@ -378,79 +563,123 @@ def buscar_suscriptores(q: str = "", current_user: dict = Depends(get_current_us
     if q:
         cursor.execute('''
             SELECT * FROM suscriptores 
-            WHERE nombre_completo LIKE ? OR 
+            WHERE eliminado_en IS NULL AND (
+                 nombre_completo LIKE ? OR 
                  cedula LIKE ? OR 
                  email LIKE ? OR 
-                 numero_contrato LIKE ?
+                 numero_contrato LIKE ?)
             ORDER BY nombre_completo
             LIMIT 50
         ''', (f'%{q}%', f'%{q}%', f'%{q}%', f'%{q}%'))
     else:
-        cursor.execute('SELECT * FROM suscriptores ORDER BY nombre_completo LIMIT 50')
+        cursor.execute('SELECT * FROM suscriptores WHERE eliminado_en IS NULL ORDER BY nombre_completo LIMIT 50')
     
     results = cursor.fetchall()
     conn.close()
     
     return [dict(row) for row in results]
 
+@app.get("/suscriptores/typeahead", response_model=List[SuscriptorResumen])
+def autocompletar_suscriptores(q: str = "", limit: int = 10, current_user: dict = Depends(get_current_user_simple)):
+    """Sugerencias por prefijo de nombre, cédula o contrato, desde el índice en memoria"""
+    if not current_user:
+        raise HTTPException(status_code=401, detail="No autenticado")
+    
+    inicio = time.perf_counter()
+    resultado = indice_suscriptores.buscar(q, max(1, min(limit, 50)))
+    metricas.observar('typeahead.busqueda_ms', (time.perf_counter() - inicio) * 1000)
+    return resultado
+
+def etag_version(version):
+    return f'"{version}"'
+
+def version_esperada(if_match):
+    """Versión pedida en If-Match ("3", W/"3" o 3); None si no vino o es *"""
+    if if_match is None or if_match.strip() == '*':
+        return None
+    valor = if_match.strip()
+    if valor.startswith('W/'):
+        valor = valor[2:]
+    try:
+        return int(valor.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="If-Match debe ser la versión del suscriptor, por ejemplo \"3\"")
+
 @app.get("/suscriptores/{suscriptor_id}", response_model=SuscriptorResponse)
-def obtener_suscriptor(suscriptor_id: int, current_user: dict = Depends(get_current_user_simple)):
+def obtener_suscriptor(suscriptor_id: int, response: Response, current_user: dict = Depends(get_current_user_simple)):
     if not current_user:
         raise HTTPException(status_code=401, detail="No autenticado")
     
     conn = get_connection()
     cursor = conn.cursor()
     
-    cursor.execute('SELECT * FROM suscriptores WHERE id = ?', (suscriptor_id,))
+    cursor.execute('SELECT * FROM suscriptores WHERE id = ? AND eliminado_en IS NULL', (suscriptor_id,))
     result = cursor.fetchone()
     conn.close()
     
     if not result:
         raise HTTPException(status_code=404, detail="Suscriptor no encontrado")
     
+    response.headers["ETag"] = etag_version(result['version'])
     return dict(result)
 
 @app.put("/suscriptores/{suscriptor_id}", response_model=SuscriptorResponse)
-def actualizar_suscriptor(suscriptor_id: int, datos: dict, current_user: dict = Depends(get_current_user_simple)):
+def actualizar_suscriptor(suscriptor_id: int, datos: dict, response: Response,
+                          if_match: Optional[str] = Header(None),
+                          current_user: dict = Depends(get_current_user_simple)):
     if not current_user:
         raise HTTPException(status_code=401, detail="No autenticado")
     
+    # Construir consulta dinámica
+    set_clause = []
+    values = []
+    
+    for campo, valor in datos.items():
+        if campo in ['nombre_completo', 'numero_contrato', 'cedula', 'fecha_suscripcion', 'email', 'telefono', 'direccion']:
+            set_clause.append(f"{campo} = ?")
+            values.append(valor)
+    
+    if not set_clause:
+        raise HTTPException(status_code=400, detail="No hay campos válidos para actualizar")
+    
+    # Agregar fecha de actualización y nueva versión
+    set_clause.append("fecha_actualizacion = ?")
+    values.append(datetime.utcnow())
+    set_clause.append("version = version + 1")
+    values.append(suscriptor_id)
+    
+    # Con If-Match la escritura solo se aplica si nadie cambió el registro desde
+    # que el cliente lo leyó; la verificación y la escritura son una sola sentencia
+    query = f"UPDATE suscriptores SET {', '.join(set_clause)} WHERE id = ? AND eliminado_en IS NULL"
+    version = version_esperada(if_match)
+    if version is not None:
+        query += " AND version = ?"
+        values.append(version)
+    
     conn = get_connection()
     cursor = conn.cursor()
     
     try:
-        # Verificar que el suscriptor existe
-        cursor.execute('SELECT * FROM suscriptores WHERE id = ?', (suscriptor_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Suscriptor no encontrado")
-        
-        # Construir consulta dinámica
-        set_clause = []
-        values = []
-        
-        for campo, valor in datos.items():
-            if campo in ['nombre_completo', 'numero_contrato', 'cedula', 'fecha_suscripcion', 'email', 'telefono', 'direccion']:
-                set_clause.append(f"{campo} = ?")
-                values.append(valor)
-        
-        if not set_clause:
-            raise HTTPException(status_code=400, detail="No hay campos válidos para actualizar")
-        
-        # Agregar fecha de actualización
-        set_clause.append("fecha_actualizacion = ?")
-        values.append(datetime.utcnow())
-        values.append(suscriptor_id)
-        
-        query = f"UPDATE suscriptores SET {', '.join(set_clause)} WHERE id = ?"
-        cursor.execute(query, values)
+        result = actualizar_y_leer(cursor, 'suscriptores', query, values, suscriptor_id)
+        if result is None:
+            # Solo en el caso fallido se averigua si no existe o si cambió
+            actual = cursor.execute('SELECT version FROM suscriptores WHERE id = ? AND eliminado_en IS NULL',
+                                    (suscriptor_id,)).fetchone()
+            if actual is None:
+                raise HTTPException(status_code=404, detail="Suscriptor no encontrado")
+            raise HTTPException(status_code=409,
+                                detail=f"El suscriptor fue modificado por otro usuario (versión actual {actual['version']})",
+                                headers={"ETag": etag_version(actual['version'])})
         
         conn.commit()
+        cache_suscriptores.invalidar(suscriptor_id)
+        indice_suscriptores.actualizar(result)
         
-        # Obtener suscriptor actualizado
-        cursor.execute('SELECT * FROM suscriptores WHERE id = ?', (suscriptor_id,))
-        result = cursor.fetchone()
-        
+        response.headers["ETag"] = etag_version(result['version'])
         return dict(result)
+    except HTTPException:
+        conn.rollback()
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
@@ -466,36 +695,245 @@ def eliminar_suscriptor(suscriptor_id: int, current_user: dict = Depends(get_cur
     cursor = conn.cursor()
     
     try:
-        # Verificar que el suscriptor existe
-        cursor.execute('SELECT * FROM suscriptores WHERE id = ?', (suscriptor_id,))
-        if not cursor.fetchone():
+        # Se oculta de inmediato; la purga en segundo plano borra después sus
+        # pagos, recibos e ingresos por lotes sin bloquear a los cajeros
+        cursor.execute('UPDATE suscriptores SET eliminado_en = ? WHERE id = ? AND eliminado_en IS NULL',
+                       (datetime.utcnow(), suscriptor_id))
+        if not cursor.rowcount:
             raise HTTPException(status_code=404, detail="Suscriptor no encontrado")
         
-        # Eliminar todos los registros relacionados en cascada
-        cursor.execute('DELETE FROM ingresos WHERE pago_id IN (SELECT id FROM pagos WHERE suscriptor_id = ?)', (suscriptor_id,))
-        cursor.execute('DELETE FROM recibos WHERE pago_id IN (SELECT id FROM pagos WHERE suscriptor_id = ?)', (suscriptor_id,))
-        cursor.execute('DELETE FROM pagos WHERE suscriptor_id = ?', (suscriptor_id,))
-        cursor.execute('DELETE FROM suscriptores WHERE id = ?', (suscriptor_id,))
-        
         conn.commit()
+        cache_suscriptores.invalidar(suscriptor_id)
+        indice_suscriptores.quitar(suscriptor_id)
+        planificador.ejecutar_pronto('purga_eliminados')
         
         return {"message": "Suscriptor eliminado exitosamente"}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         conn.close()
 
-# Endpoints de Pagos
+# Idempotencia para escrituras: un reintento con el mismo Idempotency-Key
+# devuelve la respuesta original sin volver a escribir. escribir recibe
+# guardar(conn, resultado) y la llama justo antes de su commit: la respuesta
+# queda guardada en la misma transacción que la escritura, así una caída
+# entre los dos commits no deja la clave reservada y la escritura hecha.
+def con_idempotencia(clave: Optional[str], ruta: str, datos, modelo, estado_exito: int, escribir):
+    if not clave:
+        return escribir(lambda conn, resultado: None)
+    
+    huella = idempotencia.huella(jsonable_encoder(datos))
+    try:
+        previo = idempotencia.reservar(clave, ruta, huella)
+    except idempotencia.ClaveEnProceso as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except idempotencia.ClaveReutilizada as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if previo:
+        estado, cuerpo = previo
+        return JSONResponse(status_code=estado, content=cuerpo, headers={"Idempotent-Replayed": "true"})
+    
+    def guardar(conn, resultado):
+        idempotencia.completar(clave, estado_exito, jsonable_encoder(modelo.model_validate(resultado) if modelo else resultado),
+                               conn)
+    
+    try:
+        resultado = escribir(guardar)
+    except HTTPException as e:
+        # Los errores del cliente son definitivos; los del servidor se pueden reintentar
+        if e.status_code < 500:
+            idempotencia.completar(clave, e.status_code, {"detail": e.detail})
+        else:
+            idempotencia.liberar(clave)
+        raise
+    except Exception:
+        idempotencia.liberar(clave)
+        raise
+    
+    return jsonable_encoder(modelo.model_validate(resultado) if modelo else resultado)
+
+# Escrituras por lotes: una transacción, validación en bloque y resultado por elemento
+def ejecutar_lote(insertar, items: List[BaseModel], guardar):
+    if not items:
+        raise HTTPException(status_code=400, detail="El lote está vacío")
+    if len(items) > lotes.MAX_LOTE:
+        raise HTTPException(status_code=413, detail=f"El lote supera el máximo de {lotes.MAX_LOTE} elementos")
+    
+    conn = get_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        resumen = lotes.resumen(insertar(conn, [item.model_dump() for item in items]))
+        guardar(conn, resumen)
+        conn.commit()
+        return resumen
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        conn.close()
+
+@app.post("/suscriptores/batch")
+def crear_suscriptores_lote(suscriptores: List[SuscriptorCreate], idempotency_key: Optional[str] = Header(None),
+                            current_user: dict = Depends(get_current_user_simple)):
+    if not current_user:
+        raise HTTPException(status_code=401, detail="No autenticado")
+    resultado = con_idempotencia(idempotency_key, "/suscriptores/batch", suscriptores, None, 200,
+                                 lambda guardar: ejecutar_lote(lotes.insertar_suscriptores, suscriptores, guardar))
+    indice_suscriptores.revisar_pronto()
+    return resultado
+
+@app.post("/pagos/batch")
+def crear_pagos_lote(pagos: List[PagoCreate], idempotency_key: Optional[str] = Header(None)):
+    return con_idempotencia(idempotency_key, "/pagos/batch", pagos, None, 200,
+                            lambda guardar: ejecutar_lote(lotes.insertar_pagos, pagos, guardar))
+
+@app.post("/gastos/batch")
+def crear_gastos_lote(gastos: List[GastoCreate], idempotency_key: Optional[str] = Header(None)):
+    return con_idempotencia(idempotency_key, "/gastos/batch", gastos, None, 200,
+                            lambda guardar: ejecutar_lote(lotes.insertar_gastos, gastos, guardar))
+
+def eliminar_lote(eliminar, ids: List[int]):
+    if not ids:
+        raise HTTPException(status_code=400, detail="El lote está vacío")
+    if len(ids) > lotes.MAX_LOTE:
+        raise HTTPException(status_code=413, detail=f"El lote supera el máximo de {lotes.MAX_LOTE} elementos")
+    
+    conn = get_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        inicio = time.perf_counter()
+        resultado = eliminar(conn, ids)
+        conn.commit()
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+        metricas.observar('eliminacion.lote_ms', duracion_ms)
+        resultado['duracion_ms'] = round(duracion_ms, 2)
+        return resultado
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        conn.close()
+
+@app.post("/suscriptores/batch/eliminar")
+def eliminar_suscriptores_lote(ids: List[int], current_user: dict = Depends(get_current_user_simple)):
+    """Eliminar varios suscriptores; sus pagos, recibos e ingresos se purgan en segundo plano"""
+    if not current_user:
+        raise HTTPException(status_code=401, detail="No autenticado")
+    resultado = eliminar_lote(lotes.marcar_eliminados, ids)
+    for suscriptor_id in resultado['eliminados']:
+        cache_suscriptores.invalidar(suscriptor_id)
+        indice_suscriptores.quitar(suscriptor_id)
+    planificador.ejecutar_pronto('purga_eliminados')
+    return resultado
+
+@app.post("/pagos/batch/eliminar")
+def eliminar_pagos_lote(ids: List[int], current_user: dict = Depends(get_current_user_simple)):
+    """Eliminar varios pagos con sus recibos e ingresos"""
+    if not current_user:
+        raise HTTPException(status_code=401, detail="No autenticado")
+    return eliminar_lote(lambda conn, ids: lotes.eliminar(conn, 'pagos', ids), ids)
+
+# Importación masiva (el cuerpo de la petición es el archivo CSV o XLSX)
+# Cada bloque de filas se valida en memoria y se confirma en una sola transacción
+MAX_TAMANO_LOTE_IMPORTACION = 200000
+MAX_IMPORTACION_BYTES = int(float(os.environ.get("SISTEMA_IMPORTAR_MAX_MB", "200")) * 1024 * 1024)
+
+@app.post("/importar/{entidad}")
+async def importar_archivo(entidad: str, request: Request, formato: str = "csv", hoja: Optional[str] = None,
+                           tamano_lote: Optional[int] = Query(None, ge=1, le=MAX_TAMANO_LOTE_IMPORTACION),
+                           diferir_indices: bool = False,
+                           current_user: dict = Depends(get_current_user_simple)):
+    """Importar suscriptores, pagos o gastos; las filas rechazadas quedan en un CSV descargable"""
+    verificar_admin(current_user)
+    import importador
+    
+    demasiado_grande = HTTPException(status_code=413, detail=f"El archivo supera el máximo de "
+                                                            f"{MAX_IMPORTACION_BYTES // (1024 * 1024)} MB")
+    try:
+        declarado = int(request.headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Content-Length inválido")
+    if declarado > MAX_IMPORTACION_BYTES:
+        raise demasiado_grande
+    if entidad not in importador.COLUMNAS:
+        raise HTTPException(status_code=404, detail=f"Entidad desconocida: {entidad}")
+    if formato not in ("csv", "xlsx"):
+        raise HTTPException(status_code=400, detail="Formato no soportado, use csv o xlsx")
+    
+    from starlette.concurrency import run_in_threadpool
+    
+    os.makedirs(importador.IMPORTACIONES_DIR, exist_ok=True)
+    nombre = f"{entidad}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+    ruta = os.path.join(importador.IMPORTACIONES_DIR, f"{nombre}.{formato}")
+    rechazos = os.path.join(importador.IMPORTACIONES_DIR, f"{nombre}.rechazos.csv")
+    
+    # Guardar el cuerpo en disco a medida que llega, sin cargarlo en memoria; el límite
+    # se cuenta sobre lo recibido porque un envío por partes no declara Content-Length
+    recibidos = 0
+    with open(ruta, "wb") as archivo:
+        async for parte in request.stream():
+            recibidos += len(parte)
+            if recibidos > MAX_IMPORTACION_BYTES:
+                break
+            archivo.write(parte)
+    if recibidos > MAX_IMPORTACION_BYTES:
+        os.remove(ruta)
+        raise demasiado_grande
+    
+    try:
+        resumen = await run_in_threadpool(importador.importar, entidad, ruta, formato, hoja,
+                                          tamano_lote or importador.TAMANO_LOTE,
+                                          rechazos, diferir_indices)
+    except importador.ArchivoInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        os.remove(ruta)
+    
+    if entidad == 'suscriptores':
+        indice_suscriptores.revisar_pronto()
+    if resumen['archivo_rechazos']:
+        resumen['archivo_rechazos'] = os.path.basename(resumen['archivo_rechazos'])
+    return resumen
+
+@app.get("/importar/rechazos/{archivo}")
+def descargar_rechazos(archivo: str, current_user: dict = Depends(get_current_user_simple)):
+    verificar_admin(current_user)
+    from importador import IMPORTACIONES_DIR
+    
+    ruta = os.path.join(IMPORTACIONES_DIR, archivo)
+    if os.path.basename(archivo) != archivo or not os.path.exists(ruta):
+        raise HTTPException(status_code=404, detail="Archivo de rechazos no encontrado")
+    return FileResponse(ruta, media_type="text/csv", filename=archivo)
+
+def pagos_visibles(cursor):
+    """Condiciones que ocultan los pagos de suscriptores eliminados pendientes de purga
+
+    Casi siempre no hay ninguno y la condición se omite; si los hay, NOT IN
+    evalúa la lista una sola vez en lugar de buscar el suscriptor de cada pago.
+    """
+    if cursor.execute('SELECT 1 FROM suscriptores WHERE eliminado_en IS NOT NULL LIMIT 1').fetchone():
+        return ["suscriptor_id NOT IN (SELECT id FROM suscriptores WHERE eliminado_en IS NOT NULL)"]
+    return []
+
 @app.post("/pagos/", response_model=PagoResponse, status_code=status.HTTP_201_CREATED)
-def crear_pago(pago: PagoCreate):
+def crear_pago(pago: PagoCreate, idempotency_key: Optional[str] = Header(None)):
+    return con_idempotencia(idempotency_key, "/pagos/", pago, PagoResponse, status.HTTP_201_CREATED,
+                            lambda guardar: registrar_pago(pago, guardar))
+
+def registrar_pago(pago: PagoCreate, guardar):
     conn = get_connection()
     cursor = conn.cursor()
     
     try:
-        # Verificar suscriptor
-        cursor.execute('SELECT nombre_completo FROM suscriptores WHERE id = ?', (pago.suscriptor_id,))
-        suscriptor = cursor.fetchone()
+        # Verificar suscriptor en la transacción de escritura y no en la caché: otro
+        # proceso pudo eliminarlo hace menos que la vigencia de la caché, y la purga
+        # borraría después este pago sin aviso
+        cursor.execute('BEGIN IMMEDIATE')
+        suscriptor = cursor.execute('SELECT nombre_completo FROM suscriptores WHERE id = ? AND eliminado_en IS NULL',
+                                    (pago.suscriptor_id,)).fetchone()
         if not suscriptor:
             raise HTTPException(status_code=404, detail="Suscriptor no encontrado")
         
@@ -509,23 +947,29 @@ def crear_pago(pago: PagoCreate):
             raise HTTPException(status_code=400, detail=f"Ya existe un pago para este suscriptor en {pago.mes}/{pago.anio}")
         
         # Crear pago
-        cursor.execute('''
+        result = insertar_y_leer(cursor, 'pagos', '''
             INSERT INTO pagos (suscriptor_id, mes, anio, fecha_pago, valor, tipo_pago, entidad_bancaria, nombre_transferente, monto_efectivo)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (pago.suscriptor_id, pago.mes, pago.anio, pago.fecha_pago, pago.valor, pago.tipo_pago, 
                pago.entidad_bancaria, pago.nombre_transferente, pago.monto_efectivo))
         
-        pago_id = cursor.lastrowid
+        # Recibo e ingreso en la misma transacción: si fallan no queda un pago sin recibo
+        # (y un reintento con el mismo Idempotency-Key no choca con el pago ya guardado)
+        crear_recibo_y_ingreso(result['id'], suscriptor['nombre_completo'], pago.valor, pago.fecha_pago, conn)
+        guardar(conn, dict(result))
         conn.commit()
         
-        # Crear recibo e ingreso automáticamente
-        crear_recibo_y_ingreso(pago_id, suscriptor['nombre_completo'], pago.valor, pago.fecha_pago)
-        
-        # Obtener pago creado
-        cursor.execute('SELECT * FROM pagos WHERE id = ?', (pago_id,))
-        result = cursor.fetchone()
-        
         return dict(result)
+    except HTTPException:
+        conn.rollback()
+        raise
+    except sqlite3.IntegrityError as e:
+        conn.rollback()
+        if 'FOREIGN KEY' in str(e):
+            # Eliminado por otro proceso después de la verificación
+            cache_suscriptores.invalidar(pago.suscriptor_id)
+            raise HTTPException(status_code=404, detail="Suscriptor no encontrado")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
@@ -533,34 +977,146 @@ def crear_pago(pago: PagoCreate):
         conn.close()
 
 @app.get("/pagos/", response_model=List[PagoResponse])
-def listar_pagos(skip: int = 0, limit: int = 100):
+def listar_pagos(response: Response, skip: int = 0, limit: int = 100, suscriptor_id: Optional[int] = None, q: str = "",
+                 orden: str = "fecha_pago", direccion: str = "desc", contar: bool = False, fields: Optional[str] = None,
+                 accept: Optional[str] = Header(None)):
+    """Página de pagos; q busca por id de suscriptor (número) o por nombre del suscriptor (texto)"""
+    ordenar = orden_sql(orden, direccion, ORDEN_PAGOS)
+    campos = campos_pedidos(fields, PagoResponse)
+    formato = formato_pedido(accept, response)
+    
     conn = get_connection()
     cursor = conn.cursor()
     
-    cursor.execute('SELECT * FROM pagos ORDER BY fecha_pago DESC LIMIT ? OFFSET ?', (limit, skip))
+    condiciones = pagos_visibles(cursor)
+    params = []
+    if suscriptor_id is not None:
+        condiciones.append("suscriptor_id = ?")
+        params.append(suscriptor_id)
+    if q.strip().isdigit():
+        condiciones.append("suscriptor_id = ?")
+        params.append(int(q))
+    elif q.strip():
+        condiciones.append("suscriptor_id IN (SELECT id FROM suscriptores WHERE nombre_completo LIKE ? AND eliminado_en IS NULL)")
+        params.append(f'%{q.strip()}%')
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    
+    cursor.execute(f'SELECT {", ".join(campos) if campos else "*"} FROM pagos {where} {ordenar} LIMIT ? OFFSET ?',
+                   params + [limit, skip])
     results = cursor.fetchall()
+    if contar:
+        response.headers["X-Total-Count"] = str(cursor.execute(f'SELECT COUNT(*) FROM pagos {where}', params).fetchone()[0])
     conn.close()
     
+    if formato == formatos.MSGPACK:
+        return respuesta_msgpack(results, PagoResponse, campos, response)
+    if campos:
+        return respuesta_parcial(results, PagoResponse, campos, response)
     return [dict(row) for row in results]
 
+# Bloques leídos del cursor y codificados por vez en /pagos/exportar
+FILAS_POR_BLOQUE = 1000
+
+@app.get("/pagos/exportar", response_model=List[PagoResponse])
+def exportar_pagos(response: Response, desde_id: int = 0, suscriptor_id: Optional[int] = None,
+                   fecha_inicio: Optional[date] = None, fecha_fin: Optional[date] = None,
+                   fields: Optional[str] = None, accept: Optional[str] = Header(None),
+                   current_user: dict = Depends(get_current_user_simple)):
+    """Pagos con id mayor que desde_id, en orden de id, enviados en streaming (JSON o MessagePack)
+
+    Las filas se leen y codifican por bloques, sin cargar el historial en memoria.
+    El total (X-Total-Count) y las filas salen de la misma transacción de lectura;
+    una exportación cortada se retoma con desde_id = último id recibido.
+    """
+    if not current_user:
+        raise HTTPException(status_code=401, detail="No autenticado")
+    campos = campos_pedidos(fields, PagoResponse) or tuple(PagoResponse.model_fields)
+    formato = formato_pedido(accept, response)
+    
+    # Conexión propia y no del pool: la duración depende de lo rápido que lea el cliente
+    conn = get_read_connection()
+    try:
+        conn.execute('BEGIN')
+        condiciones = pagos_visibles(conn.cursor()) + ["id > ?"]
+        params = [desde_id]
+        if suscriptor_id is not None:
+            condiciones.append("suscriptor_id = ?")
+            params.append(suscriptor_id)
+        if fecha_inicio:
+            condiciones.append("fecha_pago >= ?")
+            params.append(fecha_inicio.isoformat())
+        if fecha_fin:
+            condiciones.append("fecha_pago <= ?")
+            params.append(fecha_fin.isoformat())
+        where = f"WHERE {' AND '.join(condiciones)}"
+        total = conn.execute(f'SELECT COUNT(*) FROM pagos {where}', params).fetchone()[0]
+        cursor = conn.execute(f'SELECT {", ".join(campos)} FROM pagos {where} ORDER BY id', params)
+    except Exception:
+        conn.close()
+        raise
+    
+    def bloques():
+        try:
+            while filas := cursor.fetchmany(FILAS_POR_BLOQUE):
+                yield filas
+        finally:
+            conn.close()
+    
+    return StreamingResponse(formatos.codificar(bloques(), campos, formato, total), media_type=formato,
+                             headers={**response.headers, "X-Total-Count": str(total)})
+
+@app.get("/pagos/suscriptor/{suscriptor_id}", response_model=List[PagoResponse])
+def listar_pagos_por_suscriptor(suscriptor_id: int, response: Response, accept: Optional[str] = Header(None)):
+    formato = formato_pedido(accept, response)
+    conn = get_connection()
+    try:
+        if not cache_suscriptores.buscar('id', suscriptor_id, conn):
+            raise HTTPException(status_code=404, detail="Suscriptor no encontrado")
+        
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM pagos WHERE suscriptor_id = ? ORDER BY anio DESC, mes DESC', (suscriptor_id,))
+        results = cursor.fetchall()
+        if formato == formatos.MSGPACK:
+            return respuesta_msgpack(results, PagoResponse, None, response)
+        return [dict(row) for row in results]
+    finally:
+        conn.close()
+
+@app.get("/recibos/suscriptor/{suscriptor_id}", response_model=List[ReciboResponse])
+def listar_recibos_por_suscriptor(suscriptor_id: int):
+    conn = get_connection()
+    try:
+        if not cache_suscriptores.buscar('id', suscriptor_id, conn):
+            raise HTTPException(status_code=404, detail="Suscriptor no encontrado")
+        
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT r.id, r.pago_id, r.numero_recibo, r.fecha_emision, p.mes, p.anio, p.valor
+            FROM recibos r JOIN pagos p ON p.id = r.pago_id
+            WHERE p.suscriptor_id = ? ORDER BY p.anio DESC, p.mes DESC
+        ''', (suscriptor_id,))
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
 # Endpoints de Gastos
 @app.post("/gastos/", response_model=GastoResponse, status_code=status.HTTP_201_CREATED)
-def crear_gasto(gasto: GastoCreate):
+def crear_gasto(gasto: GastoCreate, idempotency_key: Optional[str] = Header(None)):
+    return con_idempotencia(idempotency_key, "/gastos/", gasto, GastoResponse, status.HTTP_201_CREATED,
+                            lambda guardar: registrar_gasto(gasto, guardar))
+
+def registrar_gasto(gasto: GastoCreate, guardar):
     conn = get_connection()
     cursor = conn.cursor()
     
     try:
-        cursor.execute('''
+        result = insertar_y_leer(cursor, 'gastos', '''
             INSERT INTO gastos (tipo_gasto, descripcion, valor, fecha, lugar_compra, motivo)
             VALUES (?, ?, ?, ?, ?, ?)
         ''', (gasto.tipo_gasto, gasto.descripcion, gasto.valor, gasto.fecha, gasto.lugar_compra, gasto.motivo))
-        
-        gasto_id = cursor.lastrowid
+        guardar(conn, dict(result))
         conn.commit()
         
-        cursor.execute('SELECT * FROM gastos WHERE id = ?', (gasto_id,))
-        result = cursor.fetchone()
-        
         return dict(result)
     except Exception as e:
         conn.rollback()
@@ -569,7 +1125,8 @@ def crear_gasto(gasto: GastoCreate):
         conn.close()
 
 @app.get("/gastos/", response_model=List[GastoResponse])
-def listar_gastos(skip: int = 0, limit: int = 100):
+def listar_gastos(response: Response, skip: int = 0, limit: int = 100, accept: Optional[str] = Header(None)):
+    formato = formato_pedido(accept, response)
     conn = get_connection()
     cursor = conn.cursor()
     
@@ -577,8 +1134,19 @@ def listar_gastos(skip: int = 0, limit: int = 100):
     results = cursor.fetchall()
     conn.close()
     
+    if formato == formatos.MSGPACK:
+        return respuesta_msgpack(results, GastoResponse, None, response)
     return [dict(row) for row in results]
 
+@app.get("/gastos/buscar", response_model=List[GastoBusqueda])
+def buscar_gastos(q: str = "", tipo_gasto: Optional[str] = None, fecha_inicio: Optional[date] = None,
+                  fecha_fin: Optional[date] = None, limit: int = 50):
+    """Buscar gastos por descripción, lugar o motivo (por prefijo), con filtros por tipo y fechas"""
+    import busqueda_gastos
+    
+    with pool_lectura.conexion() as conn:
+        return busqueda_gastos.buscar(conn, q, tipo_gasto, fecha_inicio, fecha_fin, max(1, min(limit, 200)))
+
 @app.delete("/pagos/{pago_id}")
 def eliminar_pago(pago_id: int, current_user: dict = Depends(get_current_user_simple)):
     if not current_user:
@@ -588,19 +1156,16 @@ def eliminar_pago(pago_id: int, current_user: dict = Depends(get_current_user_si
     cursor = conn.cursor()
     
     try:
-        # Verificar que el pago existe
-        cursor.execute('SELECT * FROM pagos WHERE id = ?', (pago_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Pago no encontrado")
-        
-        # Eliminar pago y sus registros relacionados en cascada
-        cursor.execute('DELETE FROM ingresos WHERE pago_id = ?', (pago_id,))
-        cursor.execute('DELETE FROM recibos WHERE pago_id = ?', (pago_id,))
+        # Recibo e ingreso se eliminan en cascada (ON DELETE CASCADE)
         cursor.execute('DELETE FROM pagos WHERE id = ?', (pago_id,))
+        if not cursor.rowcount:
+            raise HTTPException(status_code=404, detail="Pago no encontrado")
         
         conn.commit()
         
         return {"message": "Pago eliminado exitosamente"}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
@@ -644,49 +1209,385 @@ def listar_ingresos(skip: int = 0, limit: int = 100):
     
     return [dict(row) for row in results]
 
-# Endpoint de Balance
+# Endpoints de Balance (pool de solo lectura, separado de las escrituras)
 @app.get("/balance/")
 def obtener_balance():
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Total ingresos
-    cursor.execute('SELECT SUM(monto) as total FROM ingresos')
-    ingresos_result = cursor.fetchone()
-    total_ingresos = ingresos_result['total'] or 0
-    
-    # Total gastos
-    cursor.execute('SELECT SUM(valor) as total FROM gastos')
-    gastos_result = cursor.fetchone()
-    total_gastos = gastos_result['total'] or 0
+    with pool_lectura.conexion() as conn:
+        cursor = conn.cursor()
+        
+        # Total ingresos
+        cursor.execute('SELECT SUM(monto) as total FROM ingresos')
+        ingresos_result = cursor.fetchone()
+        total_ingresos = ingresos_result['total'] or 0
+        
+        # Total gastos
+        cursor.execute('SELECT SUM(valor) as total FROM gastos')
+        gastos_result = cursor.fetchone()
+        total_gastos = gastos_result['total'] or 0
     
     balance_total = total_ingresos - total_gastos
     
-    conn.close()
-    
     return {
         "total_ingresos": total_ingresos,
         "total_gastos": total_gastos,
         "balance_total": balance_total
     }
 
-def open_browser():
-    time.sleep(3)  # Esperar más tiempo para que el servidor inicie completamente
+def filtro_fechas(columna: str, fecha_inicio: Optional[date], fecha_fin: Optional[date]):
+    """Construir condición WHERE y parámetros para un rango de fechas opcional"""
+    condiciones = []
+    params = []
+    if fecha_inicio:
+        condiciones.append(f"{columna} >= ?")
+        params.append(fecha_inicio.isoformat())
+    if fecha_fin:
+        condiciones.append(f"{columna} <= ?")
+        params.append(fecha_fin.isoformat())
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    return where, params
+
+def rango_anio(anio: int):
+    """Límites [inicio, fin) de un año para filtrar columnas DATE usando índices"""
+    return f"{anio:04d}-01-01", f"{anio + 1:04d}-01-01"
+
+# Los reportes pesados se calculan y codifican una vez para las peticiones
+# iguales que llegan mientras están en curso (ver vuelo_unico.py)
+async def respuesta_compartida(clave, calcular, *args):
+    cuerpo = await reportes_compartidos.ejecutar(clave, lambda: JSONResponse(calcular(*args)).body)
+    return Response(cuerpo, media_type="application/json")
+
+@app.get("/balance/detallado")
+async def obtener_balance_detallado(fecha_inicio: Optional[date] = None, fecha_fin: Optional[date] = None):
+    """Balance detallado con desglose de ingresos y gastos"""
+    return await respuesta_compartida(('balance/detallado', fecha_inicio, fecha_fin), balance_detallado,
+                                      fecha_inicio, fecha_fin)
+
+def balance_detallado(fecha_inicio: Optional[date], fecha_fin: Optional[date]):
+    with pool_lectura.conexion() as conn:
+        cursor = conn.cursor()
+        
+        where, params = filtro_fechas("fecha", fecha_inicio, fecha_fin)
+        cursor.execute(f'SELECT id, monto, fecha, origen FROM ingresos {where} ORDER BY fecha DESC', params)
+        ingresos = [dict(row) for row in cursor.fetchall()]
+        
+        cursor.execute(f'''
+            SELECT id, tipo_gasto, descripcion, valor, fecha, lugar_compra, motivo
+            FROM gastos {where} ORDER BY fecha DESC
+        ''', params)
+        gastos = [dict(row) for row in cursor.fetchall()]
+    
+    total_ingresos = sum(ing['monto'] for ing in ingresos)
+    total_gastos = sum(gas['valor'] for gas in gastos)
+    
+    return {
+        "resumen": {
+            "total_ingresos": total_ingresos,
+            "total_gastos": total_gastos,
+            "balance_total": total_ingresos - total_gastos,
+            "cantidad_ingresos": len(ingresos),
+            "cantidad_gastos": len(gastos)
+        },
+        "ingresos": ingresos,
+        "gastos": gastos
+    }
+
+@app.get("/balance/mensual")
+async def obtener_balance_mensual(anio: int):
+    """Balance mensual para un año específico"""
+    return await respuesta_compartida(('balance/mensual', anio), balance_mensual, anio)
+
+def balance_mensual(anio: int):
+    inicio, fin = rango_anio(anio)
+    with pool_lectura.conexion() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT CAST(strftime('%m', fecha) AS INTEGER) as mes, SUM(monto) as total
+            FROM ingresos WHERE fecha >= ? AND fecha < ? GROUP BY mes
+        ''', (inicio, fin))
+        ingresos_mensuales = {row['mes']: row['total'] for row in cursor.fetchall()}
+        
+        cursor.execute('''
+            SELECT CAST(strftime('%m', fecha) AS INTEGER) as mes, SUM(valor) as total
+            FROM gastos WHERE fecha >= ? AND fecha < ? GROUP BY mes
+        ''', (inicio, fin))
+        gastos_mensuales = {row['mes']: row['total'] for row in cursor.fetchall()}
+    
+    balance_mensual = []
+    for mes in range(1, 13):
+        ingresos_mes = float(ingresos_mensuales.get(mes, 0.0))
+        gastos_mes = float(gastos_mensuales.get(mes, 0.0))
+        balance_mensual.append({
+            "mes": mes,
+            "ingresos": ingresos_mes,
+            "gastos": gastos_mes,
+            "balance": ingresos_mes - gastos_mes
+        })
+    
+    return balance_mensual
+
+@app.get("/balance/suscriptores-activos")
+def obtener_balance_suscriptores_activos(fecha_inicio: Optional[date] = None, fecha_fin: Optional[date] = None):
+    """Balance por suscriptores con pagos en un período"""
+    where, params = filtro_fechas("p.fecha_pago", fecha_inicio, fecha_fin)
+    with pool_lectura.conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT p.id, p.suscriptor_id, p.mes, p.anio, p.fecha_pago, p.valor, p.tipo_pago,
+                   s.nombre_completo, s.numero_contrato
+            FROM pagos p JOIN suscriptores s ON s.id = p.suscriptor_id AND s.eliminado_en IS NULL
+            {where}
+            ORDER BY s.nombre_completo
+        ''', params)
+        pagos = cursor.fetchall()
+    
+    # Agrupar por suscriptor
+    suscriptores_balance = {}
+    for pago in pagos:
+        if pago['suscriptor_id'] not in suscriptores_balance:
+            suscriptores_balance[pago['suscriptor_id']] = {
+                "suscriptor_id": pago['suscriptor_id'],
+                "nombre_completo": pago['nombre_completo'],
+                "numero_contrato": pago['numero_contrato'],
+                "total_pagado": 0.0,
+                "cantidad_pagos": 0,
+                "pagos": []
+            }
+        
+        balance = suscriptores_balance[pago['suscriptor_id']]
+        balance["total_pagado"] += float(pago['valor'])
+        balance["cantidad_pagos"] += 1
+        balance["pagos"].append({
+            "id": pago['id'],
+            "mes": pago['mes'],
+            "anio": pago['anio'],
+            "fecha_pago": pago['fecha_pago'],
+            "valor": float(pago['valor']),
+            "tipo_pago": pago['tipo_pago']
+        })
+    
+    return list(suscriptores_balance.values())
+
+@app.get("/gastos/resumen/mensual")
+def resumen_gastos_mensuales(anio: int):
+    """Resumen de gastos mensuales para un año específico"""
+    inicio, fin = rango_anio(anio)
+    with pool_lectura.conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT CAST(strftime('%m', fecha) AS INTEGER) as mes, SUM(valor) as total, COUNT(id) as cantidad
+            FROM gastos WHERE fecha >= ? AND fecha < ?
+            GROUP BY mes ORDER BY mes
+        ''', (inicio, fin))
+        resumen = cursor.fetchall()
+    
+    return [
+        {"mes": row['mes'], "total": float(row['total']), "cantidad": row['cantidad']}
+        for row in resumen
+    ]
+
+# Vista de inicio del panel
+@app.get("/dashboard/resumen")
+def resumen_dashboard(current_user: dict = Depends(get_current_user_simple)):
+    """Totales, mes en curso, conteos, suscriptores en mora y actividad reciente en una respuesta"""
+    if not current_user:
+        raise HTTPException(status_code=401, detail="No autenticado")
+    
+    return resumen_panel.obtener()
+
+# Varias consultas GET en una petición (ver multiplexor.py)
+@app.post("/batch")
+async def peticiones_multiples(subpeticiones: List[Subpeticion], request: Request,
+                               current_user: dict = Depends(get_current_user_simple)):
+    """Ejecutar a la vez varias consultas GET y devolver cada una con su estado, duración y cuerpo"""
+    if not current_user:
+        raise HTTPException(status_code=401, detail="No autenticado")
+    if not subpeticiones:
+        raise HTTPException(status_code=400, detail="El lote está vacío")
+    import multiplexor
+    
+    if len(subpeticiones) > multiplexor.MAX_SUBPETICIONES:
+        raise HTTPException(status_code=413,
+                            detail=f"El lote supera el máximo de {multiplexor.MAX_SUBPETICIONES} subpeticiones")
+    
+    contenido = await multiplexor.ejecutar(request.app, request.scope, [s.model_dump() for s in subpeticiones])
+    return Response(contenido, media_type="application/json")
+
+# Eventos en vivo (ver eventos.py)
+@app.get("/eventos")
+async def flujo_eventos(last_event_id: Optional[str] = Header(None), current_user: dict = Depends(get_current_user_simple)):
+    """Pagos, gastos, eliminaciones y balance a medida que se confirman (text/event-stream)"""
+    if not current_user:
+        raise HTTPException(status_code=401, detail="No autenticado")
+    
     try:
-        # Verificar si ya hay una ventana abierta para evitar duplicados
-        import subprocess
-        result = subprocess.run(['tasklist', '/FI', 'IMAGENAME eq chrome.exe'], capture_output=True, text=True)
-        if 'chrome.exe' not in result.stdout:
-            webbrowser.open("http://localhost:8000")
-            print("Navegador abierto en http://localhost:8000")
-        else:
-            print("Navegador ya está abierto, abriendo nueva pestaña...")
-            webbrowser.open("http://localhost:8000")
+        cliente, perdidos = await difusor.conectar(last_event_id)
+    except DemasiadosClientes as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return StreamingResponse(difusor.flujo(cliente, perdidos), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Sincronización incremental
+@app.get("/sync/changes")
+def cambios_sincronizacion(since: Optional[str] = None, current_user: dict = Depends(get_current_user_simple)):
+    """Suscriptores, pagos y gastos creados, modificados o eliminados desde el token"""
+    if not current_user:
+        raise HTTPException(status_code=401, detail="No autenticado")
+    import sincronizacion
+    
+    try:
+        with pool_lectura.conexion() as conn:
+            return sincronizacion.cambios_desde(conn, since)
+    except sincronizacion.TokenInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except sincronizacion.TokenVencido as e:
+        raise HTTPException(status_code=410, detail=str(e))
+
+# Endpoints de Mantenimiento
+def verificar_admin(current_user: dict):
+    if not current_user or current_user['rol'] != 'admin':
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+
+@app.get("/mantenimiento/")
+def estado_mantenimiento(current_user: dict = Depends(get_current_user_simple)):
+    """Estado, programa e historial del planificador de mantenimiento"""
+    verificar_admin(current_user)
+    return planificador.estado()
+
+@app.post("/mantenimiento/pausar")
+def pausar_mantenimiento(current_user: dict = Depends(get_current_user_simple)):
+    """Pausar el mantenimiento (por ejemplo, durante horas pico)"""
+    verificar_admin(current_user)
+    planificador.pausar()
+    return {"message": "Mantenimiento pausado"}
+
+@app.post("/mantenimiento/reanudar")
+def reanudar_mantenimiento(current_user: dict = Depends(get_current_user_simple)):
+    verificar_admin(current_user)
+    planificador.reanudar()
+    return {"message": "Mantenimiento reanudado"}
+
+@app.put("/mantenimiento/programa")
+def actualizar_programa_mantenimiento(programa: dict, current_user: dict = Depends(get_current_user_simple)):
+    """Cambiar intervalos en segundos por tarea (0 desactiva la tarea)"""
+    verificar_admin(current_user)
+    for tarea, segundos in programa.items():
+        try:
+            planificador.programar(tarea, int(segundos))
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"Tarea de mantenimiento desconocida: {tarea}")
+    return planificador.estado()['programa']
+
+@app.post("/mantenimiento/{tarea}/ejecutar")
+def ejecutar_tarea_mantenimiento(tarea: str, current_user: dict = Depends(get_current_user_simple)):
+    """Ejecutar una tarea de mantenimiento inmediatamente"""
+    verificar_admin(current_user)
+    if tarea not in planificador.programa:
+        raise HTTPException(status_code=404, detail=f"Tarea de mantenimiento desconocida: {tarea}")
+    return planificador.ejecutar(tarea)
+
+# Endpoints de Respaldos
+@app.get("/respaldos/")
+def listar_respaldos(current_user: dict = Depends(get_current_user_simple)):
+    verificar_admin(current_user)
+    import respaldos
+    
+    return respaldos.listar_respaldos()
+
+@app.post("/respaldos/", status_code=status.HTTP_201_CREATED)
+def crear_respaldo(current_user: dict = Depends(get_current_user_simple)):
+    """Crear un respaldo en línea verificado (el progreso se ve en /metricas)"""
+    verificar_admin(current_user)
+    import respaldos
+    
+    try:
+        return respaldos.crear_respaldo()
+    except respaldos.RespaldoInvalido as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/respaldos/{archivo}/verificar")
+def verificar_respaldo(archivo: str, current_user: dict = Depends(get_current_user_simple)):
+    verificar_admin(current_user)
+    if os.path.basename(archivo) != archivo:
+        raise HTTPException(status_code=400, detail="Nombre de respaldo inválido")
+    import respaldos
+    
+    try:
+        return {"archivo": archivo, "integridad": respaldos.verificar_respaldo(respaldos.resolver_respaldo(archivo))}
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except respaldos.RespaldoInvalido as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/metricas")
+def obtener_metricas():
+    instantanea = metricas.instantanea()
+    instantanea['pools'] = {pool_lectura.nombre: pool_lectura.estado()}
+    instantanea['caches'] = {cache_suscriptores.nombre: cache_suscriptores.estado(),
+                             indice_suscriptores.nombre: indice_suscriptores.estado(),
+                             resumen_panel.nombre: resumen_panel.estado()}
+    instantanea['eventos'] = difusor.estado()
+    instantanea['reportes_compartidos'] = reportes_compartidos.estado()
+    return instantanea
+
+def esperar_servidor(url, timeout=30.0, intervalo=0.05):
+    """Esperar a que /health responda; devuelve True si el servidor está listo"""
+    from urllib.request import urlopen
+    
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            with urlopen(f"{url}/health", timeout=1) as respuesta:
+                if respuesta.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(intervalo)
+    return False
+
+def open_browser(url="http://localhost:8000"):
+    # Abrir en cuanto el servidor responda, sin esperas fijas
+    if not esperar_servidor(url):
+        print(f"El servidor no respondió a tiempo. Por favor, abre manualmente: {url}")
+        return
+    try:
+        import webbrowser
+        webbrowser.open(url)
+        print(f"Navegador abierto en {url}")
     except Exception as e:
         print(f"No se pudo abrir el navegador automáticamente: {e}")
-        print("Por favor, abre manualmente: http://localhost:8000")
+        print(f"Por favor, abre manualmente: {url}")
+
+def limpiar_datos_huerfanos():
+    """Limpiar datos huérfanos (pagos sin suscriptor, ingresos y recibos sin pago)"""
+    try:
+        eliminados = limpiar_huerfanos()
+        print(f"🧹 Datos huérfanos limpiados automáticamente "
+              f"({eliminados['pagos']} pagos, {eliminados['ingresos']} ingresos, {eliminados['recibos']} recibos)")
+    except Exception as e:
+        print(f"Error limpiando datos: {e}")
 
-def main():
+def parse_args(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Sistema de Gestión de Suscriptores y Finanzas")
+    parser.add_argument("--rapido", action="store_true",
+                        default=os.environ.get("SISTEMA_INICIO_RAPIDO") == "1",
+                        help="Arranque rápido: omitir el esquema si la huella coincide y diferir el mantenimiento")
+    parser.add_argument("--host", default=os.environ.get("SISTEMA_HOST", "127.0.0.1"),
+                        help="Dirección de escucha (0.0.0.0 para atender a toda la oficina)")
+    parser.add_argument("--puerto", type=int, default=8000, help="Puerto del servidor web")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("SISTEMA_WORKERS", "1")),
+                        help="Cantidad de procesos servidor")
+    parser.add_argument("--sin-navegador", action="store_true", help="No abrir el navegador al iniciar")
+    parser.add_argument("--espera-apagado", type=float, default=float(os.environ.get("SISTEMA_APAGADO_TIMEOUT", "5")),
+                        help="Con varios workers, segundos que se esperan las respuestas en curso al apagar")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    url = f"http://localhost:{args.puerto}"
+    
     print("=" * 60)
     print("SISTEMA DE GESTION DE SUSCRIPTORES Y FINANZAS")
     print("=" * 60)
@@ -694,34 +1595,56 @@ def main():
     print("Version: 1.0.0 - Simple (Sin SQLAlchemy)")
     print("=" * 60)
     
-    # Inicializar base de datos
-    init_database()
+    # Inicializar base de datos una sola vez, antes de lanzar los workers
+    if init_database(rapido=args.rapido):
+        print("Esquema de base de datos creado/actualizado")
+    elif args.rapido:
+        print("⚡ Esquema vigente, se omite la inicialización")
+    else:
+        print("Esquema de base de datos vigente y verificado")
     
-    # Limpiar datos huérfanos automáticamente
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('DELETE FROM ingresos WHERE pago_id NOT IN (SELECT id FROM pagos)')
-        cursor.execute('DELETE FROM recibos WHERE pago_id NOT IN (SELECT id FROM pagos)')
-        conn.commit()
-        print("🧹 Datos huérfanos limpiados automáticamente")
-    except Exception as e:
-        print(f"Error limpiando datos: {e}")
-    finally:
-        conn.close()
+    # Limpiar datos huérfanos automáticamente (diferido al planificador en modo rápido)
+    if args.rapido:
+        os.environ["SISTEMA_INICIO_RAPIDO"] = "1"
+    else:
+        limpiar_datos_huerfanos()
     
-    print(f"Base de datos creada en: {sistema_suscriptores.db}")
+    print(f"Base de datos en: {get_database_path()}")
     print("Sistema iniciado correctamente")
-    print("Servidor web iniciado en http://localhost:8000")
-    print("Interfaz web disponible en http://localhost:8000/ui")
+    print(f"Servidor web iniciado en {url} ({args.workers} proceso(s))")
+    print(f"Interfaz web disponible en {url}/ui")
     
     # Iniciar navegador
-    browser_thread = threading.Thread(target=open_browser)
-    browser_thread.daemon = True
-    browser_thread.start()
+    if not args.sin_navegador:
+        browser_thread = threading.Thread(target=open_browser, args=(url,))
+        browser_thread.daemon = True
+        browser_thread.start()
     
     import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8000, log_level="info")
+    if args.workers > 1:
+        # Con varios workers uvicorn necesita importar la app por nombre y crea el servidor
+        # de cada uno: los flujos de /eventos abiertos se cortan al vencer la espera
+        uvicorn.run("main_simple_fixed:app", host=args.host, port=args.puerto,
+                    workers=args.workers, app_dir=CURRENT_DIR, log_level="info",
+                    timeout_graceful_shutdown=args.espera_apagado)
+        # Todos los workers terminaron: vaciar el WAL por completo
+        checkpoint_wal('TRUNCATE')
+    else:
+        class Servidor(uvicorn.Server):
+            async def shutdown(self, sockets=None):
+                # Con should_exit puesto (Ctrl+C, SIGTERM) uvicorn espera las respuestas en
+                # curso antes de apagar la aplicación; las de /eventos se cierran primero
+                difusor.cerrar_todos()
+                await super().shutdown(sockets)
+        
+        servidor = Servidor(uvicorn.Config(app, host=args.host, port=args.puerto, log_level="info"))
+        try:
+            servidor.run()
+        except KeyboardInterrupt:
+            # uvicorn vuelve a lanzar la señal capturada al terminar, como en uvicorn.run
+            pass
+        if not servidor.started:
+            sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,276 @@
+"""
+Planificador de mantenimiento en segundo plano
+Ejecuta PRAGMA optimize, ANALYZE, incremental_vacuum, checkpoints WAL,
+limpieza de huérfanos, purga de suscriptores eliminados y de marcas de
+sincronización vencidas y respaldos cuando el servidor está inactivo.
+"""
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from database_simple import get_connection, checkpoint_wal, limpiar_huerfanos, purgar_eliminados
+import idempotencia
+
+# Intervalo en segundos entre ejecuciones de cada tarea
+PROGRAMA_POR_DEFECTO = {
+    'optimize': 3600,
+    'analyze': 86400,
+    'incremental_vacuum': 21600,
+    'checkpoint_wal': 300,
+    'limpieza_huerfanos': 21600,
+    'respaldo': 86400,
+    'purga_idempotencia': 3600,
+    'purga_eliminados': 600,
+    'purga_sincronizacion': 86400,
+}
+
+# Segundos sin peticiones para considerar el servidor inactivo
+INACTIVIDAD_MINIMA = 30
+
+# Páginas liberadas por cada ejecución de incremental_vacuum
+PAGINAS_VACUUM = 500
+
+def tarea_optimize():
+    conn = get_connection()
+    try:
+        conn.execute('PRAGMA optimize')
+        return 'ok'
+    finally:
+        conn.close()
+
+def tarea_analyze():
+    conn = get_connection()
+    try:
+        conn.execute('ANALYZE')
+        conn.commit()
+        return 'ok'
+    finally:
+        conn.close()
+
+def tarea_incremental_vacuum():
+    conn = get_connection()
+    try:
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            return 'omitida: auto_vacuum no es INCREMENTAL'
+        libres = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        conn.execute(f'PRAGMA incremental_vacuum({PAGINAS_VACUUM})').fetchall()
+        return f'{min(libres, PAGINAS_VACUUM)} páginas liberadas'
+    finally:
+        conn.close()
+
+def tarea_checkpoint_wal():
+    ocupado, paginas_log, paginas_copiadas = checkpoint_wal('PASSIVE')
+    if paginas_log < 0:
+        return 'omitida: la base de datos no está en modo WAL'
+    return f'{paginas_copiadas}/{paginas_log} páginas copiadas'
+
+def tarea_limpieza_huerfanos():
+    eliminados = limpiar_huerfanos()
+    return f"{eliminados['pagos']} pagos, {eliminados['ingresos']} ingresos, {eliminados['recibos']} recibos eliminados"
+
+def tarea_respaldo():
+    # Se importa al ejecutar la tarea: el arranque no lo necesita
+    from respaldos import crear_respaldo
+    respaldo = crear_respaldo()
+    return f"{respaldo['archivo']} ({respaldo['tamano_bytes']} bytes, {len(respaldo['eliminados'])} antiguos eliminados)"
+
+def tarea_purga_idempotencia():
+    purgadas = idempotencia.purgar()
+    return f"{purgadas['vencidas']} claves vencidas, {purgadas['desalojadas']} desalojadas"
+
+def tarea_purga_eliminados():
+    eliminados = purgar_eliminados()
+    return f"{eliminados['suscriptores']} suscriptores, {eliminados['pagos']} pagos purgados"
+
+def tarea_purga_sincronizacion():
+    import sincronizacion
+    return f"{sincronizacion.purgar()} marcas de eliminación vencidas"
+
+TAREAS = {
+    'optimize': tarea_optimize,
+    'analyze': tarea_analyze,
+    'incremental_vacuum': tarea_incremental_vacuum,
+    'checkpoint_wal': tarea_checkpoint_wal,
+    'limpieza_huerfanos': tarea_limpieza_huerfanos,
+    'respaldo': tarea_respaldo,
+    'purga_idempotencia': tarea_purga_idempotencia,
+    'purga_eliminados': tarea_purga_eliminados,
+    'purga_sincronizacion': tarea_purga_sincronizacion,
+}
+
+def parse_programa(texto):
+    """Leer un programa con formato 'tarea=segundos,tarea=segundos'"""
+    programa = {}
+    for parte in filter(None, (p.strip() for p in texto.split(','))):
+        nombre, _, segundos = parte.partition('=')
+        if nombre.strip() not in TAREAS:
+            raise ValueError(f"Tarea de mantenimiento desconocida: {nombre}")
+        programa[nombre.strip()] = int(segundos)
+    return programa
+
+def parse_horas_pico(texto):
+    """Leer horas pico con formato '8-12,14-18' (hora final excluida)"""
+    horas = set()
+    for parte in filter(None, (p.strip() for p in texto.split(','))):
+        inicio, _, fin = parte.partition('-')
+        horas.update(range(int(inicio), int(fin or int(inicio) + 1)))
+    return horas
+
+def tomar_liderazgo(ruta):
+    """Tomar un bloqueo exclusivo de archivo sin esperar
+
+    Con varios procesos solo el que obtiene el bloqueo ejecuta el
+    mantenimiento. El sistema operativo lo libera si el proceso termina.
+    Devuelve el archivo abierto (mantenerlo vivo) o None.
+    """
+    archivo = open(ruta, 'a+')
+    try:
+        if os.name == 'nt':
+            import msvcrt
+            msvcrt.locking(archivo.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        archivo.close()
+        return None
+    return archivo
+
+class PlanificadorMantenimiento:
+    """Ejecuta las tareas de mantenimiento según su intervalo, solo en inactividad"""
+
+    def __init__(self, programa=None, horas_pico=None, inactividad_minima=INACTIVIDAD_MINIMA, max_historial=100):
+        self.programa = dict(PROGRAMA_POR_DEFECTO)
+        self.programa.update(programa or {})
+        self.horas_pico = set(horas_pico or ())
+        self.inactividad_minima = inactividad_minima
+        self.pausado = False
+        # Con varios procesos solo el líder ejecuta las tareas (ver tomar_liderazgo)
+        self.lider = True
+        self.historial = deque(maxlen=max_historial)
+        self.ultima_ejecucion = {nombre: time.monotonic() for nombre in self.programa}
+        self.ultima_actividad = 0.0
+        self._pendientes = []
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def registrar_actividad(self):
+        """Marcar que el servidor atendió una petición"""
+        self.ultima_actividad = time.monotonic()
+
+    def en_hora_pico(self):
+        return datetime.now().hour in self.horas_pico
+
+    def inactivo(self):
+        return time.monotonic() - self.ultima_actividad >= self.inactividad_minima
+
+    def pausar(self):
+        self.pausado = True
+
+    def reanudar(self):
+        self.pausado = False
+
+    def programar(self, nombre, segundos):
+        """Cambiar el intervalo de una tarea (0 la desactiva)"""
+        if nombre not in TAREAS:
+            raise KeyError(nombre)
+        with self._lock:
+            self.programa[nombre] = segundos
+            self.ultima_ejecucion.setdefault(nombre, time.monotonic())
+
+    def ejecutar_pronto(self, nombre):
+        """Encolar una tarea para la próxima ventana de inactividad
+
+        Solo el proceso líder vacía la cola; en los demás no se encola y la
+        tarea corre en el líder según su programa.
+        """
+        if nombre not in TAREAS:
+            raise KeyError(nombre)
+        if not self.lider:
+            return
+        with self._lock:
+            if nombre not in self._pendientes:
+                self._pendientes.append(nombre)
+
+    def ejecutar(self, nombre):
+        """Ejecutar una tarea ahora y registrarla en el historial"""
+        inicio = time.perf_counter()
+        registro = {'tarea': nombre, 'inicio': datetime.now().isoformat(timespec='seconds')}
+        try:
+            registro['resultado'] = TAREAS[nombre]()
+            registro['exito'] = True
+        except Exception as e:
+            registro['resultado'] = str(e)
+            registro['exito'] = False
+        registro['duracion_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+        with self._lock:
+            self.ultima_ejecucion[nombre] = time.monotonic()
+            self.historial.append(registro)
+        return registro
+
+    def tareas_vencidas(self):
+        ahora = time.monotonic()
+        with self._lock:
+            vencidas = list(self._pendientes)
+            self._pendientes.clear()
+            for nombre, intervalo in self.programa.items():
+                if intervalo > 0 and nombre not in vencidas and ahora - self.ultima_ejecucion[nombre] >= intervalo:
+                    vencidas.append(nombre)
+        return vencidas
+
+    def ciclo(self):
+        """Ejecutar las tareas vencidas si el servidor está disponible para mantenimiento"""
+        if self.pausado or self.en_hora_pico() or not self.inactivo():
+            return []
+        resultados = []
+        for nombre in self.tareas_vencidas():
+            # Ceder el paso si llegó tráfico durante una tarea anterior
+            if not self.inactivo():
+                self.ejecutar_pronto(nombre)
+                continue
+            resultados.append(self.ejecutar(nombre))
+        return resultados
+
+    def _bucle(self, intervalo):
+        while not self._detener.wait(intervalo):
+            self.ciclo()
+
+    def iniciar(self, intervalo=5):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, args=(intervalo,), name='mantenimiento', daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join()
+
+    def estado(self):
+        ahora = time.monotonic()
+        with self._lock:
+            return {
+                'activo': bool(self._hilo and self._hilo.is_alive()),
+                'lider': self.lider,
+                'pausado': self.pausado,
+                'hora_pico': self.en_hora_pico(),
+                'horas_pico': sorted(self.horas_pico),
+                'inactivo': self.inactivo(),
+                'programa': dict(self.programa),
+                'proxima_ejecucion_s': {
+                    nombre: max(0, round(intervalo - (ahora - self.ultima_ejecucion[nombre])))
+                    for nombre, intervalo in self.programa.items() if intervalo > 0
+                },
+                'pendientes': list(self._pendientes),
+                'historial': list(self.historial),
+            }
+
+# Instancia única usada por la aplicación; configurable por variables de entorno
+planificador = PlanificadorMantenimiento(
+    programa=parse_programa(os.environ.get('SISTEMA_MANTENIMIENTO', '')),
+    horas_pico=parse_horas_pico(os.environ.get('SISTEMA_HORAS_PICO', '')),
+)
@@ -0,0 +1,69 @@
+"""
+Métricas en memoria del proceso (contadores, valores y latencias)
+"""
+import threading
+from collections import deque
+
+class Metricas:
+    """Registro simple de métricas, seguro entre hilos"""
+
+    def __init__(self, muestras=1024):
+        self._lock = threading.Lock()
+        self._contadores = {}
+        self._valores = {}
+        self._observaciones = {}
+        self._muestras = muestras
+
+    def incrementar(self, nombre, cantidad=1):
+        with self._lock:
+            self._contadores[nombre] = self._contadores.get(nombre, 0) + cantidad
+
+    def fijar(self, nombre, valor):
+        with self._lock:
+            self._valores[nombre] = valor
+
+    def observar(self, nombre, valor):
+        """Registrar una medición (por ejemplo, una duración en ms)"""
+        with self._lock:
+            obs = self._observaciones.get(nombre)
+            if obs is None:
+                obs = self._observaciones[nombre] = {
+                    'cantidad': 0, 'total': 0.0, 'max': 0.0,
+                    'muestras': deque(maxlen=self._muestras),
+                }
+            obs['cantidad'] += 1
+            obs['total'] += valor
+            obs['max'] = max(obs['max'], valor)
+            obs['muestras'].append(valor)
+
+    def contador(self, nombre):
+        with self._lock:
+            return self._contadores.get(nombre, 0)
+
+    def instantanea(self):
+        with self._lock:
+            observaciones = {}
+            for nombre, obs in self._observaciones.items():
+                muestras = sorted(obs['muestras'])
+                observaciones[nombre] = {
+                    'cantidad': obs['cantidad'],
+                    'promedio': round(obs['total'] / obs['cantidad'], 3),
+                    'max': round(obs['max'], 3),
+                    'p50': round(percentil(muestras, 50), 3),
+                    'p95': round(percentil(muestras, 95), 3),
+                    'p99': round(percentil(muestras, 99), 3),
+                }
+            return {
+                'contadores': dict(self._contadores),
+                'valores': dict(self._valores),
+                'observaciones': observaciones,
+            }
+
+def percentil(muestras_ordenadas, p):
+    if not muestras_ordenadas:
+        return 0.0
+    indice = min(len(muestras_ordenadas) - 1, int(len(muestras_ordenadas) * p / 100))
+    return muestras_ordenadas[indice]
+
+# Instancia única usada por la aplicación
+metricas = Metricas()
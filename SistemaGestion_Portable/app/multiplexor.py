@@ -0,0 +1,147 @@
+"""
+Varias consultas GET en una sola petición (POST /batch)
+Cada subpetición se despacha dentro del proceso a la misma aplicación ASGI,
+sin HTTP ni sockets: pasa por el mismo enrutamiento, validación, dependencias
+y middleware que una petición normal, con la autorización de la petición
+original. Las subpeticiones corren a la vez (los endpoints síncronos en el
+pool de hilos, así sus consultas se solapan) y la respuesta reúne, en el
+mismo orden, el estado, la duración, las cabeceras y el cuerpo de cada una.
+"""
+import asyncio
+import json
+import os
+import time
+from urllib.parse import unquote, urlsplit
+
+MAX_SUBPETICIONES = int(os.environ.get("SISTEMA_BATCH_MAX", "20"))
+TIMEOUT = float(os.environ.get("SISTEMA_BATCH_TIMEOUT", "30"))
+
+# Cabeceras de la petición original que se pasan a cada subpetición
+CABECERAS_HEREDADAS = (b'authorization', b'cookie', b'accept-language')
+# /batch no se anida y /eventos no termina nunca
+RUTAS_EXCLUIDAS = ('/batch', '/eventos')
+# Cabeceras de la subpetición que no se copian al resultado
+CABECERAS_OMITIDAS = ('content-length', 'content-type')
+
+class SubpeticionInvalida(Exception):
+    """La URL no es una consulta GET de esta aplicación"""
+
+_CABECERAS_JSON = [(b'content-type', b'application/json')]
+
+def _json(valor):
+    return json.dumps(valor, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def _ruta(url):
+    partes = urlsplit(url)
+    if partes.scheme or partes.netloc or not partes.path.startswith('/'):
+        raise SubpeticionInvalida("La URL debe ser una ruta de esta aplicación, por ejemplo /suscriptores/5")
+    # Se compara la ruta decodificada, la misma que se despacha: /%65ventos es /eventos
+    ruta = unquote(partes.path)
+    if ruta.rstrip('/') in RUTAS_EXCLUIDAS:
+        raise SubpeticionInvalida(f"{ruta} no se puede incluir dentro de /batch")
+    return ruta, partes.path, partes.query
+
+async def _despachar(app, alcance, url):
+    """Llamar a la aplicación con una petición GET en memoria; devuelve (estado, cabeceras, cuerpo)"""
+    ruta, ruta_cruda, consulta = _ruta(url)
+    cabeceras = [(nombre, valor) for nombre, valor in alcance['headers'] if nombre in CABECERAS_HEREDADAS]
+    cabeceras.append((b'accept', b'application/json'))
+    scope = {
+        'type': 'http',
+        'asgi': alcance.get('asgi', {'version': '3.0'}),
+        'http_version': alcance.get('http_version', '1.1'),
+        'method': 'GET',
+        'scheme': alcance.get('scheme', 'http'),
+        'path': ruta,
+        'raw_path': ruta_cruda.encode(),
+        'root_path': alcance.get('root_path', ''),
+        'query_string': consulta.encode(),
+        'headers': cabeceras,
+        'client': alcance.get('client'),
+        'server': alcance.get('server'),
+        'state': dict(alcance.get('state', {})),
+    }
+    respuesta = {'estado': 500, 'cabeceras': []}
+    cuerpo = []
+    terminada = asyncio.Event()
+    pedida = False
+
+    async def recibir():
+        nonlocal pedida
+        if not pedida:
+            pedida = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # Como un cliente que sigue conectado hasta recibir toda la respuesta
+        await terminada.wait()
+        return {'type': 'http.disconnect'}
+
+    async def enviar(mensaje):
+        if mensaje['type'] == 'http.response.start':
+            respuesta['estado'] = mensaje['status']
+            respuesta['cabeceras'] = mensaje.get('headers', [])
+        elif mensaje['type'] == 'http.response.body':
+            cuerpo.append(mensaje.get('body', b''))
+            if not mensaje.get('more_body'):
+                terminada.set()
+
+    try:
+        await app(scope, recibir, enviar)
+    except Exception:
+        # El middleware de errores ya envió el 500 antes de relanzar la excepción
+        if not terminada.is_set():
+            respuesta['estado'] = 500
+            respuesta['cabeceras'] = _CABECERAS_JSON
+            cuerpo[:] = [_json({'detail': "Error interno"})]
+    finally:
+        terminada.set()
+    return respuesta['estado'], respuesta['cabeceras'], b''.join(cuerpo)
+
+async def _una(app, alcance, indice, subpeticion):
+    inicio = time.perf_counter()
+    tarea = asyncio.ensure_future(_despachar(app, alcance, subpeticion['url']))
+    # asyncio.wait y no wait_for: un endpoint síncrono no se puede interrumpir y
+    # wait_for esperaría a que su hilo termine; aquí se responde 504 al vencer el plazo
+    await asyncio.wait({tarea}, timeout=TIMEOUT)
+    if not tarea.done():
+        tarea.cancel()
+        estado, cabeceras, cuerpo = 504, _CABECERAS_JSON, _json({'detail': f"La subpetición superó {TIMEOUT:g} s"})
+    elif isinstance(tarea.exception(), SubpeticionInvalida):
+        estado, cabeceras, cuerpo = 400, _CABECERAS_JSON, _json({'detail': str(tarea.exception())})
+    else:
+        estado, cabeceras, cuerpo = tarea.result()
+    tipo = ''
+    copiadas = {}
+    for nombre, valor in cabeceras:
+        nombre = nombre.decode('latin-1').lower()
+        if nombre == 'content-type':
+            tipo = valor.decode('latin-1')
+        if nombre not in CABECERAS_OMITIDAS:
+            copiadas[nombre] = valor.decode('latin-1')
+    return {
+        'id': subpeticion.get('id') or str(indice),
+        'url': subpeticion['url'],
+        'estado': estado,
+        'duracion_ms': round((time.perf_counter() - inicio) * 1000, 3),
+        'cabeceras': copiadas,
+        # Los cuerpos JSON se insertan tal cual en la respuesta, sin decodificarlos
+        'cuerpo': cuerpo if tipo.startswith('application/json') else cuerpo.decode('utf-8', 'replace'),
+    }
+
+def _codificar(resultado):
+    cuerpo = resultado['cuerpo']
+    partes = [b'"%s":%s' % (clave.encode(), _json(resultado[clave]))
+              for clave in ('id', 'url', 'estado', 'duracion_ms', 'cabeceras')]
+    partes.append(b'"cuerpo":' + ((cuerpo or b'null') if isinstance(cuerpo, bytes) else _json(cuerpo)))
+    return b'{' + b','.join(partes) + b'}'
+
+async def ejecutar(app, alcance, subpeticiones):
+    """Despachar las subpeticiones a la vez y devolver la respuesta combinada ya codificada en JSON
+
+    subpeticiones son dicts con 'url' y un 'id' opcional (por omisión, la posición).
+    """
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*(_una(app, alcance, indice, subpeticion)
+                                        for indice, subpeticion in enumerate(subpeticiones)))
+    duracion = round((time.perf_counter() - inicio) * 1000, 3)
+    return (b'{"duracion_ms":' + _json(duracion) + b',"resultados":['
+            + b','.join(_codificar(resultado) for resultado in resultados) + b']}')
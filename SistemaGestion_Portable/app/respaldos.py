@@ -0,0 +1,209 @@
+"""
+Respaldos en línea con la API de backup de SQLite
+Copia la base de datos por pasos de páginas para no bloquear a los escritores,
+verifica cada copia con integrity_check y aplica la política de retención.
+
+Uso por consola:
+    python respaldos.py crear
+    python respaldos.py listar
+    python respaldos.py verificar ARCHIVO
+    python respaldos.py restaurar ARCHIVO
+"""
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from database_simple import BASE_DIR, get_connection, get_database_path
+from metricas import metricas
+
+RESPALDOS_DIR = os.environ.get("SISTEMA_RESPALDOS_DIR", os.path.join(BASE_DIR, "respaldos"))
+
+# Páginas copiadas por paso y pausa entre pasos para ceder el bloqueo
+PAGINAS_POR_PASO = 256
+PAUSA_ENTRE_PASOS = 0.005
+
+# Retención: cantidad máxima de respaldos y antigüedad máxima en días (0 = sin límite)
+MAX_RESPALDOS = int(os.environ.get("SISTEMA_RESPALDOS_MAX", "7"))
+MAX_DIAS = int(os.environ.get("SISTEMA_RESPALDOS_DIAS", "30"))
+
+PREFIJO = "sistema_suscriptores-"
+
+class RespaldoInvalido(Exception):
+    """La copia no pasó la verificación de integridad"""
+
+def _progreso(status, restantes, total):
+    metricas.fijar('respaldo.paginas_restantes', restantes)
+    metricas.fijar('respaldo.paginas_totales', total)
+    metricas.fijar('respaldo.progreso', round(1 - restantes / total, 4) if total else 1.0)
+
+def _copiar(origen, destino, paginas_por_paso, pausa):
+    origen.backup(destino, pages=paginas_por_paso, progress=_progreso, sleep=pausa)
+
+def verificar_respaldo(archivo):
+    """Ejecutar PRAGMA integrity_check sobre una copia; devuelve 'ok' o lanza RespaldoInvalido"""
+    conn = sqlite3.connect(f"file:{archivo}?mode=ro", uri=True)
+    try:
+        resultado = [fila[0] for fila in conn.execute('PRAGMA integrity_check')]
+    finally:
+        conn.close()
+    if resultado != ['ok']:
+        raise RespaldoInvalido(f"{os.path.basename(archivo)}: {'; '.join(resultado[:5])}")
+    return 'ok'
+
+# Archivos auxiliares que SQLite puede dejar junto a una copia
+AUXILIARES = ("-wal", "-shm", "-journal")
+
+def _eliminar(ruta):
+    for archivo in (ruta,) + tuple(ruta + sufijo for sufijo in AUXILIARES):
+        if os.path.exists(archivo):
+            os.remove(archivo)
+
+def _nombre_libre(directorio):
+    """Nombre con milisegundos; dos respaldos en el mismo instante no se pisan"""
+    base = f"{PREFIJO}{datetime.now().strftime('%Y%m%d-%H%M%S-%f')[:-3]}"
+    nombre, contador = f"{base}.db", 1
+    while os.path.exists(os.path.join(directorio, nombre)):
+        nombre, contador = f"{base}-{contador}.db", contador + 1
+    return nombre
+
+def crear_respaldo(directorio=None, paginas_por_paso=PAGINAS_POR_PASO, pausa=PAUSA_ENTRE_PASOS, retener=True):
+    """Crear un respaldo verificado y, con retener, aplicar la retención; devuelve sus datos"""
+    directorio = directorio or RESPALDOS_DIR
+    os.makedirs(directorio, exist_ok=True)
+    nombre = _nombre_libre(directorio)
+    archivo = os.path.join(directorio, nombre)
+    temporal = archivo + ".tmp"
+
+    metricas.fijar('respaldo.en_curso', 1)
+    metricas.fijar('respaldo.progreso', 0.0)
+    inicio = time.perf_counter()
+    origen = get_connection()
+    destino = sqlite3.connect(temporal)
+    try:
+        _copiar(origen, destino, paginas_por_paso, pausa)
+        # La copia hereda el modo WAL de la base; un respaldo es un solo archivo
+        destino.execute('PRAGMA journal_mode=DELETE')
+        destino.close()
+        verificar_respaldo(temporal)
+        os.replace(temporal, archivo)
+    except Exception:
+        metricas.incrementar('respaldo.fallidos')
+        destino.close()
+        _eliminar(temporal)
+        raise
+    finally:
+        origen.close()
+        metricas.fijar('respaldo.en_curso', 0)
+
+    duracion_ms = (time.perf_counter() - inicio) * 1000
+    tamano = os.path.getsize(archivo)
+    metricas.incrementar('respaldo.completados')
+    metricas.observar('respaldo.duracion_ms', duracion_ms)
+    metricas.fijar('respaldo.ultimo_tamano_bytes', tamano)
+    metricas.fijar('respaldo.ultimo', nombre)
+
+    eliminados = aplicar_retencion(directorio) if retener else []
+    return {
+        'archivo': nombre,
+        'tamano_bytes': tamano,
+        'duracion_ms': round(duracion_ms, 2),
+        'integridad': 'ok',
+        'eliminados': eliminados,
+    }
+
+def listar_respaldos(directorio=None):
+    """Listar respaldos del más reciente al más antiguo"""
+    directorio = directorio or RESPALDOS_DIR
+    if not os.path.isdir(directorio):
+        return []
+    respaldos = []
+    for nombre in os.listdir(directorio):
+        if nombre.startswith(PREFIJO) and nombre.endswith(".db"):
+            ruta = os.path.join(directorio, nombre)
+            respaldos.append({
+                'archivo': nombre,
+                'tamano_bytes': os.path.getsize(ruta),
+                'fecha': datetime.fromtimestamp(os.path.getmtime(ruta)).isoformat(timespec='seconds'),
+            })
+    return sorted(respaldos, key=lambda r: r['archivo'], reverse=True)
+
+def aplicar_retencion(directorio=None, max_respaldos=MAX_RESPALDOS, max_dias=MAX_DIAS):
+    """Eliminar respaldos que exceden la cantidad o la antigüedad permitida"""
+    directorio = directorio or RESPALDOS_DIR
+    limite = time.time() - max_dias * 86400
+    eliminados = []
+    for posicion, respaldo in enumerate(listar_respaldos(directorio)):
+        ruta = os.path.join(directorio, respaldo['archivo'])
+        if (max_respaldos and posicion >= max_respaldos) or (max_dias and os.path.getmtime(ruta) < limite):
+            _eliminar(ruta)
+            eliminados.append(respaldo['archivo'])
+    return eliminados
+
+def resolver_respaldo(archivo, directorio=None):
+    """Aceptar un nombre de respaldo o una ruta completa"""
+    ruta = archivo if os.path.isabs(archivo) or os.path.exists(archivo) else os.path.join(directorio or RESPALDOS_DIR, archivo)
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(f"Respaldo no encontrado: {archivo}")
+    return ruta
+
+def restaurar_respaldo(archivo, directorio=None):
+    """Restaurar la base de datos desde un respaldo verificado
+
+    Antes de sobrescribir se crea un respaldo de seguridad del estado actual.
+    La retención se aplica recién después de restaurar: antes podría borrar
+    el respaldo que se está por restaurar.
+    Se recomienda detener el servidor antes de restaurar.
+    """
+    ruta = resolver_respaldo(archivo, directorio)
+    verificar_respaldo(ruta)
+    seguridad = crear_respaldo(directorio, retener=False)
+
+    origen = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)
+    destino = sqlite3.connect(get_database_path())
+    try:
+        _copiar(origen, destino, -1, 0)
+    finally:
+        origen.close()
+        destino.close()
+    verificar_respaldo(get_database_path())
+    eliminados = aplicar_retencion(directorio)
+    return {'restaurado': os.path.basename(ruta), 'respaldo_previo': seguridad['archivo'], 'eliminados': eliminados}
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Respaldos de la base de datos")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("crear", help="Crear un respaldo verificado")
+    sub.add_parser("listar", help="Listar respaldos disponibles")
+    verificar = sub.add_parser("verificar", help="Verificar la integridad de un respaldo")
+    verificar.add_argument("archivo")
+    restaurar = sub.add_parser("restaurar", help="Restaurar la base de datos desde un respaldo")
+    restaurar.add_argument("archivo")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.comando == "crear":
+            r = crear_respaldo()
+            print(f"✅ Respaldo creado: {r['archivo']} ({r['tamano_bytes']} bytes, {r['duracion_ms']} ms)")
+            for nombre in r['eliminados']:
+                print(f"🗑️  Respaldo antiguo eliminado: {nombre}")
+        elif args.comando == "listar":
+            for r in listar_respaldos():
+                print(f"{r['archivo']}  {r['tamano_bytes']:>12} bytes  {r['fecha']}")
+        elif args.comando == "verificar":
+            verificar_respaldo(resolver_respaldo(args.archivo))
+            print("✅ Integridad correcta")
+        elif args.comando == "restaurar":
+            r = restaurar_respaldo(args.archivo)
+            print(f"✅ Base de datos restaurada desde {r['restaurado']}")
+            print(f"💾 Estado anterior guardado en {r['respaldo_previo']}")
+    except (RespaldoInvalido, FileNotFoundError) as e:
+        print(f"❌ {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+Resumen de la vista de inicio del panel (/dashboard/resumen)
+Totales, ingresos y gastos del mes, conteos, suscriptores en mora y la
+actividad reciente, en una sola respuesta. Con más de un núcleo las consultas
+corren en paralelo, cada una con una conexión del pool de lectura; con uno,
+seguidas en una transacción de lectura (en paralelo solo sumarían esperas).
+El resultado se guarda hasta que cambian los datos.
+
+Los cambios se detectan con PRAGMA data_version en una conexión propia: el
+valor cambia con cada commit de otra conexión, de este o de otro proceso.
+Si no cambió entre antes de la primera consulta y después de la última, todas
+leyeron el mismo estado de la base, como si fueran una sola transacción. Si
+hubo un commit en medio, el resumen se vuelve a calcular con las consultas
+seguidas dentro de una transacción de lectura.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from database_simple import get_read_connection, pool_lectura
+from metricas import metricas
+
+# Filas de cada lista de actividad reciente
+RECIENTES = 10
+PARALELO = os.environ.get("SISTEMA_PANEL_PARALELO", "1" if (os.cpu_count() or 1) > 1 else "0") == "1"
+
+def _periodo(hoy):
+    """Límites del mes en curso y mes y año del anterior"""
+    inicio = hoy.replace(day=1)
+    fin = (inicio + timedelta(days=32)).replace(day=1)
+    anterior = inicio - timedelta(days=1)
+    return {'inicio_mes': inicio.isoformat(), 'fin_mes': fin.isoformat(),
+            'mes_anterior': anterior.month, 'anio_anterior': anterior.year}
+
+def _total_ingresos(conn, periodo):
+    return {'total_ingresos': conn.execute('SELECT COALESCE(SUM(monto), 0) FROM ingresos').fetchone()[0]}
+
+def _total_gastos(conn, periodo):
+    return {'total_gastos': conn.execute('SELECT COALESCE(SUM(valor), 0) FROM gastos').fetchone()[0]}
+
+def _mes(conn, periodo):
+    fila = conn.execute('''
+        SELECT (SELECT COALESCE(SUM(monto), 0) FROM ingresos WHERE fecha >= :inicio_mes AND fecha < :fin_mes) AS ingresos_mes,
+               (SELECT COALESCE(SUM(valor), 0) FROM gastos WHERE fecha >= :inicio_mes AND fecha < :fin_mes) AS gastos_mes,
+               (SELECT COUNT(*) FROM pagos WHERE fecha_pago >= :inicio_mes AND fecha_pago < :fin_mes) AS pagos_mes
+    ''', periodo).fetchone()
+    return dict(fila)
+
+def _conteos(conn, periodo):
+    fila = conn.execute('''
+        SELECT (SELECT COUNT(*) FROM suscriptores WHERE eliminado_en IS NULL) AS suscriptores,
+               (SELECT COUNT(*) FROM pagos) AS pagos,
+               (SELECT COUNT(*) FROM gastos) AS gastos
+    ''').fetchone()
+    return dict(fila)
+
+def _en_mora(conn, periodo):
+    # Suscriptores activos desde antes de este mes sin el pago del mes anterior
+    fila = conn.execute('''
+        SELECT COUNT(*) FROM suscriptores s
+        WHERE s.eliminado_en IS NULL AND s.fecha_suscripcion < :inicio_mes
+          AND NOT EXISTS (SELECT 1 FROM pagos p WHERE p.suscriptor_id = s.id
+                          AND p.mes = :mes_anterior AND p.anio = :anio_anterior)
+    ''', periodo).fetchone()
+    return {'en_mora': fila[0]}
+
+def _actividad(conn, periodo):
+    pagos = conn.execute('''
+        SELECT p.id, p.suscriptor_id, s.nombre_completo, p.mes, p.anio, p.fecha_pago, p.valor, p.tipo_pago
+        FROM pagos p JOIN suscriptores s ON s.id = p.suscriptor_id AND s.eliminado_en IS NULL
+        ORDER BY p.fecha_pago DESC, p.id DESC LIMIT ?
+    ''', (RECIENTES,)).fetchall()
+    ingresos = conn.execute('SELECT id, monto, fecha, origen FROM ingresos ORDER BY fecha DESC, id DESC LIMIT ?',
+                            (RECIENTES,)).fetchall()
+    gastos = conn.execute('SELECT id, tipo_gasto, descripcion, valor, fecha FROM gastos ORDER BY fecha DESC, id DESC LIMIT ?',
+                          (RECIENTES,)).fetchall()
+    return {'ultimos_pagos': [dict(fila) for fila in pagos],
+            'ultimos_ingresos': [dict(fila) for fila in ingresos],
+            'ultimos_gastos': [dict(fila) for fila in gastos]}
+
+# Las más lentas primero: las sumas y los conteos recorren tablas completas
+CONSULTAS = (_total_ingresos, _total_gastos, _en_mora, _conteos, _mes, _actividad)
+
+def _armar(partes, hoy):
+    p = {}
+    for parte in partes:
+        p.update(parte)
+    return {
+        'totales': {'ingresos': p['total_ingresos'], 'gastos': p['total_gastos'],
+                    'balance': p['total_ingresos'] - p['total_gastos']},
+        'mes': {'anio': hoy.year, 'mes': hoy.month, 'ingresos': p['ingresos_mes'], 'gastos': p['gastos_mes'],
+                'balance': p['ingresos_mes'] - p['gastos_mes'], 'pagos': p['pagos_mes']},
+        'conteos': {'suscriptores': p['suscriptores'], 'pagos': p['pagos'], 'gastos': p['gastos'],
+                    'en_mora': p['en_mora']},
+        'actividad': {'pagos': p['ultimos_pagos'], 'ingresos': p['ultimos_ingresos'], 'gastos': p['ultimos_gastos']},
+        'calculado_en': datetime.utcnow().isoformat(timespec='seconds'),
+    }
+
+class ResumenPanel:
+    """Resumen calculado sobre el pool de lectura y guardado mientras no haya commits"""
+
+    def __init__(self, nombre='panel', pool=pool_lectura, paralelo=PARALELO):
+        self.nombre = nombre
+        self.pool = pool
+        self.paralelo = paralelo
+        self._lock = threading.Lock()
+        self._conn_version = None
+        self._ejecutor = None
+        self._guardado = None   # (data_version, día, resumen)
+        self.aciertos = 0
+        self.calculos = 0
+        self.repetidos = 0     # cálculos en paralelo repetidos por un commit en medio
+
+    def _version(self):
+        with self._lock:
+            if self._conn_version is None:
+                self._conn_version = get_read_connection()
+            return self._conn_version.execute('PRAGMA data_version').fetchone()[0]
+
+    def _consultar(self, consulta, periodo):
+        with self.pool.conexion() as conn:
+            return consulta(conn, periodo)
+
+    def _en_paralelo(self, periodo):
+        with self._lock:
+            if self._ejecutor is None:
+                self._ejecutor = ThreadPoolExecutor(max_workers=self.pool.tamano, thread_name_prefix=self.nombre)
+        futuros = [self._ejecutor.submit(self._consultar, consulta, periodo) for consulta in CONSULTAS]
+        return [futuro.result() for futuro in futuros]
+
+    def _en_una_transaccion(self, periodo):
+        with self.pool.conexion() as conn:
+            conn.execute('BEGIN')
+            return [consulta(conn, periodo) for consulta in CONSULTAS]
+
+    def obtener(self):
+        """Resumen al día: el guardado si no hubo commits desde que se calculó (y es el mismo día)"""
+        hoy = date.today()
+        version = self._version()
+        guardado = self._guardado
+        if guardado is not None and guardado[0] == version and guardado[1] == hoy:
+            self.aciertos += 1
+            return guardado[2]
+        inicio = time.perf_counter()
+        periodo = _periodo(hoy)
+        partes = None
+        if self.paralelo:
+            partes = self._en_paralelo(periodo)
+            if self._version() != version:
+                # Un commit durante las consultas: pudieron ver estados distintos
+                self.repetidos += 1
+                version = self._version()
+                partes = None
+        if partes is None:
+            partes = self._en_una_transaccion(periodo)
+        resumen = _armar(partes, hoy)
+        self._guardado = (version, hoy, resumen)
+        self.calculos += 1
+        metricas.observar(f'{self.nombre}.calculo_ms', (time.perf_counter() - inicio) * 1000)
+        return resumen
+
+    def cerrar(self):
+        with self._lock:
+            if self._ejecutor is not None:
+                self._ejecutor.shutdown(wait=False)
+                self._ejecutor = None
+            if self._conn_version is not None:
+                self._conn_version.close()
+                self._conn_version = None
+
+    def estado(self):
+        return {
+            'paralelo': self.paralelo,
+            'aciertos': self.aciertos,
+            'calculos': self.calculos,
+            'repetidos': self.repetidos,
+            'guardado': self._guardado is not None,
+        }
+
+# Instancia única usada por la aplicación
+resumen_panel = ResumenPanel()
@@ -0,0 +1,99 @@
+"""
+Sincronización incremental (/sync/changes)
+Devuelve los suscriptores, pagos y gastos creados, modificados o eliminados
+desde un token, para que los clientes mantengan su copia local al día sin
+volver a descargar los listados completos.
+
+El token es la fecha UTC en que se leyeron los cambios. Cada consulta mira
+MARGEN segundos hacia atrás del token: una escritura fechada justo antes de
+la lectura pero confirmada después no se pierde, a cambio de que algunas
+filas se repitan (los clientes las aplican por id, así que es inofensivo).
+"""
+import os
+from datetime import datetime, timedelta, timezone
+
+from database_simple import get_connection
+
+MARGEN = float(os.environ.get("SISTEMA_SYNC_MARGEN", "5"))
+# Las marcas de eliminación se guardan este tiempo; un token más viejo obliga a recargar
+RETENCION = timedelta(days=float(os.environ.get("SISTEMA_SYNC_RETENCION_DIAS", "30")))
+# Con más filas que esto en una tabla conviene recargar el listado completo
+MAX_FILAS = int(os.environ.get("SISTEMA_SYNC_MAX_FILAS", "5000"))
+
+TABLAS = ('suscriptores', 'pagos', 'gastos')
+
+CONSULTAS = {
+    'suscriptores': '''
+        SELECT * FROM suscriptores
+        WHERE fecha_actualizacion >= ? AND eliminado_en IS NULL
+        ORDER BY fecha_actualizacion LIMIT ?
+    ''',
+    'pagos': '''
+        SELECT * FROM pagos
+        WHERE fecha_creacion >= ?
+          AND NOT EXISTS (SELECT 1 FROM suscriptores s WHERE s.id = pagos.suscriptor_id AND s.eliminado_en IS NOT NULL)
+        ORDER BY fecha_creacion LIMIT ?
+    ''',
+    'gastos': 'SELECT * FROM gastos WHERE fecha_creacion >= ? ORDER BY fecha_creacion LIMIT ?',
+}
+
+class TokenInvalido(ValueError):
+    """El token no tiene el formato de fecha esperado"""
+
+class TokenVencido(Exception):
+    """Las marcas de eliminación posteriores al token ya se purgaron"""
+
+def formato_token(fecha):
+    # Mismo formato que guarda sqlite3 para datetime y que compara bien con CURRENT_TIMESTAMP
+    return fecha.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+def leer_token(token):
+    try:
+        fecha = datetime.fromisoformat(token)
+    except (TypeError, ValueError):
+        raise TokenInvalido(f"Token de sincronización inválido: {token!r}")
+    if fecha.tzinfo is not None:
+        # Un token con zona horaria ('...+00:00', '...-05:00') se lleva a UTC sin zona, como las fechas guardadas
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    return fecha
+
+def cambios_desde(conn, token=None):
+    """Cambios posteriores al token, leídos en una sola transacción de conn
+
+    Sin token solo se devuelve el token actual: el cliente carga los listados
+    normales después de pedirlo y sincroniza desde ahí.
+    """
+    ahora = datetime.utcnow()
+    respuesta = {'token': formato_token(ahora), 'recargar': False}
+    if token is None:
+        return respuesta
+    desde = leer_token(token)
+    if desde < ahora - RETENCION:
+        raise TokenVencido("El token es anterior a la retención de eliminaciones; recargue los listados")
+    desde = formato_token(desde - timedelta(seconds=MARGEN))
+
+    conn.execute('BEGIN')
+    try:
+        eliminados = {tabla: [] for tabla in TABLAS}
+        for fila in conn.execute('SELECT DISTINCT tabla, fila_id FROM eliminaciones WHERE fecha >= ?', (desde,)):
+            eliminados[fila['tabla']].append(fila['fila_id'])
+        for tabla in TABLAS:
+            filas = conn.execute(CONSULTAS[tabla], (desde, MAX_FILAS + 1)).fetchall()
+            if len(filas) > MAX_FILAS:
+                # Una importación masiva, por ejemplo: el delta no ahorraría nada
+                return {'token': respuesta['token'], 'recargar': True}
+            respuesta[tabla] = [dict(fila) for fila in filas]
+        respuesta['eliminados'] = eliminados
+        return respuesta
+    finally:
+        conn.rollback()
+
+def purgar():
+    """Eliminar las marcas de eliminación más viejas que la retención"""
+    conn = get_connection()
+    try:
+        cursor = conn.execute('DELETE FROM eliminaciones WHERE fecha < ?', (formato_token(datetime.utcnow() - RETENCION),))
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        conn.close()
@@ -0,0 +1,154 @@
+// Copia local (IndexedDB) de suscriptores, pagos y gastos, token de
+// sincronización y cola de escrituras hechas sin conexión
+const AlmacenLocal = (() => {
+  const NOMBRE = 'sistema_gestion';
+  const VERSION = 1;
+  const TABLAS = ['suscriptores', 'pagos', 'gastos'];
+  let db = null;
+
+  function abrir() {
+    if (db) return Promise.resolve(db);
+    return new Promise((resolve, reject) => {
+      const peticion = indexedDB.open(NOMBRE, VERSION);
+      peticion.onupgradeneeded = () => {
+        const base = peticion.result;
+        TABLAS.forEach(tabla => {
+          const almacen = base.createObjectStore(tabla, { keyPath: 'id' });
+          // Para quitar los pagos de un suscriptor eliminado
+          if (tabla === 'pagos') almacen.createIndex('suscriptor_id', 'suscriptor_id');
+        });
+        base.createObjectStore('meta');
+        base.createObjectStore('cola', { keyPath: 'id', autoIncrement: true });
+      };
+      peticion.onsuccess = () => { db = peticion.result; resolve(db); };
+      peticion.onerror = () => reject(peticion.error);
+    });
+  }
+
+  function resultado(peticion) {
+    return new Promise((resolve, reject) => {
+      peticion.onsuccess = () => resolve(peticion.result);
+      peticion.onerror = () => reject(peticion.error);
+    });
+  }
+
+  function terminada(tx) {
+    return new Promise((resolve, reject) => {
+      tx.oncomplete = () => resolve();
+      tx.onerror = tx.onabort = () => reject(tx.error);
+    });
+  }
+
+  async function todos(tabla) {
+    const base = await abrir();
+    return resultado(base.transaction(tabla).objectStore(tabla).getAll());
+  }
+
+  // Reemplazar una tabla por el listado recibido del servidor
+  async function reemplazar(tabla, filas) {
+    const base = await abrir();
+    const tx = base.transaction(tabla, 'readwrite');
+    const almacen = tx.objectStore(tabla);
+    almacen.clear();
+    filas.forEach(fila => almacen.put(fila));
+    return terminada(tx);
+  }
+
+  // Guardar filas recibidas (por ejemplo, una página de la tabla virtual) sin tocar las demás.
+  // Las filas pueden traer solo algunos campos: se combinan con lo ya guardado
+  async function guardar(tabla, filas) {
+    const base = await abrir();
+    const tx = base.transaction(tabla, 'readwrite');
+    const almacen = tx.objectStore(tabla);
+    filas.forEach(fila => {
+      almacen.get(fila.id).onsuccess = evento => almacen.put({ ...evento.target.result, ...fila });
+    });
+    return terminada(tx);
+  }
+
+  // Aplicar una respuesta de /sync/changes y guardar su token, todo o nada
+  async function aplicarCambios(cambios) {
+    const base = await abrir();
+    const tx = base.transaction([...TABLAS, 'meta'], 'readwrite');
+    TABLAS.forEach(tabla => {
+      const almacen = tx.objectStore(tabla);
+      cambios[tabla].forEach(fila => almacen.put(fila));
+      cambios.eliminados[tabla].forEach(id => almacen.delete(id));
+    });
+    const pagos = tx.objectStore('pagos').index('suscriptor_id');
+    cambios.eliminados.suscriptores.forEach(id => {
+      pagos.openCursor(IDBKeyRange.only(id)).onsuccess = evento => {
+        const cursor = evento.target.result;
+        if (cursor) { cursor.delete(); cursor.continue(); }
+      };
+    });
+    tx.objectStore('meta').put(cambios.token, 'token');
+    return terminada(tx);
+  }
+
+  async function leerToken() {
+    const base = await abrir();
+    return resultado(base.transaction('meta').objectStore('meta').get('token'));
+  }
+
+  async function guardarToken(token) {
+    const base = await abrir();
+    const tx = base.transaction('meta', 'readwrite');
+    tx.objectStore('meta').put(token, 'token');
+    return terminada(tx);
+  }
+
+  async function encolar(peticion) {
+    const base = await abrir();
+    const tx = base.transaction('cola', 'readwrite');
+    tx.objectStore('cola').add({ ...peticion, fecha: new Date().toISOString() });
+    return terminada(tx);
+  }
+
+  async function pendientes() {
+    const base = await abrir();
+    return resultado(base.transaction('cola').objectStore('cola').count());
+  }
+
+  async function quitarDeCola(id) {
+    const base = await abrir();
+    const tx = base.transaction('cola', 'readwrite');
+    tx.objectStore('cola').delete(id);
+    return terminada(tx);
+  }
+
+  // Reenviar las escrituras en orden. Se detiene al primer fallo de red o
+  // error del servidor (se reintentará); los rechazos 4xx son definitivos.
+  // Devuelve { enviadas, rechazadas: [{peticion, detalle}] }
+  async function reproducirCola() {
+    const base = await abrir();
+    const cola = await resultado(base.transaction('cola').objectStore('cola').getAll());
+    const informe = { enviadas: 0, rechazadas: [] };
+    for (const peticion of cola) {
+      let response;
+      try {
+        response = await fetch(peticion.url, {
+          method: peticion.metodo,
+          headers: peticion.headers,
+          body: peticion.cuerpo
+        });
+      } catch (error) {
+        break;
+      }
+      if (response.status >= 500 || (response.status === 409 && peticion.headers['Idempotency-Key'])) {
+        // 409 con clave de idempotencia: el envío original sigue en proceso
+        break;
+      }
+      if (response.ok) {
+        informe.enviadas++;
+      } else {
+        const error = await response.json().catch(() => ({}));
+        informe.rechazadas.push({ peticion, detalle: error.detail || `HTTP ${response.status}` });
+      }
+      await quitarDeCola(peticion.id);
+    }
+    return informe;
+  }
+
+  return { todos, reemplazar, guardar, aplicarCambios, leerToken, guardarToken, encolar, pendientes, reproducirCola };
+})();
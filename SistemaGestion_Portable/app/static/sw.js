@@ -0,0 +1,41 @@
+// Service worker del panel: sirve las páginas y scripts de /ui desde la caché
+// al instante y los actualiza en segundo plano. Las llamadas a la API no pasan
+// por aquí; los datos se guardan en IndexedDB (almacen_local.js).
+const CACHE = 'sistema-ui-v2';
+const ARCHIVOS = [
+  '/ui/mejorado_con_auth.html',
+  '/ui/login.html',
+  '/ui/almacen_local.js',
+  '/ui/tabla_virtual.js'
+];
+
+self.addEventListener('install', evento => {
+  evento.waitUntil(caches.open(CACHE).then(cache => cache.addAll(ARCHIVOS)).then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', evento => {
+  evento.waitUntil(
+    caches.keys()
+      .then(nombres => Promise.all(nombres.filter(nombre => nombre !== CACHE).map(nombre => caches.delete(nombre))))
+      .then(() => self.clients.claim())
+  );
+});
+
+self.addEventListener('fetch', evento => {
+  const url = new URL(evento.request.url);
+  if (evento.request.method !== 'GET' || url.origin !== self.location.origin || !url.pathname.startsWith('/ui/')) {
+    return;
+  }
+  evento.respondWith(caches.open(CACHE).then(async cache => {
+    const guardada = await cache.match(evento.request, { ignoreSearch: true });
+    const actualizada = fetch(evento.request).then(response => {
+      if (response.ok) cache.put(evento.request, response.clone());
+      return response;
+    });
+    if (guardada) {
+      evento.waitUntil(actualizada.catch(() => {}));
+      return guardada;
+    }
+    return actualizada;
+  }));
+});
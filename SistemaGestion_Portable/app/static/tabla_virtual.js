@@ -0,0 +1,218 @@
+// Tabla con desplazamiento virtual: solo existen en el DOM las filas visibles
+// (más un margen) y las páginas se piden a la fuente de datos a medida que el
+// usuario se desplaza. Ordenar o buscar descarta las páginas y cancela las
+// peticiones en curso.
+class TablaVirtual {
+  // Tiempo máximo por dibujado: un cuadro a 60 Hz
+  static PRESUPUESTO_MS = 16;
+  static SOBRANTE = 10;          // filas dibujadas por encima y por debajo de las visibles
+  static MAX_PAGINAS = 20;       // páginas guardadas en memoria
+  static ESPERA_BUSQUEDA_MS = 300;
+
+  // opciones:
+  //   contenedor: elemento donde se dibuja la tabla
+  //   columnas: [{ campo, titulo, ordenable, ancho }]
+  //   fuente: async ({ skip, limit, orden, direccion, q, contar, signal }) => { filas, total }
+  //           (total solo se necesita cuando contar es true)
+  //   renderFila: fila => '<tr>...</tr>'
+  constructor({ contenedor, columnas, fuente, renderFila, orden, direccion = 'asc',
+                altoFila = 34, alto = 480, tamanoPagina = 200 }) {
+    this.columnas = columnas;
+    this.fuente = fuente;
+    this.renderFila = renderFila;
+    this.orden = orden;
+    this.direccion = direccion;
+    this.altoFila = altoFila;
+    this.alto = alto;
+    this.tamanoPagina = tamanoPagina;
+    this.q = '';
+    this.total = null;
+    this.paginas = new Map();    // número de página -> filas
+    this.enCurso = new Map();    // número de página -> AbortController
+    this.generacion = 0;
+    this.cuadroPendiente = false;
+    this.mediciones = { dibujados: 0, ultimoMs: 0, maximoMs: 0, sobrePresupuesto: 0 };
+
+    const colgroup = `<colgroup>${columnas.map(c => `<col${c.ancho ? ` style="width:${c.ancho}"` : ''}>`).join('')}</colgroup>`;
+    contenedor.innerHTML = `
+      <table class="tv-tabla tv-encabezado">${colgroup}<thead><tr></tr></thead></table>
+      <div class="tv-scroll" style="height:${alto}px; overflow-y:auto; position:relative">
+        <div class="tv-espaciador"></div>
+        <table class="tv-tabla tv-cuerpo" style="position:absolute; top:0; left:0">${colgroup}<tbody></tbody></table>
+      </div>
+      <div class="tv-estado"></div>`;
+    this.encabezado = contenedor.querySelector('thead tr');
+    this.scroll = contenedor.querySelector('.tv-scroll');
+    this.espaciador = contenedor.querySelector('.tv-espaciador');
+    this.cuerpo = contenedor.querySelector('.tv-cuerpo');
+    this.tbody = this.cuerpo.querySelector('tbody');
+    this.estado = contenedor.querySelector('.tv-estado');
+
+    this.scroll.addEventListener('scroll', () => this.programarDibujo());
+    this.dibujarEncabezado();
+  }
+
+  dibujarEncabezado() {
+    this.encabezado.innerHTML = this.columnas.map(c => {
+      const flecha = c.campo === this.orden ? (this.direccion === 'asc' ? ' ▲' : ' ▼') : '';
+      return c.ordenable
+        ? `<th class="tv-ordenable" data-campo="${c.campo}">${c.titulo}${flecha}</th>`
+        : `<th>${c.titulo}</th>`;
+    }).join('');
+    this.encabezado.querySelectorAll('.tv-ordenable').forEach(th => {
+      th.addEventListener('click', () => this.ordenar(th.dataset.campo));
+    });
+  }
+
+  ordenar(campo) {
+    this.direccion = campo === this.orden && this.direccion === 'asc' ? 'desc' : 'asc';
+    this.orden = campo;
+    this.dibujarEncabezado();
+    this.recargar(true);
+  }
+
+  // Búsqueda con espera: solo se consulta cuando el usuario deja de escribir
+  buscar(texto) {
+    clearTimeout(this.temporizadorBusqueda);
+    this.temporizadorBusqueda = setTimeout(() => {
+      if (texto === this.q) return;
+      this.q = texto;
+      this.recargar(true);
+    }, TablaVirtual.ESPERA_BUSQUEDA_MS);
+  }
+
+  // Descartar las páginas (por ejemplo, tras un cambio en los datos) y volver a pedir las visibles
+  recargar(alInicio = false) {
+    this.generacion++;
+    this.enCurso.forEach(control => control.abort());
+    this.enCurso.clear();
+    this.paginas.clear();
+    this.total = null;
+    if (alInicio) this.scroll.scrollTop = 0;
+    return this.cargarVisibles();
+  }
+
+  rangoVisible() {
+    const total = this.total ?? 0;
+    const primera = Math.max(0, Math.floor(this.scroll.scrollTop / this.altoFila) - TablaVirtual.SOBRANTE);
+    const ultima = Math.min(total, Math.ceil((this.scroll.scrollTop + this.alto) / this.altoFila) + TablaVirtual.SOBRANTE);
+    return [primera, ultima];
+  }
+
+  cargarVisibles() {
+    const [primera, ultima] = this.rangoVisible();
+    const desde = Math.floor(primera / this.tamanoPagina);
+    const hasta = this.total === null ? desde : Math.floor(Math.max(primera, ultima - 1) / this.tamanoPagina);
+    // Cancelar páginas que ya no se ven (desplazamiento rápido)
+    this.enCurso.forEach((control, pagina) => {
+      if (pagina < desde || pagina > hasta) {
+        control.abort();
+        this.enCurso.delete(pagina);
+      }
+    });
+    const pendientes = [];
+    for (let pagina = desde; pagina <= hasta; pagina++) {
+      if (!this.paginas.has(pagina) && !this.enCurso.has(pagina)) pendientes.push(this.cargarPagina(pagina));
+    }
+    return Promise.all(pendientes);
+  }
+
+  async cargarPagina(pagina) {
+    const generacion = this.generacion;
+    const control = new AbortController();
+    this.enCurso.set(pagina, control);
+    try {
+      const { filas, total } = await this.fuente({
+        skip: pagina * this.tamanoPagina, limit: this.tamanoPagina, orden: this.orden,
+        direccion: this.direccion, q: this.q, contar: this.total === null, signal: control.signal
+      });
+      if (generacion !== this.generacion) return;
+      if (this.total === null) {
+        this.total = total;
+        this.espaciador.style.height = `${total * this.altoFila}px`;
+      }
+      this.paginas.set(pagina, filas);
+      this.liberarPaginasLejanas(pagina);
+      this.programarDibujo();
+    } catch (error) {
+      if (error.name !== 'AbortError') {
+        console.error('Error cargando página:', error);
+        this.estado.textContent = 'No se pudieron cargar los datos';
+      }
+    } finally {
+      if (this.enCurso.get(pagina) === control) this.enCurso.delete(pagina);
+    }
+  }
+
+  liberarPaginasLejanas(actual) {
+    if (this.paginas.size <= TablaVirtual.MAX_PAGINAS) return;
+    const lejanas = [...this.paginas.keys()].sort((a, b) => Math.abs(b - actual) - Math.abs(a - actual));
+    lejanas.slice(0, this.paginas.size - TablaVirtual.MAX_PAGINAS).forEach(pagina => this.paginas.delete(pagina));
+  }
+
+  fila(indice) {
+    const filas = this.paginas.get(Math.floor(indice / this.tamanoPagina));
+    return filas && filas[indice % this.tamanoPagina];
+  }
+
+  // Fila ya cargada con ese id (por ejemplo, para leer su versión)
+  buscarFila(id) {
+    for (const filas of this.paginas.values()) {
+      const fila = filas.find(f => f.id === id);
+      if (fila) return fila;
+    }
+    return null;
+  }
+
+  programarDibujo() {
+    if (this.cuadroPendiente) return;
+    this.cuadroPendiente = true;
+    requestAnimationFrame(() => {
+      this.cuadroPendiente = false;
+      this.dibujar();
+      this.cargarVisibles();
+    });
+  }
+
+  dibujar() {
+    const inicio = performance.now();
+    const [primera, ultima] = this.rangoVisible();
+    const html = [];
+    for (let i = primera; i < ultima; i++) {
+      const fila = this.fila(i);
+      html.push(fila
+        ? this.renderFila(fila)
+        : `<tr class="tv-cargando"><td colspan="${this.columnas.length}">Cargando...</td></tr>`);
+    }
+    this.cuerpo.style.top = `${primera * this.altoFila}px`;
+    this.tbody.innerHTML = html.join('');
+    this.estado.textContent = this.total === null ? 'Cargando...'
+      : `${this.total} registro(s)${this.total ? `, mostrando ${primera + 1}-${ultima}` : ''}`;
+    this.medir(performance.now() - inicio);
+  }
+
+  medir(duracion) {
+    const m = this.mediciones;
+    m.dibujados++;
+    m.ultimoMs = duracion;
+    m.maximoMs = Math.max(m.maximoMs, duracion);
+    if (duracion > TablaVirtual.PRESUPUESTO_MS) {
+      m.sobrePresupuesto++;
+      console.warn(`Dibujado de tabla en ${duracion.toFixed(1)} ms (presupuesto ${TablaVirtual.PRESUPUESTO_MS} ms)`);
+    }
+  }
+}
+
+// Fuente de datos para los listados paginados del servidor (X-Total-Count con contar=true).
+// Con campos solo se piden esas columnas (?fields=), las que la tabla muestra
+function fuenteServidor(url, headers = {}, campos = null) {
+  return async ({ skip, limit, orden, direccion, q, contar, signal }) => {
+    const params = new URLSearchParams({ skip, limit, orden, direccion });
+    if (campos) params.set('fields', campos.join(','));
+    if (q) params.set('q', q);
+    if (contar) params.set('contar', 'true');
+    const response = await fetch(`${url}?${params}`, { headers, signal });
+    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+    return { filas: await response.json(), total: parseInt(response.headers.get('X-Total-Count') || '0') };
+  };
+}
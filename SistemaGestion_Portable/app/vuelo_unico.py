@@ -0,0 +1,67 @@
+"""
+Reportes pesados compartidos entre peticiones simultáneas (single-flight)
+Cuando llegan varias peticiones iguales mientras una ya se está calculando
+(por ejemplo, todos abren /balance/mensual al cerrar el mes), se espera a esa
+en lugar de repetirla y todas reciben el mismo resultado. No es una caché:
+terminado el cálculo, la siguiente petición calcula de nuevo. Una petición que
+se une a un cálculo en curso no ve los commits posteriores a su inicio, igual
+que si hubiera llegado unos milisegundos antes.
+
+El cálculo corre en su propia tarea: si el cliente que lo empezó se
+desconecta, los demás lo siguen esperando.
+"""
+import asyncio
+import os
+
+from metricas import metricas
+
+# 0 calcula cada petición por separado (para comparar o descartar un problema)
+ACTIVO = os.environ.get("SISTEMA_REPORTES_COMPARTIDOS", "1") == "1"
+
+class VueloUnico:
+    """Un cálculo en curso por clave, compartido por todas las peticiones que llegan mientras dura"""
+
+    def __init__(self, nombre, activo=ACTIVO):
+        self.nombre = nombre
+        self.activo = activo
+        self._en_curso = {}
+        self.peticiones = 0
+        self.calculos = 0
+        self.compartidas = 0
+
+    def _terminado(self, clave, tarea):
+        if self._en_curso.get(clave) is tarea:
+            del self._en_curso[clave]
+        if not tarea.cancelled():
+            # Marca la excepción como leída aunque todos los que esperaban se hayan ido
+            tarea.exception()
+
+    async def ejecutar(self, clave, funcion, *args):
+        """Resultado de funcion(*args), calculado en un hilo una sola vez para las peticiones simultáneas con la misma clave"""
+        self.peticiones += 1
+        tarea = self._en_curso.get(clave) if self.activo else None
+        if tarea is None:
+            self.calculos += 1
+            metricas.incrementar(f'{self.nombre}.calculos')
+            tarea = asyncio.ensure_future(asyncio.to_thread(funcion, *args))
+            if self.activo:
+                self._en_curso[clave] = tarea
+            tarea.add_done_callback(lambda terminada: self._terminado(clave, terminada))
+        else:
+            self.compartidas += 1
+            metricas.incrementar(f'{self.nombre}.compartidas')
+        return await asyncio.shield(tarea)
+
+    def estado(self):
+        return {
+            'activo': self.activo,
+            'peticiones': self.peticiones,
+            'calculos': self.calculos,
+            'compartidas': self.compartidas,
+            # Peticiones atendidas por cada cálculo
+            'proporcion': round(self.peticiones / self.calculos, 2) if self.calculos else None,
+            'en_curso': len(self._en_curso),
+        }
+
+# Instancia única usada por la aplicación
+reportes_compartidos = VueloUnico('reportes')
@@ -0,0 +1,100 @@
+"""
+Benchmark de arranque en frío - modo normal vs modo rápido (--rapido)
+
+Mide sobre una copia temporal de la base de datos:
+  1. El costo de init_database() completo frente al chequeo de huella.
+  2. El tiempo desde que se lanza el proceso hasta que /health responde.
+
+Uso:
+    python SistemaGestion_Portable/benchmarks/bench_arranque.py [--repeticiones N]
+"""
+import argparse
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+DB_ORIGEN = os.path.join(APP_DIR, "sistema_suscriptores.db")
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def medir_init(db_path, repeticiones):
+    """Medir init_database completo y rápido en el proceso actual"""
+    os.environ["SISTEMA_DB_PATH"] = db_path
+    sys.path.insert(0, APP_DIR)
+    import database_simple
+
+    database_simple.DB_PATH = db_path
+    resultados = {}
+    for modo, rapido in (("completo", False), ("rapido", True)):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            database_simple.init_database(rapido=rapido)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        resultados[modo] = tiempos
+    return resultados
+
+
+def medir_proceso(db_path, rapido):
+    """Lanzar el servidor y medir el tiempo hasta que /health responde"""
+    from urllib.request import urlopen
+
+    puerto = puerto_libre()
+    cmd = [sys.executable, os.path.join(APP_DIR, "main_simple_fixed.py"), "--puerto", str(puerto), "--sin-navegador"]
+    if rapido:
+        cmd.append("--rapido")
+    env = dict(os.environ, SISTEMA_DB_PATH=db_path)
+
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if proceso.poll() is not None:
+                raise RuntimeError("El servidor terminó antes de responder")
+            try:
+                with urlopen(f"http://127.0.0.1:{puerto}/health", timeout=1):
+                    return (time.perf_counter() - inicio) * 1000
+            except OSError:
+                time.sleep(0.01)
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+
+def resumen(tiempos):
+    return f"mediana {statistics.median(tiempos):8.2f} ms   min {min(tiempos):8.2f} ms   max {max(tiempos):8.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        if os.path.exists(DB_ORIGEN):
+            shutil.copy(DB_ORIGEN, db_path)
+
+        print("init_database()")
+        for modo, tiempos in medir_init(db_path, args.repeticiones).items():
+            print(f"  {modo:10s} {resumen(tiempos)}")
+
+        print("Proceso hasta /health")
+        for modo, rapido in (("normal", False), ("rapido", True)):
+            tiempos = [medir_proceso(db_path, rapido) for _ in range(args.repeticiones)]
+            print(f"  {modo:10s} {resumen(tiempos)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark de /batch frente a peticiones HTTP separadas
+
+Genera una base de datos temporal, lanza main_simple_fixed.py y pide, para
+uno y tres suscriptores al azar, el suscriptor, sus pagos y sus recibos:
+  - una petición tras otra por la misma conexión (keep-alive)
+  - todas a la vez, una conexión por petición (como el navegador)
+  - una sola petición a /batch
+Informa la mediana y el p95 del tiempo total de cada forma. En la misma
+máquina una petición HTTP cuesta muy poco; --rtt simula la latencia de ida y
+vuelta de la red de la oficina o de una VPN (una espera por petición).
+
+Uso:
+    python SistemaGestion_Portable/benchmarks/bench_batch.py [--suscriptores N] [--repeticiones N] [--rtt MS]
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_workers import APP_DIR, esperar_health, puerto_libre
+
+
+def poblar(db_path, suscriptores, meses):
+    """Crear el esquema y cargar suscriptores con sus pagos, ingresos y recibos"""
+    env = dict(os.environ, SISTEMA_DB_PATH=db_path)
+    subprocess.run([sys.executable, "-c", "import database_simple; database_simple.init_database()"],
+                   cwd=APP_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO suscriptores (numero_contrato, cedula, nombre_completo, email, fecha_suscripcion) VALUES (?, ?, ?, ?, ?)",
+        ((f"C-{i:06d}", f"{1000000 + i}", f"Suscriptor {i:06d}", f"s{i}@correo.com", "2024-01-01")
+         for i in range(suscriptores)))
+    conn.executemany(
+        "INSERT INTO pagos (suscriptor_id, mes, anio, fecha_pago, valor, tipo_pago) VALUES (?, ?, 2024, ?, 20000, 'efectivo')",
+        ((s, m, f"2024-{m:02d}-10") for s in range(1, suscriptores + 1) for m in range(1, meses + 1)))
+    conn.execute("INSERT INTO ingresos (pago_id, monto, fecha) SELECT id, valor, fecha_pago FROM pagos")
+    conn.execute("INSERT INTO recibos (pago_id, numero_recibo) SELECT id, 'REC-20240110-' || printf('%07d', id) FROM pagos")
+    conn.commit()
+    conn.close()
+
+
+def rutas(suscriptor_ids):
+    return [ruta for i in suscriptor_ids
+            for ruta in (f"/suscriptores/{i}", f"/pagos/suscriptor/{i}", f"/recibos/suscriptor/{i}")]
+
+
+RTT = 0.0
+
+
+def pedir(conexion, metodo, ruta, cuerpo=None):
+    time.sleep(RTT)
+    cabeceras = {"Content-Type": "application/json"} if cuerpo else {}
+    try:
+        conexion.request(metodo, ruta, cuerpo, cabeceras)
+        respuesta = conexion.getresponse()
+    except (http.client.RemoteDisconnected, ConnectionError):
+        # El servidor cierra las conexiones keep-alive inactivas; se reabre una vez
+        conexion.close()
+        conexion.request(metodo, ruta, cuerpo, cabeceras)
+        respuesta = conexion.getresponse()
+    datos = respuesta.read()
+    assert respuesta.status == 200, (ruta, respuesta.status, datos[:200])
+    return datos
+
+
+def percentiles(tiempos):
+    tiempos = sorted(tiempos)
+    return tiempos[len(tiempos) // 2], tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suscriptores", type=int, default=5000)
+    parser.add_argument("--meses", type=int, default=12)
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--rtt", type=float, default=0.0, help="latencia de red simulada por petición, en ms")
+    args = parser.parse_args()
+    global RTT
+    RTT = args.rtt / 1000
+    azar = random.Random(3)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        poblar(db_path, args.suscriptores, args.meses)
+        puerto = puerto_libre()
+        proceso = subprocess.Popen(
+            [sys.executable, os.path.join(APP_DIR, "main_simple_fixed.py"), "--rapido", "--sin-navegador",
+             "--puerto", str(puerto)],
+            env=dict(os.environ, SISTEMA_DB_PATH=db_path), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            esperar_health(puerto, proceso)
+            conexion = http.client.HTTPConnection("127.0.0.1", puerto, timeout=30)
+            conexiones = [http.client.HTTPConnection("127.0.0.1", puerto, timeout=30) for _ in range(9)]
+            hilos = ThreadPoolExecutor(max_workers=len(conexiones))
+
+            def seguidas(lista):
+                for ruta in lista:
+                    pedir(conexion, "GET", ruta)
+
+            def a_la_vez(lista):
+                list(hilos.map(lambda par: pedir(par[0], "GET", par[1]), zip(conexiones, lista)))
+
+            def en_batch(lista):
+                pedir(conexion, "POST", "/batch", json.dumps([{"url": ruta} for ruta in lista]))
+
+            print(f"{args.suscriptores} suscriptores con {args.meses} pagos y recibos cada uno; red simulada: {args.rtt:g} ms")
+            print(f"{'':<40}{'mediana':>10}{'p95':>12}")
+            for cantidad in (1, 3):
+                for nombre, forma in (("seguidas", seguidas), ("a la vez", a_la_vez), ("/batch", en_batch)):
+                    forma(rutas([1] * cantidad))   # calentar
+                    tiempos = []
+                    for _ in range(args.repeticiones):
+                        lista = rutas(azar.sample(range(1, args.suscriptores + 1), cantidad))
+                        inicio = time.perf_counter()
+                        forma(lista)
+                        tiempos.append((time.perf_counter() - inicio) * 1000)
+                    mediana, p95 = percentiles(tiempos)
+                    print(f"{f'{cantidad * 3} consultas, {nombre}':<40}{mediana:8.2f} ms{p95:10.2f} ms")
+            hilos.shutdown()
+        finally:
+            proceso.terminate()
+            proceso.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark de la búsqueda de gastos
+
+Sobre una base de datos temporal con N gastos compara, para términos comunes,
+raros y prefijos, con y sin filtros de tipo y fechas:
+  - busqueda_gastos.buscar con FTS5 (/gastos/buscar)
+  - LIKE '%termino%' sobre descripción, lugar y motivo (la búsqueda anterior)
+También mide cuánto cuesta registrar un gasto con los disparadores del índice.
+
+Uso:
+    python SistemaGestion_Portable/benchmarks/bench_busqueda_gastos.py [--filas N] [--repeticiones N]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+PALABRAS = ("cable coaxial conector amplificador fuente poste tensor grapa herraje antena decodificador control "
+            "energía arriendo transporte gasolina papelería impresora tóner internet teléfono nómina auxiliar "
+            "técnico reparación mantenimiento instalación revisión daño tormenta cabecera nodo barrio vereda").split()
+LUGARES = ["Ferretería El Tornillo", "Almacén Éxito", "Distribuidora Central", "Electricos del Norte", "Papelería Lápiz"]
+TIPOS = ["compra", "pago_trabajador", "servicio", "alquiler", "otros"]
+
+LIKE = '''
+    SELECT * FROM gastos
+    WHERE descripcion LIKE ? OR lugar_compra LIKE ? OR motivo LIKE ?
+    LIMIT 50
+'''
+
+def poblar(conn, filas, azar):
+    conn.executemany(
+        "INSERT INTO gastos (tipo_gasto, descripcion, valor, fecha, lugar_compra, motivo) VALUES (?, ?, ?, ?, ?, ?)",
+        ((azar.choice(TIPOS), " ".join(azar.choices(PALABRAS, k=6)) + f" lote {i}", 1000 + i % 90000,
+          f"{2020 + i % 5}-{i % 12 + 1:02d}-{i % 28 + 1:02d}", azar.choice(LUGARES), " ".join(azar.choices(PALABRAS, k=3)))
+         for i in range(filas)))
+    conn.commit()
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=100000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+    azar = random.Random(7)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["SISTEMA_DB_PATH"] = os.path.join(tmp, "bench.db")
+        sys.path.insert(0, APP_DIR)
+        import database_simple
+        import busqueda_gastos
+
+        if not database_simple.SOPORTA_FTS5:
+            print("Este SQLite no tiene FTS5: /gastos/buscar usará LIKE")
+        database_simple.init_database()
+        conn = database_simple.get_connection()
+        inicio = time.perf_counter()
+        poblar(conn, args.filas, azar)
+        print(f"{args.filas} gastos insertados en {time.perf_counter() - inicio:.1f} s (con disparadores del índice)")
+
+        casos = [
+            ("término común", "cable", {}),
+            ("término raro", f"lote {args.filas // 2}", {}),
+            ("prefijo", "amplif", {}),
+            ("dos palabras", "reparación tormenta", {}),
+            ("común + tipo + año", "cable", {"tipo_gasto": "servicio", "fecha_inicio": date(2022, 1, 1),
+                                             "fecha_fin": date(2022, 12, 31)}),
+            ("sin coincidencias", "zzzz", {}),
+        ]
+        print(f"{'':<24}{'FTS5':>10}{'LIKE':>12}")
+        for nombre, termino, filtros in casos:
+            fts = medir(lambda: busqueda_gastos.buscar(conn, termino, **filtros), args.repeticiones)
+            like = medir(lambda: conn.execute(LIKE, (f'%{termino}%',) * 3).fetchall(), args.repeticiones)
+            print(f"{nombre:<24}{fts:8.2f} ms{like:10.2f} ms")
+
+        alta = medir(lambda: (conn.execute(
+            "INSERT INTO gastos (tipo_gasto, descripcion, valor, fecha) VALUES ('otros', 'cable coaxial', 1, '2024-01-01')"),
+            conn.commit()), args.repeticiones)
+        print(f"registrar un gasto: {alta:.2f} ms")
+        conn.close()
+
+if __name__ == "__main__":
+    main()
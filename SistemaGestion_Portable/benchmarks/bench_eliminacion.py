@@ -0,0 +1,91 @@
+"""
+Benchmark de eliminación de suscriptores con historiales largos
+
+Sobre una base de datos temporal con S suscriptores de H pagos cada uno
+(cada pago con su recibo e ingreso) compara, todo en una sola transacción:
+  manual:     las cuatro sentencias con subconsultas que usaba eliminar_suscriptor,
+              sin claves foráneas (como antes).
+  manual+fk:  las mismas sentencias con PRAGMA foreign_keys activo.
+  cascada:    un DELETE del suscriptor por vez; ON DELETE CASCADE hace el resto.
+  lote:       lotes.eliminar() con todos los ids en una sola sentencia.
+
+Uso:
+    python SistemaGestion_Portable/benchmarks/bench_eliminacion.py [--suscriptores N] [--historial N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+
+def poblar(conn, suscriptores, historial):
+    conn.executemany(
+        "INSERT INTO suscriptores (id, numero_contrato, cedula, nombre_completo, email, fecha_suscripcion) VALUES (?, ?, ?, ?, ?, ?)",
+        ((i, f"C-{i:07d}", f"{10000000 + i}", f"Suscriptor {i}", f"s{i}@correo.com", "2010-01-01")
+         for i in range(1, suscriptores + 1)))
+    pagos = [(s, periodo % 12 + 1, 2000 + periodo // 12) for s in range(1, suscriptores + 1) for periodo in range(historial)]
+    conn.executemany(
+        "INSERT INTO pagos (id, suscriptor_id, mes, anio, fecha_pago, valor, tipo_pago) VALUES (?, ?, ?, ?, ?, 20000, 'efectivo')",
+        ((n, s, mes, anio, f"{anio}-{mes:02d}-10") for n, (s, mes, anio) in enumerate(pagos, 1)))
+    conn.executemany("INSERT INTO recibos (pago_id, numero_recibo) VALUES (?, ?)",
+                     ((n, f"REC-B-{n:09d}") for n in range(1, len(pagos) + 1)))
+    conn.executemany("INSERT INTO ingresos (pago_id, monto, fecha) VALUES (?, 20000, '2020-01-10')",
+                     ((n,) for n in range(1, len(pagos) + 1)))
+    conn.commit()
+
+
+def eliminar_manual(conn, suscriptor_id):
+    conn.execute('DELETE FROM ingresos WHERE pago_id IN (SELECT id FROM pagos WHERE suscriptor_id = ?)', (suscriptor_id,))
+    conn.execute('DELETE FROM recibos WHERE pago_id IN (SELECT id FROM pagos WHERE suscriptor_id = ?)', (suscriptor_id,))
+    conn.execute('DELETE FROM pagos WHERE suscriptor_id = ?', (suscriptor_id,))
+    conn.execute('DELETE FROM suscriptores WHERE id = ?', (suscriptor_id,))
+
+
+def eliminar_cascada(conn, suscriptor_id):
+    conn.execute('DELETE FROM suscriptores WHERE id = ?', (suscriptor_id,))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suscriptores", type=int, default=500)
+    parser.add_argument("--historial", type=int, default=240, help="Pagos por suscriptor")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        os.environ["SISTEMA_DB_PATH"] = db_path
+        sys.path.insert(0, APP_DIR)
+        import database_simple
+        import lotes
+
+        database_simple.init_database()
+        conn = database_simple.get_connection()
+        poblar(conn, args.suscriptores, args.historial)
+        ids = list(range(1, args.suscriptores + 1))
+        filas = args.suscriptores * (1 + 3 * args.historial)
+        print(f"{args.suscriptores} suscriptores x {args.historial} pagos ({filas} filas por escenario)")
+
+        for nombre in ("manual", "manual+fk", "cascada", "lote"):
+            # Cada escenario parte de la misma base: se elimina y se revierte
+            conn.execute(f"PRAGMA foreign_keys = {'OFF' if nombre == 'manual' else 'ON'}")
+            conn.execute("BEGIN IMMEDIATE")
+            inicio = time.perf_counter()
+            if nombre == "lote":
+                lotes.eliminar(conn, "suscriptores", ids)
+            else:
+                eliminar = eliminar_cascada if nombre == "cascada" else eliminar_manual
+                for suscriptor_id in ids:
+                    eliminar(conn, suscriptor_id)
+            duracion = time.perf_counter() - inicio
+            restantes = conn.execute("SELECT COUNT(*) FROM ingresos").fetchone()[0]
+            conn.rollback()
+            print(f"{nombre:>9}: {duracion * 1000:8.1f} ms total, "
+                  f"{duracion * 1000 / args.suscriptores:6.3f} ms por suscriptor (ingresos restantes: {restantes})")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
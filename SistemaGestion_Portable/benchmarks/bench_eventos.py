@@ -0,0 +1,167 @@
+"""
+Benchmark de los eventos en vivo (/eventos) frente a la consulta periódica
+
+Genera una base de datos temporal, lanza main_simple_fixed.py y conecta N
+paneles a /eventos. Registra pagos de a uno y mide cuánto tarda cada pago en
+llegar a todos los paneles desde que su POST respondió. Como referencia mide
+una consulta de /sync/changes, lo que cuesta cada panel cada 15 s al
+consultar periódicamente.
+
+Después conecta un panel que nunca lee (con un buffer de recepción mínimo),
+registra una ráfaga de lotes de 50 pagos, al ritmo de los paneles que leen, y
+comprueba que el servidor lo desconecta por lento sin que los demás pierdan
+eventos.
+
+Uso:
+    python SistemaGestion_Portable/benchmarks/bench_eventos.py [--paneles N] [--pagos N] [--rafaga N]
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench_batch import poblar
+from bench_workers import APP_DIR, esperar_health, puerto_libre
+
+INTERVALO_SYNC = 15
+
+
+class Panel(threading.Thread):
+    """Cliente de /eventos que anota cuándo llega cada pago"""
+
+    def __init__(self, puerto):
+        super().__init__(daemon=True)
+        self.conexion = http.client.HTTPConnection("127.0.0.1", puerto, timeout=60)
+        self.conexion.request("GET", "/eventos")
+        self.respuesta = self.conexion.getresponse()
+        assert self.respuesta.status == 200
+        self.llegadas = {}
+
+    def run(self):
+        tipo = None
+        try:
+            for linea in iter(self.respuesta.readline, b""):
+                if linea.startswith(b"event: "):
+                    tipo = linea[7:].strip()
+                elif linea.startswith(b"data: ") and tipo == b"pago":
+                    self.llegadas[json.loads(linea[6:])["id"]] = time.perf_counter()
+        except OSError:
+            pass
+
+
+def registrar_pago(conexion, suscriptor_id, mes):
+    cuerpo = json.dumps({"suscriptor_id": suscriptor_id, "mes": mes, "anio": 2030, "fecha_pago": "2030-01-10",
+                         "valor": 20000, "tipo_pago": "efectivo"})
+    conexion.request("POST", "/pagos/", cuerpo, {"Content-Type": "application/json"})
+    respuesta = conexion.getresponse()
+    datos = respuesta.read()
+    assert respuesta.status == 201, datos[:200]
+    return json.loads(datos)["id"], time.perf_counter()
+
+
+def registrar_lote(conexion, desde, cantidad, mes):
+    cuerpo = json.dumps([{"suscriptor_id": desde + i, "mes": mes, "anio": 2030, "fecha_pago": "2030-01-10",
+                          "valor": 20000, "tipo_pago": "efectivo"} for i in range(cantidad)])
+    conexion.request("POST", "/pagos/batch", cuerpo, {"Content-Type": "application/json"})
+    respuesta = conexion.getresponse()
+    datos = json.loads(respuesta.read())
+    assert respuesta.status == 200 and datos["creados"] == cantidad, datos
+    return [resultado["id"] for resultado in datos["resultados"]]
+
+
+def pedir_json(conexion, ruta):
+    conexion.request("GET", ruta)
+    respuesta = conexion.getresponse()
+    return json.loads(respuesta.read())
+
+
+def esperar(condicion, limite=10):
+    fin = time.time() + limite
+    while not condicion() and time.time() < fin:
+        time.sleep(0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suscriptores", type=int, default=20000)
+    parser.add_argument("--paneles", type=int, default=50)
+    parser.add_argument("--pagos", type=int, default=50)
+    parser.add_argument("--rafaga", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        poblar(db_path, args.suscriptores, 12)
+        puerto = puerto_libre()
+        proceso = subprocess.Popen(
+            [sys.executable, os.path.join(APP_DIR, "main_simple_fixed.py"), "--rapido", "--sin-navegador",
+             "--puerto", str(puerto)],
+            env=dict(os.environ, SISTEMA_DB_PATH=db_path), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            esperar_health(puerto, proceso)
+            conexion = http.client.HTTPConnection("127.0.0.1", puerto, timeout=30)
+            paneles = [Panel(puerto) for _ in range(args.paneles)]
+            for panel in paneles:
+                panel.start()
+
+            # Referencia: lo que cuesta cada consulta periódica de un panel
+            token = pedir_json(conexion, "/sync/changes")["token"]
+            tiempos = []
+            for _ in range(20):
+                inicio = time.perf_counter()
+                pedir_json(conexion, f"/sync/changes?since={token.replace(' ', '%20')}")
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            consulta = statistics.median(tiempos)
+
+            latencias = []
+            for i in range(args.pagos):
+                pago_id, confirmado = registrar_pago(conexion, i + 1, 1)
+                esperar(lambda: all(pago_id in panel.llegadas for panel in paneles))
+                latencias.extend((panel.llegadas[pago_id] - confirmado) * 1000 for panel in paneles
+                                 if pago_id in panel.llegadas)
+                time.sleep(0.05)
+            latencias.sort()
+            estado = pedir_json(conexion, "/metricas")
+            lectura = estado["observaciones"]["eventos.lectura_ms"]
+
+            print(f"{args.paneles} paneles, {args.pagos} pagos registrados de a uno")
+            print(f"  eventos:  llegada a todos los paneles mediana {statistics.median(latencias):.1f} ms, "
+                  f"p95 {latencias[int(len(latencias) * 0.95)]:.1f} ms, máx {latencias[-1]:.1f} ms "
+                  f"({len(latencias)} de {args.paneles * args.pagos} entregas)")
+            print(f"            una lectura por cambio para todos los paneles: {lectura}")
+            print(f"  consulta: {args.paneles * 60 // INTERVALO_SYNC} peticiones por minuto aunque no haya cambios, "
+                  f"{consulta:.1f} ms cada una; un pago tarda {INTERVALO_SYNC / 2:g} s en promedio en verse")
+
+            # Un panel que deja de leer: se lo desconecta y los demás siguen recibiendo
+            lento = socket.socket()
+            lento.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024)
+            lento.connect(("127.0.0.1", puerto))
+            lento.sendall(b"GET /eventos HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n")
+            time.sleep(0.2)
+            inicio = time.perf_counter()
+            ultimos = []
+            for i in range(0, args.rafaga, 50):
+                # Al ritmo de los paneles que leen: más de 100 pagos en una lectura serían un aviso de recargar
+                lote = registrar_lote(conexion, i % args.suscriptores + 1, min(50, args.rafaga - i), 2 + i // args.suscriptores)
+                esperar(lambda: all(lote[-1] in panel.llegadas for panel in paneles))
+                ultimos.extend(lote)
+            duracion = time.perf_counter() - inicio
+            completos = sum(all(pago in panel.llegadas for pago in ultimos) for panel in paneles)
+            estado = pedir_json(conexion, "/metricas")["eventos"]
+            print(f"ráfaga de {args.rafaga} pagos en {duracion:.1f} s con un panel que no lee: "
+                  f"{estado['expulsados']} expulsado(s), {completos} de {args.paneles} paneles recibieron todo")
+            lento.close()
+        finally:
+            proceso.terminate()
+            proceso.wait()
+
+
+if __name__ == "__main__":
+    main()
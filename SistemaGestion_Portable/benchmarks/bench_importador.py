@@ -0,0 +1,68 @@
+"""
+Benchmark del importador masivo: historial de pagos desde CSV
+
+Genera una base de datos temporal con suscriptores, escribe un CSV con
+N pagos (por defecto 2.000.000, con un 0,1% de filas inválidas) y mide
+importador.importar(). Objetivo: menos de un minuto para 2M filas.
+
+Uso:
+    python SistemaGestion_Portable/benchmarks/bench_importador.py [--filas N] [--tamano-lote N]
+"""
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=2_000_000)
+    parser.add_argument("--tamano-lote", type=int, default=50000)
+    parser.add_argument("--sin-diferir-indices", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        os.environ["SISTEMA_DB_PATH"] = db_path
+        sys.path.insert(0, APP_DIR)
+        import database_simple
+        import importador
+
+        database_simple.init_database()
+
+        # Un suscriptor por cada 120 pagos (10 años de historial mensual)
+        suscriptores = max(1, -(-args.filas // 120))
+        conn = sqlite3.connect(db_path)
+        conn.executemany(
+            "INSERT INTO suscriptores (numero_contrato, cedula, nombre_completo, email, fecha_suscripcion) VALUES (?, ?, ?, ?, ?)",
+            ((f"C-{i:07d}", f"{10000000 + i}", f"Suscriptor {i}", f"s{i}@correo.com", "2014-01-01")
+             for i in range(suscriptores)))
+        conn.commit()
+        conn.close()
+
+        ruta = os.path.join(tmp, "pagos.csv")
+        inicio = time.perf_counter()
+        with open(ruta, "w", newline="") as archivo:
+            escritor = csv.writer(archivo)
+            escritor.writerow(["suscriptor_id", "mes", "anio", "fecha_pago", "valor", "tipo_pago", "monto_efectivo"])
+            for n in range(args.filas):
+                suscriptor, periodo = divmod(n, 120)
+                anio, mes = 2014 + periodo // 12, periodo % 12 + 1
+                valor = "20000" if n % 1000 else "-5"  # 0,1% de filas inválidas
+                escritor.writerow([suscriptor + 1, mes, anio, f"{anio}-{mes:02d}-10", valor, "efectivo", valor])
+        print(f"CSV generado: {args.filas} filas en {time.perf_counter() - inicio:.1f} s")
+
+        resumen = importador.importar("pagos", ruta, tamano_lote=args.tamano_lote,
+                                      archivo_rechazos=os.path.join(tmp, "rechazos.csv"),
+                                      diferir=not args.sin_diferir_indices)
+        print(f"Importadas {resumen['importadas']} / rechazadas {resumen['rechazadas']} "
+              f"en {resumen['duracion_s']:.1f} s ({resumen['filas'] / resumen['duracion_s']:,.0f} filas/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark de la codificación de pagos: JSON frente a MessagePack
+
+Sobre una base de datos temporal con N pagos (un millón por omisión) codifica
+todo el historial, por bloques como /pagos/exportar, de tres formas:
+  - JSON como /pagos/ (validación con el modelo y dump_json de pydantic)
+  - JSON de /pagos/exportar (formatos.codificar, json.dumps)
+  - MessagePack de /pagos/exportar (formatos.codificar, Accept: application/msgpack)
+Informa el tiempo de codificar (sin contar la lectura de la base), el tiempo
+de decodificar en el cliente y el tamaño total. Al final descarga la
+exportación completa a través de la aplicación (TestClient) en ambos formatos.
+
+Requiere msgpack (pip install msgpack).
+
+Uso:
+    python SistemaGestion_Portable/benchmarks/bench_msgpack.py [--filas N]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+BANCOS = ["Bancolombia", "Davivienda", "Banco de Bogotá", "Nequi"]
+
+
+def poblar(conn, filas):
+    suscriptores = (filas + 11) // 12
+    conn.executemany(
+        "INSERT INTO suscriptores (id, numero_contrato, cedula, nombre_completo, email, fecha_suscripcion) VALUES (?, ?, ?, ?, ?, ?)",
+        ((i, f"C-{i:07d}", f"{10000000 + i}", f"Suscriptor {i:07d}", f"s{i}@correo.com", "2020-01-01")
+         for i in range(1, suscriptores + 1)))
+    # Cada suscriptor paga los doce meses; uno de cada tres por transferencia
+    conn.executemany(
+        "INSERT INTO pagos (id, suscriptor_id, mes, anio, fecha_pago, valor, tipo_pago, entidad_bancaria, "
+        "nombre_transferente, monto_efectivo) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        ((i, i // 12 + 1, i % 12 + 1, 2024, f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}", 10000.0 + i % 5000,
+          'transferencia' if i % 3 == 0 else 'efectivo', BANCOS[i % 4] if i % 3 == 0 else None,
+          f"Suscriptor {i // 12 + 1:07d}" if i % 3 == 0 else None, None if i % 3 == 0 else 10000.0 + i % 5000)
+         for i in range(filas)))
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=1000000)
+    args = parser.parse_args()
+    try:
+        import msgpack
+    except ImportError:
+        sys.exit("Este benchmark necesita msgpack: pip install msgpack")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["SISTEMA_DB_PATH"] = os.path.join(tmp, "bench.db")
+        sys.path.insert(0, APP_DIR)
+        import database_simple
+        import formatos
+        from fastapi.testclient import TestClient
+        from pydantic import TypeAdapter
+        import main_simple_fixed
+
+        database_simple.init_database()
+        conn = database_simple.get_connection()
+        poblar(conn, args.filas)
+        campos = tuple(main_simple_fixed.PagoResponse.model_fields)
+        adaptador = TypeAdapter(List[main_simple_fixed.PagoResponse])
+
+        # Cada bloque se codifica como un arreglo completo para poder decodificarlo solo
+        codificadores = {
+            "JSON de /pagos/ (pydantic)": (
+                lambda filas: adaptador.dump_json(adaptador.validate_python([dict(fila) for fila in filas])), json.loads),
+            "JSON de /pagos/exportar": (
+                lambda filas: b"".join(formatos.codificar([filas], campos, formatos.JSON, len(filas))), json.loads),
+            "MessagePack": (
+                lambda filas: b"".join(formatos.codificar([filas], campos, formatos.MSGPACK, len(filas))), msgpack.unpackb),
+        }
+        resultados = {nombre: [0.0, 0.0, 0] for nombre in codificadores}
+        cursor = conn.execute(f"SELECT {', '.join(campos)} FROM pagos ORDER BY id")
+        while filas := cursor.fetchmany(main_simple_fixed.FILAS_POR_BLOQUE):
+            for nombre, (codificar, decodificar) in codificadores.items():
+                inicio = time.perf_counter()
+                contenido = codificar(filas)
+                codificado = time.perf_counter()
+                decodificar(contenido)
+                resultado = resultados[nombre]
+                resultado[0] += codificado - inicio
+                resultado[1] += time.perf_counter() - codificado
+                resultado[2] += len(contenido)
+        conn.close()
+
+        base = resultados["JSON de /pagos/ (pydantic)"]
+        print(f"{args.filas} pagos en bloques de {main_simple_fixed.FILAS_POR_BLOQUE}")
+        print(f"{'':<30}{'codificar':>12}{'decodificar':>14}{'tamaño':>12}{'vs /pagos/':>12}")
+        for nombre, (codificar_s, decodificar_s, tamano) in resultados.items():
+            print(f"{nombre:<30}{codificar_s:10.2f} s{decodificar_s:12.2f} s{tamano / 1024 / 1024:9.1f} MB"
+                  f"{base[0] / codificar_s:10.1f}x")
+
+        # La exportación completa: lectura de la base, codificación y envío
+        with TestClient(main_simple_fixed.app) as cliente:
+            for nombre, accept in (("JSON", formatos.JSON), ("MessagePack", formatos.MSGPACK)):
+                inicio = time.perf_counter()
+                respuesta = cliente.get("/pagos/exportar", headers={"Accept": accept})
+                segundos = time.perf_counter() - inicio
+                assert respuesta.status_code == 200 and respuesta.headers["content-type"] == accept
+                print(f"/pagos/exportar {nombre:<14}{segundos:8.2f} s{len(respuesta.content) / 1024 / 1024:9.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
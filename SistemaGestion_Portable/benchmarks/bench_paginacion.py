@@ -0,0 +1,114 @@
+"""
+Benchmark de los listados paginados que alimentan las tablas virtuales del panel
+
+Sobre una base de datos temporal con N suscriptores y N pagos mide, a través
+de la aplicación completa (TestClient: validación, consulta y JSON), cuánto
+tarda una página de --pagina filas al inicio, a la mitad y al final del
+listado, con distintos órdenes, con el conteo total y con búsqueda. La tabla
+virtual pide una página por cada salto de scroll, así que el tiempo de una
+página es la parte del servidor en la espera que ve el usuario; el dibujado
+en el navegador no se mide aquí. Los casos con fields= piden solo las
+columnas que muestran las tablas del panel (o solo las de un índice) y se
+informa también el tamaño de la respuesta.
+
+Uso:
+    python SistemaGestion_Portable/benchmarks/bench_paginacion.py [--filas N] [--pagina N] [--repeticiones N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+
+def poblar(conn, filas):
+    conn.executemany(
+        "INSERT INTO suscriptores (id, numero_contrato, cedula, nombre_completo, email, fecha_suscripcion) VALUES (?, ?, ?, ?, ?, ?)",
+        ((i, f"C-{i:07d}", f"{10000000 + i}", f"Suscriptor {(i * 7919) % filas:07d}", f"s{i}@correo.com",
+          f"{2000 + i % 25}-{i % 12 + 1:02d}-01") for i in range(1, filas + 1)))
+    conn.executemany(
+        "INSERT INTO pagos (id, suscriptor_id, mes, anio, fecha_pago, valor, tipo_pago) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((i, i, i % 12 + 1, 2024, f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}", 10000 + i % 5000,
+          'efectivo' if i % 3 else 'transferencia') for i in range(1, filas + 1)))
+    conn.commit()
+
+
+# Columnas que muestran las tablas virtuales del panel
+CAMPOS_PANEL = {
+    "suscriptores": "id,numero_contrato,cedula,nombre_completo,email,telefono,direccion,fecha_suscripcion,version",
+    "pagos": "id,suscriptor_id,mes,anio,fecha_pago,valor,tipo_pago",
+}
+
+
+def medir(cliente, ruta, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        respuesta = cliente.get(ruta)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        assert respuesta.status_code == 200, (ruta, respuesta.text)
+    return statistics.median(tiempos), max(tiempos), len(respuesta.content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=100000)
+    parser.add_argument("--pagina", type=int, default=200)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["SISTEMA_DB_PATH"] = os.path.join(tmp, "bench.db")
+        sys.path.insert(0, APP_DIR)
+        import database_simple
+        from fastapi.testclient import TestClient
+        import main_simple_fixed
+
+        database_simple.init_database()
+        conn = database_simple.get_connection()
+        poblar(conn, args.filas)
+        conn.execute("ANALYZE")
+        conn.close()
+
+        n, p = args.filas, args.pagina
+        casos = []
+        for tabla, orden in (("suscriptores", "nombre_completo"), ("suscriptores", "cedula"),
+                             ("suscriptores", "fecha_suscripcion"), ("pagos", "fecha_pago"), ("pagos", "suscriptor_id")):
+            for nombre, skip in (("inicio", 0), ("mitad", n // 2), ("final", n - p)):
+                casos.append((f"{tabla} {orden} {nombre}", f"/{tabla}/?limit={p}&skip={skip}&orden={orden}"))
+        casos += [
+            ("suscriptores inicio + contar", f"/suscriptores/?limit={p}&contar=true"),
+            ("pagos inicio + contar", f"/pagos/?limit={p}&contar=true"),
+            ("suscriptores q=0001 + contar", f"/suscriptores/?limit={p}&q=0001&contar=true"),
+            ("pagos q=nombre + contar", f"/pagos/?limit={p}&q=Suscriptor%2000012&contar=true"),
+            ("pagos q=id suscriptor", f"/pagos/?limit={p}&q={n // 2}"),
+        ]
+        for tabla, orden in (("suscriptores", "nombre_completo"), ("pagos", "fecha_pago")):
+            for nombre, skip in (("inicio", 0), ("final", n - p)):
+                casos.append((f"{tabla} {nombre} fields=panel",
+                              f"/{tabla}/?limit={p}&skip={skip}&orden={orden}&fields={CAMPOS_PANEL[tabla]}"))
+        # Solo columnas del índice de nombres: el índice cubre la consulta
+        casos.append(("suscriptores final fields=nombre_completo",
+                      f"/suscriptores/?limit={p}&skip={n - p}&orden=nombre_completo&fields=nombre_completo"))
+        # Los mismos listados con suscriptores eliminados pendientes de purga (1 de cada 1000)
+        casos_eliminados = [(f"{nombre} (con eliminados)", ruta) for nombre, ruta in casos if ruta.startswith("/pagos/")]
+
+        print(f"{n} suscriptores y {n} pagos, páginas de {p} filas (mediana y máximo de {args.repeticiones})")
+        with TestClient(main_simple_fixed.app) as cliente:
+            for nombre, ruta in casos:
+                mediana, maximo, tamano = medir(cliente, ruta, args.repeticiones)
+                print(f"{nombre:<48}{mediana:8.1f} ms{maximo:8.1f} ms{tamano / 1024:8.1f} KB")
+            conn = database_simple.get_connection()
+            conn.execute("UPDATE suscriptores SET eliminado_en = '2024-01-01' WHERE id % 1000 = 0")
+            conn.commit()
+            conn.close()
+            for nombre, ruta in casos_eliminados:
+                mediana, maximo, tamano = medir(cliente, ruta, args.repeticiones)
+                print(f"{nombre:<48}{mediana:8.1f} ms{maximo:8.1f} ms{tamano / 1024:8.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark de los reportes compartidos entre peticiones simultáneas
+
+Genera una base de datos temporal con N suscriptores y doce meses de pagos
+(con su ingreso) y gastos, y lanza main_simple_fixed.py con los reportes
+compartidos y sin ellos (SISTEMA_REPORTES_COMPARTIDOS=0). Para 1, 10 y 25
+usuarios que abren a la vez /balance/mensual del año y /balance/detallado del
+mes en curso, informa la mediana y el máximo de lo que espera cada uno y la
+proporción de peticiones por cálculo que queda en /metricas.
+
+Uso:
+    python SistemaGestion_Portable/benchmarks/bench_reportes_compartidos.py [--filas N] [--repeticiones N]
+"""
+import argparse
+import http.client
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+from bench_resumen_panel import poblar
+from bench_workers import APP_DIR, esperar_health, puerto_libre
+
+USUARIOS = (1, 10, 25)
+
+
+def a_la_vez(puerto, ruta, usuarios):
+    """Lanzar la misma petición desde varios clientes a la vez; devuelve lo que esperó cada uno en ms"""
+    conexiones = [http.client.HTTPConnection("127.0.0.1", puerto, timeout=120) for _ in range(usuarios)]
+    for conexion in conexiones:
+        conexion.connect()
+    salida = threading.Barrier(usuarios)
+    tiempos = []
+
+    def pedir(conexion):
+        salida.wait()
+        inicio = time.perf_counter()
+        conexion.request("GET", ruta)
+        respuesta = conexion.getresponse()
+        respuesta.read()
+        assert respuesta.status == 200, respuesta.status
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        conexion.close()
+
+    hilos = [threading.Thread(target=pedir, args=(conexion,)) for conexion in conexiones]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return tiempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=100000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+    hoy = date.today()
+    rutas = (f"/balance/mensual?anio={hoy.year}",
+             f"/balance/detallado?fecha_inicio={hoy.replace(day=1).isoformat()}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        env = dict(os.environ, SISTEMA_DB_PATH=db_path)
+        subprocess.run([sys.executable, "-c", "import database_simple; database_simple.init_database()"],
+                       cwd=APP_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+        conn = sqlite3.connect(db_path)
+        poblar(conn, args.filas)
+        conn.execute("ANALYZE")
+        conn.close()
+
+        print(f"{args.filas} suscriptores, {args.filas * 12 - args.filas // 10} pagos e ingresos, {args.filas} gastos")
+        print(f"{'':<44}{'compartidos (mediana / máx)':>30}{'sin compartir (mediana / máx)':>32}")
+        resultados = {}
+        proporciones = {}
+        for compartidos in ("1", "0"):
+            puerto = puerto_libre()
+            proceso = subprocess.Popen(
+                [sys.executable, os.path.join(APP_DIR, "main_simple_fixed.py"), "--rapido", "--sin-navegador",
+                 "--puerto", str(puerto)],
+                env=dict(env, SISTEMA_REPORTES_COMPARTIDOS=compartidos),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                esperar_health(puerto, proceso)
+                for ruta in rutas:
+                    a_la_vez(puerto, ruta, 1)   # calentar
+                    for usuarios in USUARIOS:
+                        tiempos = []
+                        for _ in range(args.repeticiones):
+                            tiempos.extend(a_la_vez(puerto, ruta, usuarios))
+                        resultados[compartidos, ruta, usuarios] = (statistics.median(tiempos), max(tiempos))
+                conexion = http.client.HTTPConnection("127.0.0.1", puerto, timeout=30)
+                conexion.request("GET", "/metricas")
+                proporciones[compartidos] = json.loads(conexion.getresponse().read())["reportes_compartidos"]
+            finally:
+                proceso.terminate()
+                proceso.wait()
+
+        for ruta in rutas:
+            for usuarios in USUARIOS:
+                celdas = [f"{resultados[c, ruta, usuarios][0]:9.0f} / {resultados[c, ruta, usuarios][1]:6.0f} ms"
+                          for c in ("1", "0")]
+                print(f"{ruta.split('?')[0] + f', {usuarios} a la vez':<44}{celdas[0]:>30}{celdas[1]:>32}")
+        estado = proporciones["1"]
+        print(f"compartidos: {estado['peticiones']} peticiones, {estado['calculos']} cálculos "
+              f"({estado['proporcion']} peticiones por cálculo)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark del resumen de la vista de inicio (/dashboard/resumen)
+
+Sobre una base de datos temporal con N suscriptores, doce pagos (con su
+ingreso) por suscriptor y N gastos, compara a través de la aplicación completa
+(TestClient):
+  - la carga anterior del inicio: /balance, /ingresos, /gastos y /suscriptores
+  - /dashboard/resumen sin resumen guardado, con las consultas en paralelo sobre
+    el pool y seguidas en una transacción (con un solo núcleo se usa la segunda)
+  - /dashboard/resumen con el resumen guardado (sin commits desde el cálculo)
+
+Uso:
+    python SistemaGestion_Portable/benchmarks/bench_resumen_panel.py [--filas N] [--repeticiones N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+
+def poblar(conn, filas):
+    conn.executemany(
+        "INSERT INTO suscriptores (id, numero_contrato, cedula, nombre_completo, email, fecha_suscripcion) VALUES (?, ?, ?, ?, ?, ?)",
+        ((i, f"C-{i:07d}", f"{10000000 + i}", f"Suscriptor {i:07d}", f"s{i}@correo.com", "2020-01-01")
+         for i in range(1, filas + 1)))
+    # Los últimos doce meses; uno de cada diez suscriptores no pagó el mes anterior (en mora)
+    hoy = date.today()
+    meses = [((hoy.year * 12 + hoy.month - 1 - k) // 12, (hoy.year * 12 + hoy.month - 1 - k) % 12 + 1) for k in range(12)]
+    pagos = [(i * 12 + k + 1, i + 1, mes, anio, f"{anio}-{mes:02d}-{i % 28 + 1:02d}")
+             for i in range(filas) for k, (anio, mes) in enumerate(meses) if k != 1 or i % 10]
+    conn.executemany("INSERT INTO pagos (id, suscriptor_id, mes, anio, fecha_pago, valor, tipo_pago) "
+                     "VALUES (?, ?, ?, ?, ?, 20000, 'efectivo')", pagos)
+    conn.executemany("INSERT INTO ingresos (pago_id, monto, fecha) VALUES (?, 20000, ?)",
+                     ((pago[0], pago[4]) for pago in pagos))
+    conn.executemany(
+        "INSERT INTO gastos (tipo_gasto, descripcion, valor, fecha) VALUES ('servicio', ?, ?, ?)",
+        ((f"gasto {i}", 1000 + i % 9000, f"{meses[i % 12][0]}-{meses[i % 12][1]:02d}-{i % 28 + 1:02d}")
+         for i in range(filas)))
+    conn.commit()
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), max(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=100000)
+    parser.add_argument("--repeticiones", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["SISTEMA_DB_PATH"] = os.path.join(tmp, "bench.db")
+        sys.path.insert(0, APP_DIR)
+        import database_simple
+        from fastapi.testclient import TestClient
+        import main_simple_fixed
+        from resumen_panel import resumen_panel
+
+        database_simple.init_database()
+        conn = database_simple.get_connection()
+        poblar(conn, args.filas)
+        conn.execute("ANALYZE")
+        conn.close()
+
+        with TestClient(main_simple_fixed.app) as cliente:
+            def carga_anterior():
+                for ruta in ("/balance/", "/ingresos/", "/gastos/", "/suscriptores/?limit=100"):
+                    assert cliente.get(ruta).status_code == 200
+
+            def sin_guardar(paralelo):
+                resumen_panel.paralelo = paralelo
+                resumen_panel._guardado = None
+                assert cliente.get("/dashboard/resumen").status_code == 200
+
+            casos = [
+                ("carga anterior (4 peticiones)", carga_anterior),
+                ("resumen, consultas en paralelo", lambda: sin_guardar(True)),
+                ("resumen, una transacción", lambda: sin_guardar(False)),
+                ("resumen guardado", lambda: cliente.get("/dashboard/resumen")),
+            ]
+            print(f"{os.cpu_count()} núcleos; {args.filas} suscriptores, {args.filas * 12 - args.filas // 10} pagos e ingresos, {args.filas} gastos")
+            print(f"{'':<34}{'mediana':>10}{'máx':>12}")
+            for nombre, funcion in casos:
+                mediana, maximo = medir(funcion, args.repeticiones)
+                print(f"{nombre:<34}{mediana:8.1f} ms{maximo:10.1f} ms")
+            resumen = cliente.get("/dashboard/resumen").json()
+            print(f"en mora: {resumen['conteos']['en_mora']}; {resumen_panel.estado()}")
+
+
+if __name__ == "__main__":
+    main()
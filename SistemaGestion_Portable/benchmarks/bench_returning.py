@@ -0,0 +1,72 @@
+"""
+Microbenchmark de escrituras: INSERT/UPDATE ... RETURNING frente a escritura + SELECT
+
+Mide sobre una base de datos temporal, por operación y con commit, lo que
+hacen crear_gasto (INSERT) y actualizar_suscriptor (UPDATE) con cada una de
+las dos variantes de database_simple.insertar_y_leer / actualizar_y_leer.
+
+Uso:
+    python SistemaGestion_Portable/benchmarks/bench_returning.py [--operaciones N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+
+def medir(conn, operacion, cantidad):
+    tiempos = []
+    for n in range(cantidad):
+        inicio = time.perf_counter()
+        operacion(conn, n)
+        conn.commit()
+        tiempos.append((time.perf_counter() - inicio) * 1e6)
+    tiempos.sort()
+    return statistics.mean(tiempos), tiempos[len(tiempos) // 2], tiempos[int(len(tiempos) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operaciones", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["SISTEMA_DB_PATH"] = os.path.join(tmp, "bench.db")
+        sys.path.insert(0, APP_DIR)
+        import database_simple
+
+        if not database_simple.SOPORTA_RETURNING:
+            print(f"SQLite {database_simple.sqlite3.sqlite_version} no soporta RETURNING; solo se mide la alternativa")
+        database_simple.init_database()
+        conn = database_simple.get_connection()
+        conn.execute("INSERT INTO suscriptores (id, numero_contrato, cedula, nombre_completo, fecha_suscripcion) "
+                     "VALUES (1, 'C-1', '1', 'Suscriptor', '2024-01-01')")
+        conn.commit()
+
+        def insertar(conn, n):
+            database_simple.insertar_y_leer(conn.cursor(), 'gastos', '''
+                INSERT INTO gastos (tipo_gasto, descripcion, valor, fecha) VALUES (?, ?, ?, ?)
+            ''', ('servicios', f'gasto {n}', 1000 + n, '2024-01-01'))
+
+        def actualizar(conn, n):
+            database_simple.actualizar_y_leer(conn.cursor(), 'suscriptores',
+                                              'UPDATE suscriptores SET nombre_completo = ? WHERE id = ?',
+                                              (f'Suscriptor {n}', 1), 1)
+
+        variantes = [True, False] if database_simple.SOPORTA_RETURNING else [False]
+        print(f"{'operación':<12}{'variante':<18}{'promedio µs':>12}{'p50 µs':>10}{'p99 µs':>10}")
+        for nombre, operacion in (("INSERT", insertar), ("UPDATE", actualizar)):
+            for returning in variantes:
+                database_simple.SOPORTA_RETURNING = returning
+                promedio, p50, p99 = medir(conn, operacion, args.operaciones)
+                variante = "RETURNING" if returning else "escritura+SELECT"
+                print(f"{nombre:<12}{variante:<18}{promedio:>12.1f}{p50:>10.1f}{p99:>10.1f}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark del autocompletado de suscriptores
+
+Sobre una base de datos temporal con N suscriptores compara, para prefijos de
+1 a 6 caracteres tomados de nombres, cédulas y contratos reales:
+  - IndiceSuscriptores.buscar (índice en memoria de /suscriptores/typeahead)
+  - la consulta de /suscriptores/buscar (cuatro LIKE '%texto%')
+Informa p50 y p99 de cada uno, el tiempo de carga del índice y la memoria
+que ocupa, y el costo de actualizarlo con una edición.
+
+Uso:
+    python SistemaGestion_Portable/benchmarks/bench_typeahead.py [--filas N] [--consultas N]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+NOMBRES = ["José", "María", "Juan", "Ana", "Luis", "Carmen", "Pedro", "Lucía", "Jorge", "Sofía", "Andrés", "Valentina"]
+APELLIDOS = ["Pérez", "Gómez", "Rodríguez", "López", "Martínez", "García", "Hernández", "Díaz", "Torres", "Ramírez",
+             "Vargas", "Castillo", "Muñoz", "Rojas", "Ortiz", "Suárez"]
+
+CONSULTA_LIKE = '''
+    SELECT * FROM suscriptores
+    WHERE eliminado_en IS NULL AND (nombre_completo LIKE ? OR cedula LIKE ? OR email LIKE ? OR numero_contrato LIKE ?)
+    ORDER BY nombre_completo LIMIT 50
+'''
+
+def poblar(conn, filas, azar):
+    conn.executemany(
+        "INSERT INTO suscriptores (id, numero_contrato, cedula, nombre_completo, email, fecha_suscripcion) VALUES (?, ?, ?, ?, ?, ?)",
+        ((i, f"C-{i:07d}", f"{10**7 + (i * 7919) % 10**8}",
+          f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)} {azar.choice(APELLIDOS)}", f"s{i}@correo.com", "2024-01-01")
+         for i in range(1, filas + 1)))
+    conn.commit()
+
+def percentiles(tiempos):
+    tiempos = sorted(tiempos)
+    return tiempos[len(tiempos) // 2], tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.99))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=100000)
+    parser.add_argument("--consultas", type=int, default=2000)
+    args = parser.parse_args()
+    azar = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["SISTEMA_DB_PATH"] = os.path.join(tmp, "bench.db")
+        sys.path.insert(0, APP_DIR)
+        import database_simple
+        from indice_suscriptores import IndiceSuscriptores
+
+        database_simple.init_database()
+        conn = database_simple.get_connection()
+        poblar(conn, args.filas, azar)
+
+        indice = IndiceSuscriptores()
+        inicio = time.perf_counter()
+        indice.cargar()
+        carga_ms = (time.perf_counter() - inicio) * 1000
+        # La memoria se mide con una segunda carga: tracemalloc vuelve lenta la primera
+        tracemalloc.start()
+        copia = IndiceSuscriptores()
+        copia.cargar()
+        memoria = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del copia
+
+        muestra = conn.execute("SELECT nombre_completo, cedula, numero_contrato FROM suscriptores ORDER BY random() LIMIT ?",
+                               (args.consultas,)).fetchall()
+        consultas = []
+        for fila in muestra:
+            texto = azar.choice(fila)
+            consultas.append(texto[:azar.randint(1, 6)])
+        # Nombre y apellido a medio escribir, como en la caja de búsqueda
+        consultas += [" ".join(p[:3] for p in fila['nombre_completo'].split()[:2]) for fila in muestra[:args.consultas // 4]]
+
+        tiempos_indice = []
+        for texto in consultas:
+            t = time.perf_counter()
+            indice.buscar(texto)
+            tiempos_indice.append((time.perf_counter() - t) * 1000)
+        tiempos_like = []
+        for texto in consultas[:200]:
+            t = time.perf_counter()
+            conn.execute(CONSULTA_LIKE, (f'%{texto}%',) * 4).fetchall()
+            tiempos_like.append((time.perf_counter() - t) * 1000)
+
+        ediciones = []
+        for suscriptor_id in azar.sample(range(1, args.filas + 1), 200):
+            fila = {'id': suscriptor_id, 'nombre_completo': f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)}",
+                    'numero_contrato': f"C-{suscriptor_id:07d}", 'cedula': str(suscriptor_id)}
+            t = time.perf_counter()
+            indice.actualizar(fila)
+            ediciones.append((time.perf_counter() - t) * 1000)
+        conn.close()
+
+        print(f"{args.filas} suscriptores; índice cargado en {carga_ms:.0f} ms, {memoria / 1024 / 1024:.1f} MB, "
+              f"{indice.estado()['claves']} claves")
+        print(f"{'':<34}{'p50':>10}{'p99':>10}")
+        for nombre, tiempos in (("índice en memoria", tiempos_indice), ("LIKE '%texto%' (/buscar)", tiempos_like),
+                                ("actualizar tras una edición", ediciones)):
+            p50, p99 = percentiles(tiempos)
+            print(f"{nombre:<34}{p50:8.3f} ms{p99:8.3f} ms")
+
+if __name__ == "__main__":
+    main()
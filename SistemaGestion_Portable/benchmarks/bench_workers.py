@@ -0,0 +1,155 @@
+"""
+Benchmark de rendimiento del servidor con 1, 2 y 4 workers
+
+Genera una base de datos temporal con datos sintéticos, lanza
+main_simple_fixed.py con --workers N y la somete a una mezcla de lecturas
+(listados y reportes) y escrituras (gastos) desde varios procesos cliente.
+
+Uso:
+    python SistemaGestion_Portable/benchmarks/bench_workers.py [--duracion S] [--clientes N] [--workers 1,2,4]
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+LECTURAS = [
+    "/suscriptores/?limit=100",
+    "/pagos/?limit=100",
+    "/balance/",
+    "/balance/detallado?fecha_inicio=2024-01-01",
+    "/balance/mensual?anio=2024",
+]
+PROPORCION_ESCRITURAS = 0.1
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def poblar(db_path, suscriptores, meses):
+    """Crear el esquema y cargar datos sintéticos"""
+    env = dict(os.environ, SISTEMA_DB_PATH=db_path)
+    subprocess.run([sys.executable, "-c", "import database_simple; database_simple.init_database()"],
+                   cwd=APP_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO suscriptores (numero_contrato, cedula, nombre_completo, email, fecha_suscripcion) VALUES (?, ?, ?, ?, ?)",
+        ((f"C-{i:06d}", f"{1000000 + i}", f"Suscriptor {i:06d}", f"s{i}@correo.com", "2024-01-01")
+         for i in range(suscriptores)))
+    conn.executemany(
+        "INSERT INTO pagos (suscriptor_id, mes, anio, fecha_pago, valor, tipo_pago) VALUES (?, ?, 2024, ?, 20000, 'efectivo')",
+        ((s, m, f"2024-{m:02d}-10") for s in range(1, suscriptores + 1) for m in range(1, meses + 1)))
+    conn.execute("INSERT INTO ingresos (pago_id, monto, fecha) SELECT id, valor, fecha_pago FROM pagos")
+    conn.commit()
+    conn.close()
+
+
+def cliente(puerto, duracion, semilla, resultados):
+    rnd = random.Random(semilla)
+    conexion = http.client.HTTPConnection("127.0.0.1", puerto, timeout=30)
+    latencias = []
+    errores = 0
+    fin = time.perf_counter() + duracion
+    while time.perf_counter() < fin:
+        inicio = time.perf_counter()
+        try:
+            if rnd.random() < PROPORCION_ESCRITURAS:
+                cuerpo = json.dumps({"tipo_gasto": "compra", "descripcion": "bench", "valor": 10, "fecha": "2024-05-01"})
+                conexion.request("POST", "/gastos/", cuerpo, {"Content-Type": "application/json"})
+            else:
+                conexion.request("GET", rnd.choice(LECTURAS))
+            respuesta = conexion.getresponse()
+            respuesta.read()
+            if respuesta.status >= 400:
+                errores += 1
+        except (OSError, http.client.HTTPException):
+            errores += 1
+            conexion.close()
+            conexion = http.client.HTTPConnection("127.0.0.1", puerto, timeout=30)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    resultados.put((latencias, errores))
+
+
+def esperar_health(puerto, proceso, timeout=30):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError("El servidor terminó antes de responder")
+        try:
+            conexion = http.client.HTTPConnection("127.0.0.1", puerto, timeout=1)
+            conexion.request("GET", "/health")
+            if conexion.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("El servidor no respondió a tiempo")
+
+
+def medir(db_path, workers, clientes, duracion):
+    puerto = puerto_libre()
+    env = dict(os.environ, SISTEMA_DB_PATH=db_path)
+    proceso = subprocess.Popen(
+        [sys.executable, os.path.join(APP_DIR, "main_simple_fixed.py"), "--rapido", "--sin-navegador",
+         "--puerto", str(puerto), "--workers", str(workers)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        esperar_health(puerto, proceso)
+        time.sleep(0.5 * workers)  # dar tiempo a que todos los workers arranquen
+        resultados = multiprocessing.Queue()
+        procesos = [multiprocessing.Process(target=cliente, args=(puerto, duracion, i, resultados))
+                    for i in range(clientes)]
+        for p in procesos:
+            p.start()
+        latencias, errores = [], 0
+        for _ in procesos:
+            l, e = resultados.get()
+            latencias.extend(l)
+            errores += e
+        for p in procesos:
+            p.join()
+    finally:
+        proceso.terminate()
+        proceso.wait()
+    latencias.sort()
+    return {
+        "peticiones_s": len(latencias) / duracion,
+        "p50": statistics.median(latencias),
+        "p95": latencias[int(len(latencias) * 0.95)],
+        "errores": errores,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duracion", type=float, default=10.0)
+    parser.add_argument("--clientes", type=int, default=8)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--suscriptores", type=int, default=2000)
+    parser.add_argument("--meses", type=int, default=12)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        poblar(db_path, args.suscriptores, args.meses)
+        print(f"{'workers':>8} {'pet/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'errores':>8}")
+        for workers in (int(w) for w in args.workers.split(",")):
+            r = medir(db_path, workers, args.clientes, args.duracion)
+            print(f"{workers:>8} {r['peticiones_s']:>10.1f} {r['p50']:>10.2f} {r['p95']:>10.2f} {r['errores']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Configuración común de las pruebas
+Los módulos de la aplicación leen SISTEMA_DB_PATH y SISTEMA_RESPALDOS_DIR al
+importarse, así que se fijan aquí, antes de cualquier import, a una base de
+datos nueva en un directorio temporal. La base real nunca se toca.
+
+Uso:
+    python -m pytest -q SistemaGestion_Portable/tests
+"""
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+_TMP = tempfile.TemporaryDirectory(prefix="sistema-pruebas-")
+os.environ["SISTEMA_DB_PATH"] = os.path.join(_TMP.name, "pruebas.db")
+os.environ["SISTEMA_RESPALDOS_DIR"] = os.path.join(_TMP.name, "respaldos")
+sys.path.insert(0, APP_DIR)
+
+import database_simple  # noqa: E402
+
+database_simple.init_database()
+
+_numeros = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def cliente():
+    """Cliente HTTP de la aplicación con su ciclo de vida (planificador, índice, eventos)"""
+    from fastapi.testclient import TestClient
+    import main_simple_fixed
+
+    with TestClient(main_simple_fixed.app) as cliente:
+        yield cliente
+
+
+@pytest.fixture
+def nuevo_suscriptor(cliente):
+    """Crear un suscriptor con contrato, cédula y email únicos; devuelve la respuesta JSON"""
+    def crear(**campos):
+        numero = next(_numeros)
+        datos = {"numero_contrato": f"PR-{numero:05d}", "cedula": f"9{numero:07d}",
+                 "nombre_completo": f"Suscriptor Prueba {numero}", "email": f"prueba{numero}@correo.com",
+                 "fecha_suscripcion": "2024-01-01"}
+        datos.update(campos)
+        respuesta = cliente.post("/suscriptores/", json=datos)
+        assert respuesta.status_code == 201, respuesta.text
+        return respuesta.json()
+    return crear
+
+
+@pytest.fixture
+def datos_pago():
+    """Cuerpo de un pago en efectivo para POST /pagos/ o /pagos/batch"""
+    def datos(suscriptor_id, mes=1, anio=2030):
+        return {"suscriptor_id": suscriptor_id, "mes": mes, "anio": anio, "fecha_pago": f"{anio}-01-10",
+                "valor": 20000, "tipo_pago": "efectivo"}
+    return datos
+
+
+@pytest.fixture
+def conexion():
+    conn = database_simple.get_connection()
+    yield conn
+    conn.close()
@@ -0,0 +1,35 @@
+"""
+POST /batch: varias consultas GET en una petición
+"""
+import multiplexor
+
+
+def test_subpeticiones_en_orden_con_su_estado(cliente, nuevo_suscriptor):
+    suscriptor = nuevo_suscriptor()
+
+    respuesta = cliente.post("/batch", json=[{"id": "uno", "url": f"/suscriptores/{suscriptor['id']}"},
+                                             {"url": "/suscriptores/999999999"},
+                                             {"url": "/pagos/?limit=1"}])
+
+    assert respuesta.status_code == 200
+    resultados = respuesta.json()["resultados"]
+    assert [r["id"] for r in resultados] == ["uno", "1", "2"]
+    assert [r["estado"] for r in resultados] == [200, 404, 200]
+    assert resultados[0]["cuerpo"]["numero_contrato"] == suscriptor["numero_contrato"]
+    assert resultados[0]["cabeceras"]["etag"] == '"1"'
+
+
+def test_rutas_excluidas_aunque_vengan_codificadas(cliente):
+    urls = ["/eventos", "/%65ventos", "/eventos/", "/batch", "/%62atch", "http://otro.host/pagos/", "pagos/"]
+
+    resultados = cliente.post("/batch", json=[{"url": url} for url in urls]).json()["resultados"]
+
+    # Se rechazan de inmediato: /eventos no termina nunca y esperaría hasta el 504
+    assert [r["estado"] for r in resultados] == [400] * len(urls)
+    assert all(r["duracion_ms"] < multiplexor.TIMEOUT * 1000 / 2 for r in resultados)
+
+
+def test_lote_vacio_o_demasiado_grande(cliente):
+    assert cliente.post("/batch", json=[]).status_code == 400
+    demasiadas = [{"url": "/health"}] * (multiplexor.MAX_SUBPETICIONES + 1)
+    assert cliente.post("/batch", json=demasiadas).status_code == 413
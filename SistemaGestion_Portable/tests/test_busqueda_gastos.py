@@ -0,0 +1,79 @@
+"""
+Búsqueda de gastos por texto: prefijos, relevancia, fragmentos, filtros y respaldo con LIKE
+"""
+import pytest
+
+import busqueda_gastos
+
+
+@pytest.fixture
+def nuevo_gasto(cliente):
+    def crear(descripcion, lugar_compra=None, motivo=None, tipo_gasto="papeleria", fecha="2030-03-15"):
+        respuesta = cliente.post("/gastos/", json={"tipo_gasto": tipo_gasto, "valor": 1000, "descripcion": descripcion,
+                                                   "fecha": fecha, "lugar_compra": lugar_compra, "motivo": motivo})
+        assert respuesta.status_code == 201, respuesta.text
+        return respuesta.json()
+    return crear
+
+
+def buscar(cliente, **params):
+    respuesta = cliente.get("/gastos/buscar", params=params)
+    assert respuesta.status_code == 200, respuesta.text
+    return respuesta.json()
+
+
+@pytest.mark.skipif(not busqueda_gastos.SOPORTA_FTS5, reason="SQLite sin FTS5")
+def test_prefijos_ordenados_por_relevancia_con_fragmento(cliente, nuevo_gasto):
+    en_lugar = nuevo_gasto("Compra mensual", lugar_compra="Ferretería Carbonell")
+    en_descripcion = nuevo_gasto("Cartuchos <tinta> para la impresora Carbonell")
+
+    resultados = buscar(cliente, q="carbon")
+
+    assert [g["id"] for g in resultados][:2] == [en_descripcion["id"], en_lugar["id"]]
+    assert resultados[0]["relevancia"] > resultados[1]["relevancia"]
+    # El texto se escapa y solo las coincidencias llevan marcas
+    assert "&lt;tinta&gt;" in resultados[0]["fragmento"]
+    assert "<mark>Carbonell</mark>" in resultados[0]["fragmento"]
+
+
+def test_operadores_escritos_se_buscan_como_texto(cliente, nuevo_gasto):
+    nuevo_gasto("Arreglo de la cerradura NEAR la entrada")
+
+    for texto in ('"', "NEAR(", "cerradura OR", "-entrada *", "AND"):
+        buscar(cliente, q=texto)
+    assert buscar(cliente, q="cerradura NEAR")[0]["descripcion"] == "Arreglo de la cerradura NEAR la entrada"
+
+
+def test_filtros_por_tipo_y_fechas(cliente, nuevo_gasto):
+    marzo = nuevo_gasto("Resmas de papel Albarracín", tipo_gasto="papeleria", fecha="2030-03-01")
+    abril = nuevo_gasto("Resmas de papel Albarracín", tipo_gasto="papeleria", fecha="2030-04-01")
+    otro_tipo = nuevo_gasto("Resmas de papel Albarracín", tipo_gasto="oficina", fecha="2030-03-01")
+
+    resultados = buscar(cliente, q="albarracin", tipo_gasto="papeleria", fecha_inicio="2030-03-01",
+                        fecha_fin="2030-03-31")
+
+    assert [g["id"] for g in resultados] == [marzo["id"]]
+    assert abril["id"] in [g["id"] for g in buscar(cliente, q="albarracin")]
+    assert otro_tipo["id"] in [g["id"] for g in buscar(cliente, q="albarracin", tipo_gasto="oficina")]
+
+
+def test_gasto_eliminado_sale_del_indice(cliente, nuevo_gasto):
+    gasto = nuevo_gasto("Termo para la sala Echeverría")
+    assert [g["id"] for g in buscar(cliente, q="echeverria")] == [gasto["id"]]
+
+    assert cliente.delete(f"/gastos/{gasto['id']}").status_code == 200
+
+    assert buscar(cliente, q="echeverria") == []
+
+
+def test_sin_fts5_se_busca_con_like(cliente, nuevo_gasto, monkeypatch):
+    gastos = [nuevo_gasto("Pintura para la fachada", lugar_compra="Pinturerías Goicoechea"),
+              nuevo_gasto("Brochas", motivo="Fachada Goicoechea")]
+    esperados = sorted(g["id"] for g in gastos)
+    assert sorted(g["id"] for g in buscar(cliente, q="goicoechea")) == esperados
+
+    monkeypatch.setattr(busqueda_gastos, "SOPORTA_FTS5", False)
+
+    resultados = buscar(cliente, q="goicoechea")
+    assert sorted(g["id"] for g in resultados) == esperados
+    assert all(g["relevancia"] == 0.0 for g in resultados)
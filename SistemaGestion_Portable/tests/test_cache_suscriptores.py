@@ -0,0 +1,41 @@
+"""
+Caché de suscriptores: solo para lecturas, nunca para validar escrituras
+"""
+
+
+def estado_cache(cliente):
+    return cliente.get("/metricas").json()["caches"]["suscriptores"]
+
+
+def test_pago_a_suscriptor_eliminado_por_otro_proceso(cliente, nuevo_suscriptor, datos_pago, conexion):
+    suscriptor = nuevo_suscriptor()
+    assert cliente.get(f"/pagos/suscriptor/{suscriptor['id']}").status_code == 200
+
+    # Otro proceso lo elimina: la caché de este todavía lo tiene
+    conexion.execute("UPDATE suscriptores SET eliminado_en = CURRENT_TIMESTAMP WHERE id = ?", (suscriptor["id"],))
+    conexion.commit()
+
+    respuesta = cliente.post("/pagos/", json=datos_pago(suscriptor["id"]))
+
+    assert respuesta.status_code == 404
+    assert conexion.execute("SELECT COUNT(*) FROM pagos WHERE suscriptor_id = ?",
+                            (suscriptor["id"],)).fetchone()[0] == 0
+
+
+def test_altas_no_cuentan_fallos_de_cache(cliente, nuevo_suscriptor):
+    antes = estado_cache(cliente)
+    nuevo_suscriptor()
+    nuevo_suscriptor()
+    assert estado_cache(cliente)["fallos"] == antes["fallos"]
+
+
+def test_consultas_repetidas_son_aciertos(cliente, nuevo_suscriptor):
+    suscriptor = nuevo_suscriptor()
+    antes = estado_cache(cliente)
+
+    for _ in range(3):
+        assert cliente.get(f"/recibos/suscriptor/{suscriptor['id']}").status_code == 200
+
+    despues = estado_cache(cliente)
+    assert despues["fallos"] == antes["fallos"] + 1
+    assert despues["aciertos"] == antes["aciertos"] + 2
@@ -0,0 +1,35 @@
+"""
+Proyección de los listados con ?fields=
+"""
+
+
+def test_solo_los_campos_pedidos_y_siempre_el_id(cliente, nuevo_suscriptor):
+    suscriptor = nuevo_suscriptor()
+
+    respuesta = cliente.get("/suscriptores/", params={"fields": "nombre_completo, cedula", "orden": "id",
+                                                      "desde_id": suscriptor["id"] - 1, "contar": "true"})
+
+    assert respuesta.status_code == 200
+    assert respuesta.json()[0] == {"id": suscriptor["id"], "nombre_completo": suscriptor["nombre_completo"],
+                                   "cedula": suscriptor["cedula"]}
+    # Las cabeceras de la página se conservan en la respuesta parcial
+    assert int(respuesta.headers["X-Total-Count"]) >= 1
+
+
+def test_campos_de_pagos_coinciden_con_el_listado_completo(cliente, nuevo_suscriptor, datos_pago):
+    suscriptor = nuevo_suscriptor()
+    cliente.post("/pagos/", json=datos_pago(suscriptor["id"], mes=5))
+    params = {"suscriptor_id": suscriptor["id"]}
+
+    completo = cliente.get("/pagos/", params=params).json()
+    parcial = cliente.get("/pagos/", params={**params, "fields": "valor,fecha_pago,valor"}).json()
+
+    assert parcial == [{"id": p["id"], "valor": p["valor"], "fecha_pago": p["fecha_pago"]} for p in completo]
+
+
+def test_campo_desconocido_devuelve_400(cliente):
+    for fields in ("nombre_completo,clave", "id;DROP TABLE suscriptores", "*"):
+        respuesta = cliente.get("/suscriptores/", params={"fields": fields})
+        assert respuesta.status_code == 400
+        assert "opciones" in respuesta.json()["detail"]
+    assert cliente.get("/pagos/", params={"fields": "nombre_completo"}).status_code == 400
@@ -0,0 +1,26 @@
+"""
+Esquema: arranque rápido por huella y arranque normal idempotente
+"""
+import database_simple
+
+
+def indices(conexion):
+    return {fila[0] for fila in conexion.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")}
+
+
+def test_arranque_rapido_con_huella_vigente_no_hace_nada(conexion):
+    assert database_simple.esquema_vigente(conexion)
+    assert not database_simple.init_database(rapido=True)
+
+
+def test_arranque_normal_repara_un_indice_faltante(conexion):
+    antes = indices(conexion)
+    conexion.execute("DROP INDEX idx_pagos_suscriptor")
+    conexion.commit()
+
+    # La huella coincide: el arranque rápido no lo nota, el normal sí
+    assert not database_simple.init_database(rapido=True)
+    assert "idx_pagos_suscriptor" not in indices(conexion)
+    database_simple.init_database()
+    assert indices(conexion) == antes
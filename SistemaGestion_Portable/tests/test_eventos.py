@@ -0,0 +1,122 @@
+"""
+Eventos en vivo: reparto de cambios, recuperación con Last-Event-ID y cierre de los flujos
+"""
+import asyncio
+import json
+
+import main_simple_fixed
+from eventos import Difusor
+
+
+def leer(evento):
+    """(tipo, datos) de un evento ya codificado"""
+    lineas = dict(linea.split(": ", 1) for linea in evento.decode("utf-8").strip().split("\n"))
+    return lineas["event"], json.loads(lineas["data"])
+
+
+async def esperar_evento(cliente_eventos, tipo):
+    while True:
+        evento = await asyncio.wait_for(cliente_eventos.cola.get(), 5)
+        assert evento is not None
+        if leer(evento)[0] == tipo:
+            return leer(evento)[1]
+
+
+def test_pago_nuevo_llega_a_los_clientes(cliente, nuevo_suscriptor, datos_pago):
+    suscriptor = nuevo_suscriptor()
+
+    async def prueba():
+        difusor = Difusor(nombre="prueba", intervalo=0.05)
+        difusor.iniciar()
+        try:
+            uno, _ = await difusor.conectar()
+            dos, _ = await difusor.conectar()
+            pago = (await asyncio.to_thread(cliente.post, "/pagos/", json=datos_pago(suscriptor["id"], mes=2))).json()
+            assert (await esperar_evento(uno, "pago"))["id"] == pago["id"]
+            assert (await esperar_evento(dos, "pago"))["id"] == pago["id"]
+            assert isinstance(await esperar_evento(uno, "balance"), dict)
+        finally:
+            await difusor.detener()
+        return difusor.estado()
+
+    estado = asyncio.run(prueba())
+    assert estado["conexiones"] == 2
+    assert estado["clientes"] == 0
+
+
+def test_reconexion_con_last_event_id_recibe_lo_perdido(cliente, nuevo_suscriptor, datos_pago):
+    suscriptor = nuevo_suscriptor()
+
+    async def prueba():
+        difusor = Difusor(nombre="prueba", intervalo=0.05)
+        difusor.iniciar()
+        try:
+            primero, _ = await difusor.conectar()
+            ultimo_id = difusor.estado()["posicion"]
+            difusor._cerrar(primero)
+            # Mientras el cliente está desconectado se registran dos pagos y se elimina uno
+            pagos = [(await asyncio.to_thread(cliente.post, "/pagos/", json=datos_pago(suscriptor["id"], mes=mes))).json()
+                     for mes in (3, 4)]
+            await asyncio.to_thread(cliente.delete, f"/pagos/{pagos[1]['id']}")
+            await asyncio.sleep(0.3)
+
+            _, perdidos = await difusor.conectar(ultimo_id)
+        finally:
+            await difusor.detener()
+        return [leer(evento) for evento in perdidos], pagos
+
+    perdidos, (conservado, eliminado) = asyncio.run(prueba())
+    assert [datos["id"] for tipo, datos in perdidos if tipo == "pago"] == [conservado["id"]]
+    assert ("eliminado", {"tabla": "pagos", "id": eliminado["id"]}) in perdidos
+
+
+def test_cliente_lento_se_desconecta_sin_frenar_a_los_demas():
+    async def prueba():
+        difusor = Difusor(nombre="prueba", buffer=2)
+        difusor.iniciar()
+        try:
+            lento, _ = await difusor.conectar()
+            rapido, _ = await difusor.conectar()
+            for numero in range(3):
+                difusor._repartir([f"evento {numero}".encode()])
+                await rapido.cola.get()
+            return difusor.estado(), await lento.cola.get()
+        finally:
+            await difusor.detener()
+
+    estado, ultimo = asyncio.run(prueba())
+    assert estado["expulsados"] == 1
+    assert estado["clientes"] == 1
+    # La cola del lento se vacía y solo queda el cierre
+    assert ultimo is None
+
+
+def test_cerrar_todos_termina_los_flujos():
+    async def prueba():
+        difusor = Difusor(nombre="prueba")
+        difusor.iniciar()
+        try:
+            cliente_eventos, perdidos = await difusor.conectar()
+            flujo = difusor.flujo(cliente_eventos, perdidos)
+            assert await anext(flujo) == b"retry: 2000\n\n"
+            difusor.cerrar_todos()
+            return [parte async for parte in flujo], difusor.estado()["clientes"]
+        finally:
+            await difusor.detener()
+
+    assert asyncio.run(prueba()) == ([], 0)
+
+
+def test_solo_las_escrituras_de_datos_avisan(cliente, nuevo_suscriptor, datos_pago, monkeypatch):
+    avisos = []
+    monkeypatch.setattr(main_simple_fixed.difusor, "avisar", lambda: avisos.append(True))
+    suscriptor = nuevo_suscriptor()
+    assert len(avisos) == 1
+
+    # /batch solo consulta, y un pago rechazado no escribió nada
+    cliente.post("/batch", json=[{"url": f"/suscriptores/{suscriptor['id']}"}])
+    cliente.post("/pagos/", json=datos_pago(999999999))
+    assert len(avisos) == 1
+
+    cliente.post("/pagos/", json=datos_pago(suscriptor["id"], mes=4))
+    assert len(avisos) == 2
@@ -0,0 +1,73 @@
+"""
+Formato de las respuestas: negociación JSON / MessagePack y exportación de pagos en streaming
+"""
+import pytest
+
+import formatos
+
+MSGPACK = {"Accept": "application/msgpack"}
+
+
+def test_eleccion_segun_accept():
+    assert formatos.elegir(None) == formatos.JSON
+    assert formatos.elegir("*/*") == formatos.JSON
+    assert formatos.elegir("application/json, application/msgpack;q=0.5") == formatos.JSON
+    assert formatos.elegir("application/msgpack;q=abc, application/json;q=0.1") == formatos.JSON
+
+
+def test_sin_msgpack_instalado(cliente, monkeypatch):
+    monkeypatch.setattr(formatos, "_msgpack", lambda: None)
+
+    assert formatos.elegir("application/msgpack, application/json;q=0.5") == formatos.JSON
+    assert cliente.get("/suscriptores/", headers=MSGPACK).status_code == 406
+    respuesta = cliente.get("/suscriptores/", headers={"Accept": "application/x-msgpack, */*;q=0.1"})
+    assert respuesta.headers["content-type"].startswith(formatos.JSON)
+
+
+def test_listados_en_msgpack_iguales_a_json(cliente, nuevo_suscriptor, datos_pago):
+    msgpack = pytest.importorskip("msgpack")
+    assert formatos.elegir("application/x-msgpack, application/json") == formatos.MSGPACK
+    suscriptor = nuevo_suscriptor()
+    cliente.post("/pagos/", json=datos_pago(suscriptor["id"], mes=6))
+
+    for url, params in (("/suscriptores/", {"limit": 20}), ("/suscriptores/", {"fields": "cedula", "limit": 20}),
+                        ("/pagos/", {"suscriptor_id": suscriptor["id"]}), ("/gastos", {}),
+                        (f"/pagos/suscriptor/{suscriptor['id']}", {})):
+        json = cliente.get(url, params=params)
+        empaquetado = cliente.get(url, params=params, headers=MSGPACK)
+
+        assert empaquetado.headers["content-type"] == formatos.MSGPACK
+        assert "Accept" in empaquetado.headers["Vary"]
+        assert msgpack.unpackb(empaquetado.content) == json.json(), url
+
+
+def test_exportacion_completa_y_retomable(cliente, nuevo_suscriptor, datos_pago):
+    suscriptor = nuevo_suscriptor()
+    pagos = [cliente.post("/pagos/", json=datos_pago(suscriptor["id"], mes=mes)).json() for mes in (7, 8, 9)]
+    params = {"suscriptor_id": suscriptor["id"], "fields": "mes"}
+
+    exportados = cliente.get("/pagos/exportar", params=params)
+
+    assert exportados.headers["X-Total-Count"] == "3"
+    assert exportados.json() == [{"id": p["id"], "mes": p["mes"]} for p in pagos]
+    # Una exportación cortada se retoma desde el último id recibido
+    resto = cliente.get("/pagos/exportar", params={**params, "desde_id": pagos[0]["id"]})
+    assert resto.json() == exportados.json()[1:]
+    assert cliente.get("/pagos/exportar", params={**params, "desde_id": pagos[-1]["id"]}).json() == []
+
+
+def test_exportacion_en_msgpack(cliente, nuevo_suscriptor, datos_pago):
+    msgpack = pytest.importorskip("msgpack")
+    suscriptor = nuevo_suscriptor()
+    for mes in (10, 11):
+        cliente.post("/pagos/", json=datos_pago(suscriptor["id"], mes=mes))
+    params = {"suscriptor_id": suscriptor["id"]}
+
+    empaquetado = cliente.get("/pagos/exportar", params=params, headers=MSGPACK)
+
+    # El arreglo se puede leer fila a fila, como hace un cliente con historiales grandes
+    lector = msgpack.Unpacker()
+    lector.feed(empaquetado.content)
+    total = lector.read_array_header()
+    assert total == int(empaquetado.headers["X-Total-Count"]) == 2
+    assert [lector.unpack() for _ in range(total)] == cliente.get("/pagos/exportar", params=params).json()
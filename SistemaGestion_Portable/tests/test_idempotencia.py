@@ -0,0 +1,88 @@
+"""
+Idempotency-Key en POST /pagos/: reintentos sin pagos duplicados
+"""
+import database_simple
+
+
+def numeros_recibo(conexion, pago_ids):
+    return [fila[0] for fila in conexion.execute(
+        f"SELECT numero_recibo FROM recibos WHERE pago_id IN ({','.join('?' * len(pago_ids))}) ORDER BY pago_id",
+        pago_ids)]
+
+
+def test_reintento_con_la_misma_clave_repite_la_respuesta(cliente, nuevo_suscriptor, datos_pago, conexion):
+    suscriptor = nuevo_suscriptor()
+    cabeceras = {"Idempotency-Key": f"pago-{suscriptor['id']}"}
+
+    primera = cliente.post("/pagos/", json=datos_pago(suscriptor["id"]), headers=cabeceras)
+    segunda = cliente.post("/pagos/", json=datos_pago(suscriptor["id"]), headers=cabeceras)
+
+    assert primera.status_code == 201
+    assert segunda.status_code == 201
+    assert segunda.headers["Idempotent-Replayed"] == "true"
+    assert segunda.json() == primera.json()
+    assert conexion.execute("SELECT COUNT(*) FROM pagos WHERE suscriptor_id = ?",
+                            (suscriptor["id"],)).fetchone()[0] == 1
+
+
+def test_misma_clave_con_otro_cuerpo_es_rechazada(cliente, nuevo_suscriptor, datos_pago):
+    suscriptor = nuevo_suscriptor()
+    cabeceras = {"Idempotency-Key": f"pago-distinto-{suscriptor['id']}"}
+
+    assert cliente.post("/pagos/", json=datos_pago(suscriptor["id"], mes=1), headers=cabeceras).status_code == 201
+    assert cliente.post("/pagos/", json=datos_pago(suscriptor["id"], mes=2), headers=cabeceras).status_code == 422
+
+
+def test_fallo_del_recibo_no_deja_el_pago_y_el_reintento_lo_registra(cliente, nuevo_suscriptor, datos_pago, conexion, monkeypatch):
+    suscriptor = nuevo_suscriptor()
+    cabeceras = {"Idempotency-Key": f"pago-fallido-{suscriptor['id']}"}
+
+    def falla(*args):
+        raise RuntimeError("disco lleno")
+
+    with monkeypatch.context() as parche:
+        parche.setattr(database_simple, "_insertar_recibo_e_ingreso", falla)
+        fallida = cliente.post("/pagos/", json=datos_pago(suscriptor["id"]), headers=cabeceras)
+    assert fallida.status_code == 500
+    assert conexion.execute("SELECT COUNT(*) FROM pagos WHERE suscriptor_id = ?",
+                            (suscriptor["id"],)).fetchone()[0] == 0
+
+    reintento = cliente.post("/pagos/", json=datos_pago(suscriptor["id"]), headers=cabeceras)
+    assert reintento.status_code == 201
+    assert "Idempotent-Replayed" not in reintento.headers
+    assert len(numeros_recibo(conexion, [reintento.json()["id"]])) == 1
+
+
+def test_respuesta_guardada_en_la_transaccion_del_pago(cliente, nuevo_suscriptor, datos_pago, conexion, monkeypatch):
+    import idempotencia
+
+    suscriptor = nuevo_suscriptor()
+    cabeceras = {"Idempotency-Key": f"pago-atomico-{suscriptor['id']}"}
+
+    def falla(*args):
+        raise RuntimeError("no se pudo guardar la respuesta")
+
+    # Si no se puede guardar la respuesta, el pago tampoco queda: un reintento no lo duplica
+    with monkeypatch.context() as parche:
+        parche.setattr(idempotencia, "completar", falla)
+        assert cliente.post("/pagos/", json=datos_pago(suscriptor["id"]), headers=cabeceras).status_code == 500
+    assert conexion.execute("SELECT COUNT(*) FROM pagos WHERE suscriptor_id = ?",
+                            (suscriptor["id"],)).fetchone()[0] == 0
+
+    respuesta = cliente.post("/pagos/", json=datos_pago(suscriptor["id"]), headers=cabeceras)
+    assert respuesta.status_code == 201
+    guardada = conexion.execute("SELECT estado FROM idempotencia WHERE clave = ?", (cabeceras["Idempotency-Key"],)).fetchone()
+    assert guardada["estado"] == 201
+
+
+def test_lote_con_clave_se_repite_sin_volver_a_escribir(cliente, nuevo_suscriptor, datos_pago, conexion):
+    suscriptores = [nuevo_suscriptor() for _ in range(2)]
+    cabeceras = {"Idempotency-Key": f"lote-{suscriptores[0]['id']}"}
+    lote = [datos_pago(s["id"], mes=8) for s in suscriptores]
+
+    primera = cliente.post("/pagos/batch", json=lote, headers=cabeceras)
+    segunda = cliente.post("/pagos/batch", json=lote, headers=cabeceras)
+
+    assert primera.json()["creados"] == 2
+    assert segunda.headers["Idempotent-Replayed"] == "true"
+    assert segunda.json() == primera.json()
@@ -0,0 +1,69 @@
+"""
+Importador: índices diferidos durante la carga, su recuperación y los límites de /importar
+"""
+import os
+import subprocess
+import sys
+
+import database_simple
+import importador
+import main_simple_fixed
+from conftest import APP_DIR
+
+
+def indices(conexion):
+    return {fila[0] for fila in conexion.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")}
+
+
+def test_importacion_recrea_los_indices(tmp_path, nuevo_suscriptor, conexion):
+    suscriptores = [nuevo_suscriptor() for _ in range(2)]
+    archivo = tmp_path / "pagos.csv"
+    archivo.write_text("suscriptor_id,mes,anio,fecha_pago,valor,tipo_pago\n" + "".join(
+        f"{s['id']},7,2031,2031-07-10,20000,efectivo\n" for s in suscriptores), encoding="utf-8")
+    antes = indices(conexion)
+
+    resumen = importador.importar("pagos", str(archivo))
+
+    assert resumen["importadas"] == 2
+    assert indices(conexion) == antes
+    assert database_simple.esquema_vigente(conexion)
+
+
+def test_importacion_interrumpida_se_recupera_al_arrancar(conexion):
+    antes = indices(conexion)
+
+    # El proceso muere con los índices eliminados, sin pasar por el finally de importar
+    subprocess.run([sys.executable, "-c",
+                    "import os, importador\n"
+                    "conn = importador.get_connection()\n"
+                    "importador.diferir_indices(conn, importador.TABLAS_AFECTADAS['pagos'])\n"
+                    "os._exit(1)"],
+                   cwd=APP_DIR, env=dict(os.environ), check=False)
+    assert indices(conexion) < antes
+    assert not database_simple.esquema_vigente(conexion)
+
+    # Aun el arranque rápido ve la huella borrada y vuelve a crearlos
+    assert database_simple.init_database(rapido=True)
+    assert indices(conexion) == antes
+    assert database_simple.esquema_vigente(conexion)
+
+
+def test_tamano_lote_fuera_de_rango_devuelve_422(cliente):
+    for tamano in (0, main_simple_fixed.MAX_TAMANO_LOTE_IMPORTACION + 1):
+        respuesta = cliente.post("/importar/pagos", params={"tamano_lote": tamano}, content=b"suscriptor_id\n")
+        assert respuesta.status_code == 422
+
+
+def test_archivo_demasiado_grande_devuelve_413(cliente, monkeypatch):
+    monkeypatch.setattr(main_simple_fixed, "MAX_IMPORTACION_BYTES", 1024)
+    os.makedirs(importador.IMPORTACIONES_DIR, exist_ok=True)
+    antes = set(os.listdir(importador.IMPORTACIONES_DIR))
+
+    declarado = cliente.post("/importar/pagos", content=b"x" * 2048)
+    # Por partes no hay Content-Length: el límite se aplica mientras se copia a disco
+    por_partes = cliente.post("/importar/pagos", content=(b"x" * 512 for _ in range(4)))
+
+    assert declarado.status_code == 413
+    assert por_partes.status_code == 413
+    assert set(os.listdir(importador.IMPORTACIONES_DIR)) == antes
@@ -0,0 +1,34 @@
+"""
+Pagos por lotes: numeración de los recibos
+"""
+
+
+def numeros_recibo(conexion, pago_ids):
+    return [fila[0] for fila in conexion.execute(
+        f"SELECT numero_recibo FROM recibos WHERE pago_id IN ({','.join('?' * len(pago_ids))}) ORDER BY pago_id",
+        pago_ids)]
+
+
+def test_lote_numera_recibos_despues_de_eliminar_uno(cliente, nuevo_suscriptor, datos_pago, conexion):
+    suscriptores = [nuevo_suscriptor() for _ in range(3)]
+
+    lote = cliente.post("/pagos/batch", json=[datos_pago(s["id"], mes=3) for s in suscriptores])
+    assert lote.status_code == 200
+    ids = [resultado["id"] for resultado in lote.json()["resultados"]]
+    primeros = numeros_recibo(conexion, ids)
+    assert len(set(primeros)) == 3
+
+    # Con un recibo menos, contar los del día repetiría el último número
+    assert cliente.delete(f"/pagos/{ids[0]}").status_code == 200
+    lote = cliente.post("/pagos/batch", json=[datos_pago(s["id"], mes=4) for s in suscriptores])
+    assert lote.status_code == 200
+    assert lote.json()["creados"] == 3
+    nuevos = numeros_recibo(conexion, [resultado["id"] for resultado in lote.json()["resultados"]])
+
+    sufijo = lambda numero: int(numero.rsplit("-", 1)[1])
+    assert len(set(nuevos)) == 3
+    assert min(map(sufijo, nuevos)) > max(map(sufijo, primeros))
+
+    individual = cliente.post("/pagos/", json=datos_pago(suscriptores[0]["id"], mes=5))
+    assert individual.status_code == 201
+    assert sufijo(numeros_recibo(conexion, [individual.json()["id"]])[0]) > max(map(sufijo, nuevos))
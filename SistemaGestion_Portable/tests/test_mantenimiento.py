@@ -0,0 +1,68 @@
+"""
+Eliminación diferida de suscriptores y mantenimiento con varios procesos
+"""
+import os
+import subprocess
+import sys
+
+import database_simple
+from conftest import APP_DIR
+from mantenimiento import PlanificadorMantenimiento, tomar_liderazgo
+
+TOMAR_EN_OTRO_PROCESO = ("import sys, mantenimiento\n"
+                         "sys.exit(0 if mantenimiento.tomar_liderazgo(sys.argv[1]) else 1)")
+
+
+def liderazgo_en_otro_proceso(ruta):
+    return subprocess.run([sys.executable, "-c", TOMAR_EN_OTRO_PROCESO, ruta],
+                          cwd=APP_DIR, env=dict(os.environ)).returncode == 0
+
+
+def test_un_solo_lider_por_base(tmp_path):
+    ruta = str(tmp_path / "mantenimiento.lock")
+    lider = tomar_liderazgo(ruta)
+    assert lider is not None
+    assert not liderazgo_en_otro_proceso(ruta)
+
+    # Al cerrarse (o morir el proceso) otro puede tomarlo
+    lider.close()
+    assert liderazgo_en_otro_proceso(ruta)
+
+
+def test_la_aplicacion_toma_el_liderazgo_al_arrancar(cliente):
+    assert cliente.get("/mantenimiento").json()["lider"] is True
+    # Un segundo worker sobre la misma base no lo obtiene
+    assert not liderazgo_en_otro_proceso(database_simple.get_database_path() + ".mantenimiento.lock")
+
+
+def test_ejecutar_pronto_solo_encola_en_el_lider():
+    seguidor = PlanificadorMantenimiento()
+    seguidor.lider = False
+    seguidor.ejecutar_pronto("purga_eliminados")
+    assert seguidor.estado()["pendientes"] == []
+
+    lider = PlanificadorMantenimiento()
+    lider.ejecutar_pronto("purga_eliminados")
+    lider.ejecutar_pronto("purga_eliminados")
+    assert lider.estado()["pendientes"] == ["purga_eliminados"]
+    assert lider.tareas_vencidas() == ["purga_eliminados"]
+
+
+def test_eliminado_se_oculta_y_la_purga_borra_su_historial(cliente, nuevo_suscriptor, datos_pago, conexion):
+    suscriptor = nuevo_suscriptor()
+    pago = cliente.post("/pagos/", json=datos_pago(suscriptor["id"])).json()
+
+    assert cliente.delete(f"/suscriptores/{suscriptor['id']}").status_code == 200
+
+    # Oculto al instante, aunque sus filas sigan en la base hasta la purga
+    assert cliente.get(f"/suscriptores/{suscriptor['id']}").status_code == 404
+    assert pago["id"] not in [p["id"] for p in cliente.get("/pagos/", params={"limit": 1000}).json()]
+    assert cliente.delete(f"/suscriptores/{suscriptor['id']}").status_code == 404
+    assert conexion.execute("SELECT COUNT(*) FROM pagos WHERE id = ?", (pago["id"],)).fetchone()[0] == 1
+
+    registro = cliente.post("/mantenimiento/purga_eliminados/ejecutar").json()
+
+    assert registro["exito"], registro
+    assert conexion.execute("SELECT COUNT(*) FROM pagos WHERE id = ?", (pago["id"],)).fetchone()[0] == 0
+    assert conexion.execute("SELECT COUNT(*) FROM recibos WHERE pago_id = ?", (pago["id"],)).fetchone()[0] == 0
+    assert conexion.execute("SELECT COUNT(*) FROM suscriptores WHERE id = ?", (suscriptor["id"],)).fetchone()[0] == 0
@@ -0,0 +1,49 @@
+"""
+Respaldos: creación en línea y restauración
+"""
+import os
+import sqlite3
+
+import database_simple
+import respaldos
+
+
+def contar_suscriptores(ruta):
+    conn = sqlite3.connect(ruta)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM suscriptores").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_crear_respaldo_desde_la_api(cliente):
+    respuesta = cliente.post("/respaldos/")
+
+    assert respuesta.status_code == 201
+    archivo = respuesta.json()["archivo"]
+    assert archivo in [respaldo["archivo"] for respaldo in cliente.get("/respaldos/").json()]
+    assert cliente.post(f"/respaldos/{archivo}/verificar").json()["integridad"] == "ok"
+
+
+def test_respaldo_no_deja_archivos_auxiliares(tmp_path):
+    resultado = respaldos.crear_respaldo(str(tmp_path))
+
+    assert os.listdir(tmp_path) == [resultado["archivo"]]
+
+
+def test_restaurar_el_respaldo_mas_viejo_con_la_retencion_llena(tmp_path, nuevo_suscriptor):
+    nuevo_suscriptor()
+    antes = contar_suscriptores(database_simple.get_database_path())
+    creados = [respaldos.crear_respaldo(str(tmp_path))["archivo"] for _ in range(respaldos.MAX_RESPALDOS)]
+    nuevo_suscriptor()
+    assert contar_suscriptores(database_simple.get_database_path()) == antes + 1
+
+    # El respaldo de seguridad no puede borrar por retención el que se restaura
+    resultado = respaldos.restaurar_respaldo(creados[0], str(tmp_path))
+
+    assert resultado["restaurado"] == creados[0]
+    assert contar_suscriptores(database_simple.get_database_path()) == antes
+    assert resultado["respaldo_previo"] in os.listdir(tmp_path)
+    assert contar_suscriptores(os.path.join(tmp_path, resultado["respaldo_previo"])) == antes + 1
+    assert len(os.listdir(tmp_path)) == respaldos.MAX_RESPALDOS
+    assert not [nombre for nombre in os.listdir(tmp_path) if not nombre.endswith(".db")]
@@ -0,0 +1,79 @@
+"""
+Resumen del panel: totales al día, mora, resultado guardado y consistencia de las consultas en paralelo
+"""
+from datetime import date, timedelta
+
+import database_simple
+from resumen_panel import ResumenPanel
+
+
+def sin_fecha(resumen):
+    return {clave: valor for clave, valor in resumen.items() if clave != "calculado_en"}
+
+
+def test_totales_y_actividad_al_dia(cliente, nuevo_suscriptor, datos_pago):
+    antes = cliente.get("/dashboard/resumen").json()
+    suscriptor = nuevo_suscriptor()
+    pago = cliente.post("/pagos/", json=datos_pago(suscriptor["id"], mes=12)).json()
+    cliente.post("/gastos/", json={"tipo_gasto": "oficina", "valor": 500, "descripcion": "Café", "fecha": "2030-01-10"})
+
+    despues = cliente.get("/dashboard/resumen").json()
+
+    assert despues["totales"]["ingresos"] == antes["totales"]["ingresos"] + pago["valor"]
+    assert despues["totales"]["gastos"] == antes["totales"]["gastos"] + 500
+    assert despues["totales"]["balance"] == despues["totales"]["ingresos"] - despues["totales"]["gastos"]
+    assert despues["conteos"]["suscriptores"] == antes["conteos"]["suscriptores"] + 1
+    assert despues["conteos"]["pagos"] == antes["conteos"]["pagos"] + 1
+    assert pago["id"] in [p["id"] for p in despues["actividad"]["pagos"]]
+
+
+def test_mora_es_no_haber_pagado_el_mes_anterior(cliente, nuevo_suscriptor, datos_pago):
+    antes = cliente.get("/dashboard/resumen").json()["conteos"]["en_mora"]
+    suscriptor = nuevo_suscriptor()
+    assert cliente.get("/dashboard/resumen").json()["conteos"]["en_mora"] == antes + 1
+
+    anterior = date.today().replace(day=1) - timedelta(days=1)
+    cliente.post("/pagos/", json=datos_pago(suscriptor["id"], mes=anterior.month, anio=anterior.year))
+
+    assert cliente.get("/dashboard/resumen").json()["conteos"]["en_mora"] == antes
+
+
+def test_se_guarda_hasta_el_proximo_commit(nuevo_suscriptor):
+    panel = ResumenPanel(nombre="prueba", paralelo=False)
+    primero = panel.obtener()
+    assert panel.obtener() is primero
+    assert panel.estado()["aciertos"] == 1
+
+    nuevo_suscriptor()
+
+    assert panel.obtener()["conteos"]["suscriptores"] == primero["conteos"]["suscriptores"] + 1
+    assert panel.estado()["calculos"] == 2
+    panel.cerrar()
+
+
+def test_un_commit_durante_las_consultas_en_paralelo_repite_el_calculo(nuevo_suscriptor):
+    class PanelConCommitEnMedio(ResumenPanel):
+        def _en_paralelo(self, periodo):
+            partes = super()._en_paralelo(periodo)
+            if not self.repetidos:
+                nuevo_suscriptor()
+            return partes
+
+    paralelo = PanelConCommitEnMedio(nombre="prueba", paralelo=True)
+    resumen = paralelo.obtener()
+    seguido = ResumenPanel(nombre="prueba", paralelo=False)
+
+    # Se descarta lo leído en paralelo y se recalcula en una transacción, con el alta incluida
+    assert paralelo.estado()["repetidos"] == 1
+    assert sin_fecha(resumen) == sin_fecha(seguido.obtener())
+    paralelo.cerrar()
+    seguido.cerrar()
+
+
+def test_en_paralelo_y_en_una_transaccion_dan_lo_mismo():
+    paralelo = ResumenPanel(nombre="prueba", pool=database_simple.pool_lectura, paralelo=True)
+    seguido = ResumenPanel(nombre="prueba", paralelo=False)
+
+    assert sin_fecha(paralelo.obtener()) == sin_fecha(seguido.obtener())
+    paralelo.cerrar()
+    seguido.cerrar()
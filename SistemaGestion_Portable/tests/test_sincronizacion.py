@@ -0,0 +1,52 @@
+"""
+Sincronización incremental: marcas de eliminación y tokens vencidos
+"""
+from datetime import datetime, timedelta
+
+
+def test_cambios_incluyen_altas_y_eliminaciones(cliente, nuevo_suscriptor):
+    token = cliente.get("/sync/changes").json()["token"]
+    alta = nuevo_suscriptor()
+    eliminado = nuevo_suscriptor()
+    assert cliente.delete(f"/suscriptores/{eliminado['id']}").status_code == 200
+
+    cambios = cliente.get("/sync/changes", params={"since": token}).json()
+
+    assert not cambios["recargar"]
+    assert alta["id"] in [fila["id"] for fila in cambios["suscriptores"]]
+    assert eliminado["id"] not in [fila["id"] for fila in cambios["suscriptores"]]
+    assert eliminado["id"] in cambios["eliminados"]["suscriptores"]
+
+
+def test_pago_eliminado_deja_su_marca(cliente, nuevo_suscriptor, datos_pago):
+    suscriptor = nuevo_suscriptor()
+    pago = cliente.post("/pagos/", json=datos_pago(suscriptor["id"], mes=6)).json()
+    token = cliente.get("/sync/changes").json()["token"]
+    assert cliente.delete(f"/pagos/{pago['id']}").status_code == 200
+
+    cambios = cliente.get("/sync/changes", params={"since": token}).json()
+
+    assert pago["id"] in cambios["eliminados"]["pagos"]
+
+
+def test_token_anterior_a_la_retencion_devuelve_410(cliente):
+    respuesta = cliente.get("/sync/changes", params={"since": "2000-01-01 00:00:00.000000"})
+    assert respuesta.status_code == 410
+
+
+def test_token_invalido_devuelve_400(cliente):
+    assert cliente.get("/sync/changes", params={"since": "ayer"}).status_code == 400
+
+
+def test_token_con_zona_horaria_se_lee_en_utc(cliente, nuevo_suscriptor):
+    token = cliente.get("/sync/changes").json()["token"]
+    # El mismo instante expresado en UTC-5
+    local = (datetime.fromisoformat(token) - timedelta(hours=5)).isoformat() + "-05:00"
+    alta = nuevo_suscriptor()
+
+    for desde in (token + "+00:00", local):
+        respuesta = cliente.get("/sync/changes", params={"since": desde})
+        assert respuesta.status_code == 200
+        assert alta["id"] in [fila["id"] for fila in respuesta.json()["suscriptores"]]
+
+    assert cliente.get("/sync/changes", params={"since": "2000-01-01T00:00:00+00:00"}).status_code == 410
@@ -0,0 +1,58 @@
+"""
+Autocompletado de suscriptores: índice en memoria, delta de otros procesos y consulta SQL de respaldo
+"""
+from indice_suscriptores import IndiceSuscriptores
+
+
+def ids(resultados):
+    return [fila["id"] for fila in resultados]
+
+
+def test_prefijos_de_nombre_sin_tildes_cedula_y_contrato(cliente, nuevo_suscriptor):
+    suscriptor = nuevo_suscriptor(nombre_completo="Ñusta Zapiáin Quevedo")
+
+    for texto in ("zapiain", "quev ÑUS", suscriptor["cedula"], suscriptor["numero_contrato"].replace("-", "").lower()):
+        respuesta = cliente.get("/suscriptores/typeahead", params={"q": texto})
+        assert suscriptor["id"] in ids(respuesta.json()), texto
+
+    # Cada palabra escrita debe comenzar alguna palabra del nombre
+    assert suscriptor["id"] not in ids(cliente.get("/suscriptores/typeahead", params={"q": "zapiain x"}).json())
+    assert cliente.get("/suscriptores/typeahead", params={"q": " - "}).json() == []
+
+
+def test_ediciones_y_eliminaciones_se_ven_al_momento(cliente, nuevo_suscriptor):
+    suscriptor = nuevo_suscriptor(nombre_completo="Ildefonso Barrenechea")
+    cliente.put(f"/suscriptores/{suscriptor['id']}", json={"nombre_completo": "Ildefonso Zubizarreta"})
+
+    assert suscriptor["id"] not in ids(cliente.get("/suscriptores/typeahead", params={"q": "barrenechea"}).json())
+    assert suscriptor["id"] in ids(cliente.get("/suscriptores/typeahead", params={"q": "zubizarreta"}).json())
+
+    cliente.delete(f"/suscriptores/{suscriptor['id']}")
+    assert suscriptor["id"] not in ids(cliente.get("/suscriptores/typeahead", params={"q": "zubizarreta"}).json())
+
+
+def test_cambios_de_otro_proceso_llegan_con_el_delta(nuevo_suscriptor):
+    indice = IndiceSuscriptores(nombre="prueba")
+    indice.al_dia()
+    # El alta pasa por la API, que actualiza solo el índice de la aplicación
+    suscriptor = nuevo_suscriptor(nombre_completo="Gumersinda Olaechea")
+    assert ids(indice.buscar("olaechea")) == []
+
+    indice.revisar_pronto()
+
+    assert ids(indice.buscar("olaechea")) == [suscriptor["id"]]
+    assert indice.estado()["deltas"] == 1
+
+
+def test_sin_memoria_suficiente_la_consulta_sql_responde_igual(nuevo_suscriptor):
+    for nombre in ("Teodomiro Arrieta", "Teodora Arrieta Luna", "Arrieta Teodosio"):
+        nuevo_suscriptor(nombre_completo=nombre)
+    en_memoria = IndiceSuscriptores(nombre="prueba")
+    en_sql = IndiceSuscriptores(nombre="prueba", max_bytes=1)
+
+    for texto in ("arrieta", "teod arr", "teodora", "arrieta l"):
+        assert en_sql.buscar(texto, 50) == en_memoria.buscar(texto, 50), texto
+
+    assert not en_sql.estado()["en_memoria"]
+    assert en_sql.estado()["consultas_sql"] == 4
+    assert en_memoria.estado()["consultas_sql"] == 0
@@ -0,0 +1,106 @@
+"""
+Reportes compartidos: una sola ejecución para las peticiones iguales simultáneas
+"""
+import asyncio
+import threading
+
+import pytest
+
+from vuelo_unico import VueloUnico
+
+
+class CalculoRetenido:
+    """Función que no termina hasta que la prueba la suelta, para tener peticiones simultáneas"""
+
+    def __init__(self, resultado=None, error=None):
+        self.resultado = resultado
+        self.error = error
+        self.soltar = threading.Event()
+        self.llamadas = 0
+
+    def __call__(self, *args):
+        self.llamadas += 1
+        self.soltar.wait(5)
+        if self.error:
+            raise self.error
+        return (self.resultado, args)
+
+
+async def en_paralelo(vuelo, claves, calculo):
+    tareas = [asyncio.ensure_future(vuelo.ejecutar(clave, calculo, clave)) for clave in claves]
+    await asyncio.sleep(0.05)
+    calculo.soltar.set()
+    return await asyncio.gather(*tareas, return_exceptions=True)
+
+
+def test_peticiones_iguales_comparten_el_calculo():
+    vuelo = VueloUnico("prueba")
+    calculo = CalculoRetenido("balance")
+
+    resultados = asyncio.run(en_paralelo(vuelo, ["a", "a", "a", "b"], calculo))
+
+    assert resultados == [("balance", ("a",))] * 3 + [("balance", ("b",))]
+    assert calculo.llamadas == 2
+    assert vuelo.estado() == {"activo": True, "peticiones": 4, "calculos": 2, "compartidas": 2,
+                              "proporcion": 2.0, "en_curso": 0}
+
+
+def test_terminado_el_calculo_la_siguiente_peticion_calcula_de_nuevo():
+    vuelo = VueloUnico("prueba")
+    calculo = CalculoRetenido("balance")
+    calculo.soltar.set()
+
+    async def seguidas():
+        return [await vuelo.ejecutar("a", calculo) for _ in range(2)]
+
+    asyncio.run(seguidas())
+
+    assert calculo.llamadas == 2
+    assert vuelo.estado()["compartidas"] == 0
+
+
+def test_el_error_llega_a_todos_y_no_queda_guardado():
+    vuelo = VueloUnico("prueba")
+    calculo = CalculoRetenido(error=ValueError("sin datos"))
+
+    resultados = asyncio.run(en_paralelo(vuelo, ["a", "a"], calculo))
+
+    assert [type(r) for r in resultados] == [ValueError, ValueError]
+    assert calculo.llamadas == 1
+    with pytest.raises(ValueError):
+        asyncio.run(vuelo.ejecutar("a", calculo))
+    assert calculo.llamadas == 2
+
+
+def test_si_se_va_quien_empezo_los_demas_siguen_esperando():
+    vuelo = VueloUnico("prueba")
+    calculo = CalculoRetenido("balance")
+
+    async def primero_desconectado():
+        primero = asyncio.ensure_future(vuelo.ejecutar("a", calculo))
+        segundo = asyncio.ensure_future(vuelo.ejecutar("a", calculo))
+        await asyncio.sleep(0.05)
+        primero.cancel()
+        calculo.soltar.set()
+        return await segundo
+
+    assert asyncio.run(primero_desconectado()) == ("balance", ())
+    assert calculo.llamadas == 1
+
+
+def test_desactivado_calcula_cada_peticion():
+    vuelo = VueloUnico("prueba", activo=False)
+    calculo = CalculoRetenido("balance")
+
+    asyncio.run(en_paralelo(vuelo, ["a", "a", "a"], calculo))
+
+    assert calculo.llamadas == 3
+    assert vuelo.estado()["compartidas"] == 0
+
+
+def test_reportes_compartidos_en_la_api(cliente):
+    respuesta = cliente.get("/balance/detallado", params={"fecha_inicio": "2030-01-01"})
+
+    assert respuesta.status_code == 200
+    assert respuesta.headers["content-type"] == "application/json"
+    assert cliente.get("/metricas").json()["reportes_compartidos"]["calculos"] >= 1